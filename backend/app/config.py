@@ -12,13 +12,84 @@ class Settings(BaseSettings):
     # Gemini API
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
     GEMINI_MODEL: str = os.getenv("GEMINI_MODEL", "gemini-1.5-flash" )
+    GEMINI_TIMEOUT_SECONDS: float = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "30"))  # per API call
+    GEMINI_RPM_LIMIT: int = int(os.getenv("GEMINI_RPM_LIMIT", "60"))  # requests per minute (0 = unlimited)
+    GEMINI_TPM_LIMIT: int = int(os.getenv("GEMINI_TPM_LIMIT", "1000000"))  # estimated tokens per minute (0 = unlimited)
+    GEMINI_MAX_CONCURRENCY: int = int(os.getenv("GEMINI_MAX_CONCURRENCY", "16"))  # adaptive limit ceiling
+    GEMINI_MIN_CONCURRENCY: int = int(os.getenv("GEMINI_MIN_CONCURRENCY", "1"))
+    GEMINI_MAX_RETRIES: int = int(os.getenv("GEMINI_MAX_RETRIES", "4"))  # on 429/5xx/timeouts
+    GEMINI_RETRY_BASE_SECONDS: float = float(os.getenv("GEMINI_RETRY_BASE_SECONDS", "1"))
+    GEMINI_RETRY_MAX_SECONDS: float = float(os.getenv("GEMINI_RETRY_MAX_SECONDS", "30"))
+    
+    # Grading
+    GRADING_CONCURRENCY: int = int(os.getenv("GRADING_CONCURRENCY", "8"))
+    GRADING_FAST_PATH_ENABLED: bool = os.getenv("GRADING_FAST_PATH_ENABLED", "true").lower() == "true"
+    GRADING_NUMERIC_TOLERANCE: float = float(os.getenv("GRADING_NUMERIC_TOLERANCE", "0.001"))
+    GRADING_BATCH_ENABLED: bool = os.getenv("GRADING_BATCH_ENABLED", "false").lower() == "true"
+    GRADING_BATCH_TOKEN_BUDGET: int = int(os.getenv("GRADING_BATCH_TOKEN_BUDGET", "6000"))
+    GRADING_BATCH_MAX_ITEMS: int = int(os.getenv("GRADING_BATCH_MAX_ITEMS", "25"))
+    GRADING_BULK_MAX_STUDENTS: int = int(os.getenv("GRADING_BULK_MAX_STUDENTS", "500"))  # per bulk request
+    
+    # Grade cache (set GRADE_CACHE_PATH to empty for memory only)
+    GRADE_CACHE_ENABLED: bool = os.getenv("GRADE_CACHE_ENABLED", "true").lower() == "true"
+    GRADE_CACHE_PATH: str = os.getenv("GRADE_CACHE_PATH", "data/grade_cache.sqlite3")
+    GRADE_CACHE_MEMORY_ENTRIES: int = int(os.getenv("GRADE_CACHE_MEMORY_ENTRIES", "2048"))
+    GRADE_CACHE_MAX_ENTRIES: int = int(os.getenv("GRADE_CACHE_MAX_ENTRIES", "100000"))
+    GRADE_CACHE_TTL_SECONDS: int = int(os.getenv("GRADE_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+    
+    # Parse result cache, keyed on the extracted text (set PARSE_CACHE_PATH to empty for memory only)
+    PARSE_CACHE_ENABLED: bool = os.getenv("PARSE_CACHE_ENABLED", "true").lower() == "true"
+    PARSE_CACHE_PATH: str = os.getenv("PARSE_CACHE_PATH", "data/parse_cache.sqlite3")
+    PARSE_CACHE_MEMORY_ENTRIES: int = int(os.getenv("PARSE_CACHE_MEMORY_ENTRIES", "256"))
+    PARSE_CACHE_MAX_ENTRIES: int = int(os.getenv("PARSE_CACHE_MAX_ENTRIES", "10000"))
+    PARSE_CACHE_TTL_SECONDS: int = int(os.getenv("PARSE_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+    # Long exams are split at question boundaries and parsed in parallel (0 disables chunking)
+    PARSE_CHUNK_CHARS: int = int(os.getenv("PARSE_CHUNK_CHARS", "6000"))
+    PARSE_CHUNK_OVERLAP_CHARS: int = int(os.getenv("PARSE_CHUNK_OVERLAP_CHARS", "300"))
+    PARSE_CHUNK_CONCURRENCY: int = int(os.getenv("PARSE_CHUNK_CONCURRENCY", "4"))
     
     # OCR Settings
     OCR_LANGUAGE: str = os.getenv("OCR_LANGUAGE", "en")
+    OCR_WORKERS: int = int(os.getenv("OCR_WORKERS", "2"))  # 0 = run OCR in-process on a thread
+    OCR_TORCH_THREADS: int = int(os.getenv("OCR_TORCH_THREADS", "0"))  # 0 = cpu_count / OCR_WORKERS
+    OCR_MP_START_METHOD: str = os.getenv("OCR_MP_START_METHOD", "spawn")
+    OCR_PREWARM: bool = os.getenv("OCR_PREWARM", "true").lower() == "true"  # load models at startup; /api/ready waits for it
+    OCR_BATCH_SIZE: int = int(os.getenv("OCR_BATCH_SIZE", "8"))  # EasyOCR recognizer batch size
+    OCR_BATCH_WORKERS: int = int(os.getenv("OCR_BATCH_WORKERS", "0"))  # EasyOCR data loader workers
+    OCR_PAGES_PER_BATCH: int = int(os.getenv("OCR_PAGES_PER_BATCH", "4"))  # pages per batched OCR call
+    OCR_TILE_HEIGHT: int = int(os.getenv("OCR_TILE_HEIGHT", "0"))  # split taller images into tiles (0 = off)
+    # Image preprocessing before OCR: none, grayscale, clean, scan, binary, or a comma-separated
+    # list of steps (grayscale, contrast, binarize, deskew, crop, resolution)
+    OCR_PREPROCESS_PROFILE: str = os.getenv("OCR_PREPROCESS_PROFILE", "none")
+    OCR_TARGET_TEXT_HEIGHT: int = int(os.getenv("OCR_TARGET_TEXT_HEIGHT", "32"))  # text line height (px) the resolution step aims for
+    # Two-pass PDF OCR: read pages at PDF_LARGE_FILE_DPI, then re-read regions below
+    # OCR_REFINE_CONFIDENCE from a OCR_REFINE_DPI rendering (needs a profile without deskew/crop/resolution)
+    OCR_REFINE_ENABLED: bool = os.getenv("OCR_REFINE_ENABLED", "false").lower() == "true"
+    OCR_REFINE_CONFIDENCE: float = float(os.getenv("OCR_REFINE_CONFIDENCE", "0.6"))
+    OCR_REFINE_DPI: int = int(os.getenv("OCR_REFINE_DPI", "300"))
+    OCR_REFINE_MAX_REGIONS: int = int(os.getenv("OCR_REFINE_MAX_REGIONS", "50"))  # per page, weakest first
+    PDF_MAX_PAGES: int = int(os.getenv("PDF_MAX_PAGES", "50"))
+    PDF_RENDER_PREFETCH: int = int(os.getenv("PDF_RENDER_PREFETCH", "2"))  # rendered pages kept ahead of OCR
+    PDF_TEXT_LAYER_ENABLED: bool = os.getenv("PDF_TEXT_LAYER_ENABLED", "true").lower() == "true"
+    PDF_TEXT_LAYER_MIN_CHARS: int = int(os.getenv("PDF_TEXT_LAYER_MIN_CHARS", "20"))
+    
+    # OCR result cache, keyed on file content + OCR settings (set OCR_CACHE_PATH to empty for memory only)
+    OCR_CACHE_ENABLED: bool = os.getenv("OCR_CACHE_ENABLED", "true").lower() == "true"
+    OCR_CACHE_PATH: str = os.getenv("OCR_CACHE_PATH", "data/ocr_cache.sqlite3")
+    OCR_CACHE_MEMORY_ENTRIES: int = int(os.getenv("OCR_CACHE_MEMORY_ENTRIES", "32"))
+    OCR_CACHE_MAX_MB: int = int(os.getenv("OCR_CACHE_MAX_MB", "256"))
     
     # File Upload
     MAX_FILE_SIZE_MB: int = int(os.getenv("MAX_FILE_SIZE_MB", "10"))
     ALLOWED_EXTENSIONS: List[str] = [".pdf", ".png", ".jpg", ".jpeg", ".txt"]
+    BULK_UPLOAD_MAX_FILES: int = int(os.getenv("BULK_UPLOAD_MAX_FILES", "500"))  # files + archive entries per request
+    BULK_UPLOAD_MAX_MB: int = int(os.getenv("BULK_UPLOAD_MAX_MB", "200"))  # total request size
+    
+    # Background processing of uploads
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_QUEUE_MAX_SIZE: int = int(os.getenv("JOB_QUEUE_MAX_SIZE", "500"))
+    UPLOAD_AUTO_PARSE: bool = os.getenv("UPLOAD_AUTO_PARSE", "false").lower() == "true"
+    UPLOAD_DEDUPE_ENABLED: bool = os.getenv("UPLOAD_DEDUPE_ENABLED", "false").lower() == "true"  # reuse the exam of an identical earlier upload
     
     # CORS
     CORS_ORIGINS: List[str] = [
@@ -27,8 +98,19 @@ class Settings(BaseSettings):
         "http://frontend:3000"
     ]
     
-    # Storage (in-memory for now)
-    STORAGE_TYPE: str = "memory"
+    # Storage: "memory" (per process) or "sqlite" (persistent, shared between workers)
+    STORAGE_TYPE: str = os.getenv("STORAGE_TYPE", "memory")
+    STORAGE_SQLITE_PATH: str = os.getenv("STORAGE_SQLITE_PATH", "data/exams.sqlite3")
+    # Limits for "memory" storage (0 = unlimited); settled exams are evicted least recently used first
+    STORAGE_MAX_EXAMS: int = int(os.getenv("STORAGE_MAX_EXAMS", "1000"))
+    STORAGE_MAX_MB: int = int(os.getenv("STORAGE_MAX_MB", "256"))
+    STORAGE_TTL_SECONDS: int = int(os.getenv("STORAGE_TTL_SECONDS", "0"))  # evict exams idle this long
+    STORAGE_SPILL_PATH: str = os.getenv("STORAGE_SPILL_PATH", "")  # SQLite file for evicted exams (empty = drop them)
+    BLOB_STORE_PATH: str = os.getenv("BLOB_STORE_PATH", "data/blobs")  # raw uploads, by SHA-256
+    BLOB_COMPRESSION: str = os.getenv("BLOB_COMPRESSION", "none")  # "none" or "zstd" (needs zstandard)
+    BLOB_ZSTD_LEVEL: int = int(os.getenv("BLOB_ZSTD_LEVEL", "3"))
+    BLOB_SWEEP_INTERVAL_SECONDS: int = int(os.getenv("BLOB_SWEEP_INTERVAL_SECONDS", "600"))  # delete unreferenced blobs (0 = never)
+    BLOB_SWEEP_GRACE_SECONDS: int = int(os.getenv("BLOB_SWEEP_GRACE_SECONDS", "3600"))  # keep blobs stored this recently
     
     class Config:
         env_file = ".env"
@@ -1,21 +1,105 @@
 """
 FastAPI main application entry point.
 """
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from app.routers import exams, health
 from app.config import settings
 from app.logging_config import setup_logging
+from app.services import ocr_executor, storage, upload_service
 
 # Setup logging
 setup_logging()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup and shutdown."""
+    ocr_executor.start_prewarm()
+    storage.start_blob_sweeper()
+    yield
+    storage.stop_blob_sweeper()
+    ocr_executor.shutdown_ocr_executor()
+    storage.get_store().close()
+
+
 app = FastAPI(
     title="AI Exam Grading System",
     description="Automated exam grading with OCR and Gemini AI",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+
+# Upload endpoints, and whether each is the bulk one
+_UPLOAD_PATHS = {"/api/exams/upload": False, "/api/exams/upload/bulk": True}
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Refuse uploads over the size limit with 413 before they are spooled.
+    
+    Single uploads are limited by MAX_FILE_SIZE_MB and bulk uploads by
+    BULK_UPLOAD_MAX_MB in total. Requests declaring a larger Content-Length
+    are rejected without reading the body; chunked requests are cut off as
+    soon as the bytes received exceed the limit. Registered before CORS so
+    the rejection still carries CORS headers.
+    """
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in _UPLOAD_PATHS:
+            await self.app(scope, receive, send)
+            return
+        
+        bulk = _UPLOAD_PATHS[scope["path"]]
+        if bulk:
+            detail = f"Upload too large. Maximum total size: {settings.BULK_UPLOAD_MAX_MB}MB"
+        else:
+            detail = f"File too large. Maximum size: {settings.MAX_FILE_SIZE_MB}MB"
+        rejection = JSONResponse(status_code=413, content={"detail": detail})
+        if upload_service.declared_size_too_large(Headers(scope=scope).get("content-length"), bulk=bulk):
+            await rejection(scope, receive, send)
+            return
+        
+        limit = upload_service.max_upload_request_bytes(bulk)
+        received = 0
+        rejected = False
+        
+        async def limited_receive() -> Message:
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    rejected = True
+                    await rejection(scope, receive, send)
+                    # Stop the body reader; whatever the app answers next is dropped
+                    return {"type": "http.disconnect"}
+            return message
+        
+        async def guarded_send(message: Message):
+            if not rejected:
+                await send(message)
+        
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not rejected:
+                raise
+
+
+app.add_middleware(UploadSizeLimitMiddleware)
+
+
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -44,6 +44,7 @@ class QuestionGrade(BaseModel):
     score: float = Field(..., ge=0, le=100, description="Score out of 100")
     is_correct: bool
     explanation: str = Field(..., description="Brief explanation of the grading")
+    grading_method: str = Field("llm", description="How the grade was produced: rule, cache or llm")
 
 
 class GradeResponse(BaseModel):
@@ -53,6 +54,41 @@ class GradeResponse(BaseModel):
     final_score: float = Field(..., ge=0, le=100, description="Final score out of 100")
     total_questions: int
     correct_answers: int
+    local_resolution_rate: Optional[float] = Field(None, ge=0, le=1, description="Fraction of answers graded without Gemini")
+
+
+class StudentSubmission(BaseModel):
+    """One student's answers within a bulk grade request."""
+    student_id: str = Field(..., min_length=1, description="Caller-chosen student identifier")
+    student_answers: List[StudentAnswer] = Field(..., description="List of student answers")
+
+
+class BulkGradeRequest(BaseModel):
+    """Request to grade many students against one exam."""
+    exam_id: str = Field(..., description="Unique exam identifier")
+    submissions: List[StudentSubmission] = Field(..., min_length=1, description="One entry per student")
+
+
+class StudentGradeSummary(BaseModel):
+    """Outcome for one student in a bulk grade request."""
+    student_id: str
+    final_score: Optional[float] = Field(None, ge=0, le=100, description="Final score out of 100 (None if grading failed)")
+    correct_answers: Optional[int] = None
+    total_answers: int
+    local_resolution_rate: Optional[float] = Field(None, ge=0, le=1, description="Fraction of answers graded without Gemini")
+    error: Optional[str] = Field(None, description="Why the student could not be graded")
+
+
+class BulkGradeResponse(BaseModel):
+    """Per-student summaries and throughput of a bulk grade request."""
+    exam_id: str
+    students: List[StudentGradeSummary]
+    graded_students: int
+    failed_students: int
+    total_answers: int
+    unique_answers: int = Field(..., description="Distinct (question, answer) pairs actually graded")
+    elapsed_seconds: float
+    answers_per_second: float
 
 
 class ExamUploadResponse(BaseModel):
@@ -61,4 +97,21 @@ class ExamUploadResponse(BaseModel):
     message: str
     file_type: str
     file_size: int
+    status: Optional[str] = Field(None, description="Processing state (see GET /{exam_id}/status)")
+
+
+class BulkUploadItem(BaseModel):
+    """Outcome for one file of a bulk upload."""
+    filename: str = Field(..., description="File name; archive entries are reported as archive.zip/path")
+    exam_id: Optional[str] = None
+    file_type: Optional[str] = None
+    file_size: Optional[int] = None
+    status: Optional[str] = Field(None, description="Processing state (see GET /{exam_id}/status)")
+    error: Optional[str] = Field(None, description="Why the file was not accepted")
+
 
+class BulkUploadResponse(BaseModel):
+    """Per-file results of a bulk upload."""
+    accepted: int
+    failed: int
+    files: List[BulkUploadItem]
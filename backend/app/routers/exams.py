@@ -1,107 +1,134 @@
 """
 Exam-related API endpoints.
 """
+import io
+import json
 import logging
+import time
+import zipfile
+from collections import Counter
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
 from fastapi import APIRouter, UploadFile, File, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from app.models import (
+    BulkGradeRequest,
+    BulkGradeResponse,
+    BulkUploadItem,
+    BulkUploadResponse,
     ExamUploadResponse,
-    ExamParseRequest,
     ExamParseResponse,
     GradeRequest,
     GradeResponse,
-    QuestionGrade
+    QuestionAnswer,
+    QuestionGrade,
+    StudentAnswer,
+    StudentGradeSummary
 )
-from app.services import ocr_service, gemini_service, grading_service, storage
+from app.services import exam_jobs, grading_service, parsing_service, storage, upload_service
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
-@router.post("/upload", response_model=ExamUploadResponse, status_code=status.HTTP_201_CREATED)
-async def upload_exam(file: UploadFile = File(...)):
+# Archive entries that are never exams (folders, macOS metadata, hidden files)
+_IGNORED_ARCHIVE_PREFIXES = ("__MACOSX/", ".")
+
+
+def _ingest_file(filename: str, file_obj: BinaryIO, auto_parse: Optional[bool]) -> ExamUploadResponse:
+    """
+    Register one uploaded file as an exam and queue it for processing.
+    
+    The file is validated and hashed in one chunked pass, then copied
+    into the blob store without being read into memory as a whole.
+    
+    Raises:
+        UploadRejectedError: If the file type is unsupported or the file is too large
+        JobQueueFullError: If the processing queue is full
+    """
+    upload_service.check_filename(filename)
+    upload = upload_service.inspect_upload(file_obj)
+    file_extension = upload.file_type
+    file_hash = upload.sha256
+    
+    # Reuse the exam of an identical earlier upload unless it failed
+    if settings.UPLOAD_DEDUPE_ENABLED:
+        existing_id = storage.find_exam_by_hash(file_hash)
+        existing_state = (storage.get_exam(existing_id) or {}).get("status", {}).get("state") if existing_id else None
+        if existing_id and existing_state != exam_jobs.FAILED:
+            logger.info(f"{filename} is identical to exam {existing_id}, reusing it")
+            return ExamUploadResponse(
+                exam_id=existing_id,
+                message=f"Identical file already uploaded as exam {existing_id}; reusing it",
+                file_type=file_extension,
+                file_size=upload.size,
+                status=existing_state
+            )
+    
+    # Generate exam ID
+    exam_id = storage.generate_exam_id()
+    
+    # Register the exam and hand processing to the background workers
+    logger.info(f"Queueing {filename} for processing (exam_id: {exam_id}, size: {upload.size / (1024 * 1024):.1f}MB, type: {file_extension})")
+    storage.create_exam(
+        exam_id,
+        file_obj,
+        file_extension,
+        filename,
+        exam_jobs.new_job_status(),
+        file_hash=file_hash
+    )
+    try:
+        exam_jobs.submit_exam_job(
+            exam_id,
+            file_extension,
+            auto_parse=settings.UPLOAD_AUTO_PARSE if auto_parse is None else auto_parse,
+            file_hash=file_hash
+        )
+    except exam_jobs.JobQueueFullError:
+        storage.delete_exam(exam_id)
+        raise
+    
+    return ExamUploadResponse(
+        exam_id=exam_id,
+        message=f"Exam upload accepted. Processing {filename} in the background - check GET /api/exams/{exam_id}/status",
+        file_type=file_extension,
+        file_size=upload.size,
+        status=exam_jobs.QUEUED
+    )
+
+
+@router.post("/upload", response_model=ExamUploadResponse, status_code=status.HTTP_202_ACCEPTED)
+async def upload_exam(file: UploadFile = File(...), auto_parse: Optional[bool] = None):
     """
     Upload a solved exam (PDF, image, or text file).
+    
+    The type is detected from the file content; MAX_FILE_SIZE_MB and
+    ALLOWED_EXTENSIONS apply. Requests whose declared size is already too
+    large are refused before the body is read (see main.py).
+    Returns immediately; OCR (and parsing, if auto_parse) run in the background.
+    Poll GET /{exam_id}/status for progress.
     """
     try:
-        # Validate file type
-        file_extension = None
-        for ext in [".pdf", ".png", ".jpg", ".jpeg", ".txt"]:
-            if file.filename.lower().endswith(ext):
-                file_extension = ext
-                break
-        
-        if not file_extension:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Unsupported file type. Allowed: PDF, PNG, JPG, TXT"
-            )
-        
-        # Read file
-        file_bytes = await file.read()
-        file_size_mb = len(file_bytes) / (1024 * 1024)
+        upload_service.check_filename(file.filename)
+        return await run_in_threadpool(_ingest_file, file.filename, file.file, auto_parse)
         
-        if file_size_mb > 10:  # Max 10MB
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"File too large. Maximum size: 10MB"
-            )
-        
-        # Generate exam ID
-        exam_id = storage.generate_exam_id()
-        
-        # Log processing start
-        logger.info(f"Starting processing of {file.filename} (exam_id: {exam_id}, size: {file_size_mb:.1f}MB, type: {file_extension})")
-        
-        # Extract text using OCR
-        logger.info(f"Extracting text from {file.filename} (exam_id: {exam_id})")
-        try:
-            extracted_text = ocr_service.extract_text_from_file(file_bytes, file_extension)
-        except Exception as e:
-            logger.error(f"OCR extraction failed: {str(e)}")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Failed to extract text from file: {str(e)}. Please ensure the file is readable and in a supported format."
-            )
-        
-        text_length = len(extracted_text.strip()) if extracted_text else 0
-        logger.info(f"Extracted {text_length} characters from {file.filename}")
-        
-        # Log preview of extracted text for debugging
-        if extracted_text:
-            preview = extracted_text[:200] if len(extracted_text) > 200 else extracted_text
-            logger.debug(f"Extracted text preview: {preview}")
-        
-        if not extracted_text or text_length < 10:
-            error_detail = f"Failed to extract text from file. Only {text_length} characters extracted. "
-            error_detail += "This might indicate: 1) The file is not readable, 2) OCR failed to detect text, "
-            error_detail += "3) The file format is not supported. Please try: "
-            error_detail += "- Using a clearer image file (.png, .jpg) with good contrast, "
-            error_detail += "- Using a text file (.txt) if possible, "
-            error_detail += "- Ensuring the text in the image is clear and not too small."
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=error_detail
-            )
-        
-        # Warn if text is very short (might indicate OCR issues)
-        if text_length < 100:
-            logger.warning(f"Warning: Only {text_length} characters extracted. This might not be enough to parse questions.")
-        
-        # Store exam
-        storage.store_exam(exam_id, file_bytes, file_extension, extracted_text)
-        
-        logger.info(f"Exam uploaded successfully: {exam_id} (text length: {text_length} chars)")
-        
-        return ExamUploadResponse(
-            exam_id=exam_id,
-            message=f"Exam uploaded successfully. Extracted {text_length} characters from {file.filename}",
-            file_type=file_extension,
-            file_size=len(file_bytes)
+    except upload_service.UploadTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except exam_jobs.JobQueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"{str(e)}. Please retry shortly."
         )
-        
-    except HTTPException:
-        raise
     except Exception as e:
         logger.error(f"Error uploading exam: {str(e)}")
         raise HTTPException(
@@ -110,6 +137,114 @@ async def upload_exam(file: UploadFile = File(...)):
         )
 
 
+def _iter_archive(archive_name: str, archive_file: BinaryIO) -> Iterator[Tuple[str, Union[BinaryIO, ValueError]]]:
+    """
+    Yield (name, file or ValueError) for each file in a ZIP archive.
+    
+    Entries are decompressed one at a time, and reading stops as soon as an
+    entry exceeds the size limit, whatever size its header declares.
+    """
+    max_bytes = upload_service.max_upload_bytes()
+    too_large = upload_service.UploadTooLargeError(f"File too large. Maximum size: {settings.MAX_FILE_SIZE_MB}MB")
+    try:
+        archive = zipfile.ZipFile(archive_file)
+    except zipfile.BadZipFile:
+        yield archive_name, ValueError("Not a valid ZIP archive")
+        return
+    
+    with archive:
+        for info in archive.infolist():
+            basename = info.filename.rsplit("/", 1)[-1]
+            if info.is_dir() or info.filename.startswith(_IGNORED_ARCHIVE_PREFIXES) or basename.startswith("."):
+                continue
+            name = f"{archive_name}/{info.filename}"
+            try:
+                upload_service.check_filename(basename)
+            except ValueError as e:
+                yield name, e
+                continue
+            if info.file_size > max_bytes:
+                yield name, too_large
+                continue
+            try:
+                with archive.open(info) as entry:
+                    data = entry.read(max_bytes + 1)
+            except (zipfile.BadZipFile, NotImplementedError, RuntimeError) as e:
+                yield name, ValueError(f"Could not read archive entry: {str(e)}")
+                continue
+            if len(data) > max_bytes:
+                yield name, too_large
+                continue
+            yield name, io.BytesIO(data)
+
+
+def _ingest_bulk(uploads: List[Tuple[str, BinaryIO]], auto_parse: Optional[bool]) -> BulkUploadResponse:
+    """Register every file (expanding ZIP archives) and queue each for processing."""
+    results: List[BulkUploadItem] = []
+    
+    def entries() -> Iterator[Tuple[str, Union[BinaryIO, ValueError]]]:
+        for filename, upload_file in uploads:
+            if upload_service.is_zip_archive(upload_file):
+                yield from _iter_archive(filename, upload_file)
+            else:
+                yield filename, upload_file
+    
+    for name, file_obj in entries():
+        if len(results) >= settings.BULK_UPLOAD_MAX_FILES:
+            results.append(BulkUploadItem(
+                filename=name,
+                error=f"Too many files: at most {settings.BULK_UPLOAD_MAX_FILES} per bulk upload"
+            ))
+            break
+        if isinstance(file_obj, ValueError):
+            results.append(BulkUploadItem(filename=name, error=str(file_obj)))
+            continue
+        try:
+            upload = _ingest_file(name.rsplit("/", 1)[-1], file_obj, auto_parse)
+        except (ValueError, exam_jobs.JobQueueFullError) as e:
+            results.append(BulkUploadItem(filename=name, error=str(e)))
+            continue
+        except Exception as e:
+            logger.error(f"Error ingesting {name}: {str(e)}")
+            results.append(BulkUploadItem(filename=name, error=f"Failed to upload: {str(e)}"))
+            continue
+        results.append(BulkUploadItem(
+            filename=name,
+            exam_id=upload.exam_id,
+            file_type=upload.file_type,
+            file_size=upload.file_size,
+            status=upload.status
+        ))
+    
+    accepted = sum(1 for item in results if item.exam_id)
+    logger.info(f"Bulk upload: {accepted} of {len(results)} files accepted")
+    return BulkUploadResponse(accepted=accepted, failed=len(results) - accepted, files=results)
+
+
+@router.post("/upload/bulk", response_model=BulkUploadResponse, status_code=status.HTTP_202_ACCEPTED)
+async def upload_exams_bulk(files: List[UploadFile] = File(...), auto_parse: Optional[bool] = None):
+    """
+    Upload many exams at once: several files, ZIP archives of scans, or both.
+    
+    Each file becomes its own exam and is queued for background OCR; the
+    JOB_WORKERS processing workers and the OCR pool bound how many are
+    processed at once. ZIP entries are read one at a time. The response
+    lists an exam_id or an error for every file.
+    """
+    try:
+        return await run_in_threadpool(
+            _ingest_bulk,
+            [(upload.filename or "upload", upload.file) for upload in files],
+            auto_parse
+        )
+    except Exception as e:
+        logger.error(f"Error in bulk upload: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to upload exams: {str(e)}"
+        )
+
+
 @router.post("/{exam_id}/parse", response_model=ExamParseResponse)
 async def parse_exam(exam_id: str):
     """
@@ -134,9 +269,22 @@ async def parse_exam(exam_id: str):
                 total_questions=len(existing_questions)
             )
         
-        # Parse using Gemini
+        # Text must be extracted by the background job first
+        extracted_text = exam.get("extracted_text")
+        if not extracted_text:
+            job_status = exam.get("status") or {}
+            if job_status.get("state") == exam_jobs.FAILED:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Failed to extract text from file: {job_status.get('error')}"
+                )
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Exam {exam_id} is still being processed ({job_status.get('state', 'unknown')}). Check GET /api/exams/{exam_id}/status"
+            )
+        
+        # Parse using Gemini (identical texts share cached or in-flight results)
         logger.info(f"Parsing exam {exam_id} with Gemini")
-        extracted_text = exam["extracted_text"]
         
         # Log text preview for debugging
         text_preview = extracted_text[:500] if len(extracted_text) > 500 else extracted_text
@@ -144,7 +292,7 @@ async def parse_exam(exam_id: str):
         logger.debug(f"Exam text preview: {text_preview}")
         
         try:
-            questions = gemini_service.parse_exam_text(extracted_text)
+            questions = await parsing_service.parse_exam_text_async(extracted_text)
         except ValueError as e:
             # Re-raise ValueError with more context
             error_msg = str(e)
@@ -202,80 +350,90 @@ async def parse_exam(exam_id: str):
         )
 
 
+def _questions_for_grading(
+    exam_id: str,
+    request_exam_id: str,
+    student_answers: List[StudentAnswer]
+) -> List[QuestionAnswer]:
+    """Load the parsed questions for a grade request and validate its answers."""
+    # Validate exam_id matches
+    if request_exam_id != exam_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Exam ID mismatch"
+        )
+    
+    # Get parsed questions
+    questions = storage.get_parsed_questions(exam_id)
+    if not questions:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Exam {exam_id} not parsed. Please parse the exam first."
+        )
+    
+    # Validate all indices before paying for any grading calls
+    index_error = _question_index_error(student_answers, questions)
+    if index_error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=index_error)
+    return questions
+
+
+def _question_index_error(student_answers: List[StudentAnswer], questions: List[QuestionAnswer]) -> Optional[str]:
+    """Describe the first answer whose question_index is out of range, if any."""
+    for student_answer in student_answers:
+        question_idx = student_answer.question_index
+        if question_idx >= len(questions):
+            return f"Question index {question_idx} out of range. Exam has {len(questions)} questions."
+    return None
+
+
+def _score(question_grades: List[QuestionGrade]) -> Dict[str, Any]:
+    """Results record for a set of graded answers, as stored."""
+    return {
+        "question_grades": question_grades,
+        "final_score": grading_service.calculate_final_grade(question_grades),
+        "correct_count": grading_service.count_correct_answers(question_grades),
+        "local_resolution_rate": grading_service.local_resolution_rate(question_grades)
+    }
+
+
+def _store_grades(exam_id: str, questions: List[QuestionAnswer], question_grades: List[QuestionGrade]) -> GradeResponse:
+    """Score graded answers, store the results and build the response."""
+    results = _score(question_grades)
+    final_score = results["final_score"]
+    correct_count = results["correct_count"]
+    local_rate = results["local_resolution_rate"]
+    
+    # Store results
+    storage.store_results(exam_id, results)
+    
+    logger.info(f"Graded exam {exam_id}: {final_score}% ({correct_count}/{len(questions)} correct, {local_rate:.0%} resolved locally)")
+    
+    return GradeResponse(
+        exam_id=exam_id,
+        question_grades=question_grades,
+        final_score=final_score,
+        total_questions=len(questions),
+        correct_answers=correct_count,
+        local_resolution_rate=local_rate
+    )
+
+
 @router.post("/{exam_id}/grade", response_model=GradeResponse)
 async def grade_exam(exam_id: str, request: GradeRequest):
     """
     Grade student answers against the exam.
     """
     try:
-        # Validate exam_id matches
-        if request.exam_id != exam_id:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Exam ID mismatch"
-            )
-        
-        # Get parsed questions
-        questions = storage.get_parsed_questions(exam_id)
-        if not questions:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Exam {exam_id} not parsed. Please parse the exam first."
-            )
-        
-        # Grade each answer
-        question_grades = []
-        for student_answer in request.student_answers:
-            question_idx = student_answer.question_index
-            
-            if question_idx >= len(questions):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Question index {question_idx} out of range. Exam has {len(questions)} questions."
-                )
-            
-            question = questions[question_idx]
-            
-            # Grade using Gemini
-            logger.info(f"Grading question {question_idx} for exam {exam_id}")
-            grade_result = gemini_service.grade_answer(
-                question.question,
-                question.correct_answer,
-                student_answer.answer
-            )
-            
-            question_grade = QuestionGrade(
-                question_index=question_idx,
-                question=question.question,
-                correct_answer=question.correct_answer,
-                student_answer=student_answer.answer,
-                score=grade_result["score"],
-                is_correct=grade_result["is_correct"],
-                explanation=grade_result["explanation"]
-            )
-            question_grades.append(question_grade)
-        
-        # Calculate final grade
-        final_score = grading_service.calculate_final_grade(question_grades)
-        correct_count = grading_service.count_correct_answers(question_grades)
-        
-        # Store results
-        results = {
-            "question_grades": question_grades,
-            "final_score": final_score,
-            "correct_count": correct_count
-        }
-        storage.store_results(exam_id, results)
+        questions = _questions_for_grading(exam_id, request.exam_id, request.student_answers)
         
-        logger.info(f"Graded exam {exam_id}: {final_score}% ({correct_count}/{len(questions)} correct)")
-        
-        return GradeResponse(
-            exam_id=exam_id,
-            question_grades=question_grades,
-            final_score=final_score,
-            total_questions=len(questions),
-            correct_answers=correct_count
+        # Grade all answers concurrently using Gemini
+        logger.info(f"Grading {len(request.student_answers)} answers for exam {exam_id}")
+        question_grades = await grading_service.grade_student_answers(
+            questions,
+            request.student_answers
         )
+        return _store_grades(exam_id, questions, question_grades)
         
     except HTTPException:
         raise
@@ -292,6 +450,174 @@ async def grade_exam(exam_id: str, request: GradeRequest):
         )
 
 
+def _ndjson(record: Dict[str, Any]) -> str:
+    return json.dumps(record, ensure_ascii=False) + "\n"
+
+
+@router.post("/{exam_id}/grade/stream")
+async def grade_exam_stream(exam_id: str, request: GradeRequest):
+    """
+    Grade student answers, streaming each result as soon as it is ready.
+    
+    The response is newline-delimited JSON. Each line has a "type":
+    - "grade": one QuestionGrade (fields inline), in completion order
+    - "error": an answer that could not be graded (question_index, detail)
+    - "summary": the last line on success; same fields as the grade response
+      without question_grades. Results are stored as by POST /{exam_id}/grade
+    - "failed": the last line when any answer failed (detail); nothing is stored
+    """
+    questions = _questions_for_grading(exam_id, request.exam_id, request.student_answers)
+    student_answers = request.student_answers
+    logger.info(f"Streaming grades for {len(student_answers)} answers of exam {exam_id}")
+    
+    async def records():
+        question_grades: List[Optional[QuestionGrade]] = [None] * len(student_answers)
+        errors = []
+        try:
+            async for i, result in grading_service.iter_student_grades(questions, student_answers):
+                if isinstance(result, BaseException):
+                    question_index = student_answers[i].question_index
+                    logger.error(f"Failed to grade question {question_index}: {str(result)}")
+                    errors.append(f"question {question_index}: {str(result)}")
+                    yield _ndjson({"type": "error", "question_index": question_index, "detail": str(result)})
+                else:
+                    question_grades[i] = result
+                    yield _ndjson({"type": "grade", **result.model_dump()})
+            
+            if errors:
+                detail = f"Failed to grade {len(errors)} of {len(student_answers)} answers - " + "; ".join(errors)
+                yield _ndjson({"type": "failed", "detail": detail})
+                return
+            
+            response = _store_grades(exam_id, questions, question_grades)
+            yield _ndjson({"type": "summary", **response.model_dump(exclude={"question_grades"})})
+        except Exception as e:
+            logger.error(f"Error streaming grades for exam {exam_id}: {str(e)}")
+            yield _ndjson({"type": "failed", "detail": f"Failed to grade exam: {str(e)}"})
+    
+    return StreamingResponse(
+        records(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/{exam_id}/grade/bulk", response_model=BulkGradeResponse)
+async def grade_exam_bulk(exam_id: str, request: BulkGradeRequest):
+    """
+    Grade a whole class against one parsed exam.
+    
+    All students' answers share one concurrency-limited grading pool, and
+    identical answers are graded once. Each student's results are stored
+    under their student_id (see GET /{exam_id}/students/{student_id}/results);
+    a student whose answers could not all be graded is reported with an
+    error and nothing is stored for them.
+    """
+    submissions = request.submissions
+    if len(submissions) > settings.GRADING_BULK_MAX_STUDENTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many submissions: {len(submissions)}. Maximum is {settings.GRADING_BULK_MAX_STUDENTS} per request."
+        )
+    student_counts = Counter(submission.student_id for submission in submissions)
+    duplicates = sorted(student_id for student_id, count in student_counts.items() if count > 1)
+    if duplicates:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Duplicate student IDs: {', '.join(duplicates)}"
+        )
+    questions = _questions_for_grading(exam_id, request.exam_id, [])
+    
+    # A submission with out-of-range indices fails on its own; the rest are still graded
+    index_errors = {
+        submission.student_id: _question_index_error(submission.student_answers, questions)
+        for submission in submissions
+    }
+    valid_submissions = [submission for submission in submissions if not index_errors[submission.student_id]]
+    
+    try:
+        started = time.perf_counter()
+        outcomes, unique_answers = await grading_service.grade_class(
+            questions,
+            [submission.student_answers for submission in valid_submissions]
+        )
+        elapsed = time.perf_counter() - started
+    except Exception as e:
+        logger.error(f"Error bulk grading exam {exam_id}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to grade exam: {str(e)}"
+        )
+    
+    outcomes_by_student = {
+        submission.student_id: outcome for submission, outcome in zip(valid_submissions, outcomes)
+    }
+    summaries = []
+    student_results = {}
+    for submission in submissions:
+        total_answers = len(submission.student_answers)
+        outcome = outcomes_by_student.get(submission.student_id, ValueError(index_errors[submission.student_id]))
+        if isinstance(outcome, ValueError):
+            summaries.append(StudentGradeSummary(
+                student_id=submission.student_id,
+                total_answers=total_answers,
+                error=str(outcome)
+            ))
+            continue
+        results = _score(outcome)
+        student_results[submission.student_id] = results
+        summaries.append(StudentGradeSummary(
+            student_id=submission.student_id,
+            final_score=results["final_score"],
+            correct_answers=results["correct_count"],
+            total_answers=total_answers,
+            local_resolution_rate=results["local_resolution_rate"]
+        ))
+    if student_results:
+        storage.store_student_results(exam_id, student_results)
+    
+    total_answers = sum(len(submission.student_answers) for submission in submissions)
+    answers_per_second = total_answers / elapsed if elapsed > 0 else 0.0
+    logger.info(
+        f"Bulk graded exam {exam_id}: {len(student_results)}/{len(submissions)} students, "
+        f"{total_answers} answers ({unique_answers} distinct) in {elapsed:.2f}s ({answers_per_second:.1f} answers/s)"
+    )
+    
+    return BulkGradeResponse(
+        exam_id=exam_id,
+        students=summaries,
+        graded_students=len(student_results),
+        failed_students=len(submissions) - len(student_results),
+        total_answers=total_answers,
+        unique_answers=unique_answers,
+        elapsed_seconds=round(elapsed, 3),
+        answers_per_second=round(answers_per_second, 2)
+    )
+
+
+@router.get("/{exam_id}/students/{student_id}/results", response_model=GradeResponse)
+async def get_student_results(exam_id: str, student_id: str):
+    """
+    Get one student's results from a bulk grade request.
+    """
+    results = storage.get_student_results(exam_id).get(student_id)
+    if not results:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No results found for student {student_id} in exam {exam_id}"
+        )
+    
+    questions = storage.get_parsed_questions(exam_id) or []
+    return GradeResponse(
+        exam_id=exam_id,
+        question_grades=results["question_grades"],
+        final_score=results["final_score"],
+        total_questions=len(questions),
+        correct_answers=results["correct_count"],
+        local_resolution_rate=results.get("local_resolution_rate")
+    )
+
+
 @router.get("/{exam_id}/text")
 async def get_extracted_text(exam_id: str):
     """
@@ -304,7 +630,7 @@ async def get_extracted_text(exam_id: str):
             detail=f"Exam {exam_id} not found"
         )
     
-    extracted_text = exam.get("extracted_text", "")
+    extracted_text = exam.get("extracted_text") or ""
     return {
         "exam_id": exam_id,
         "text_length": len(extracted_text),
@@ -337,7 +663,8 @@ async def get_results(exam_id: str):
         question_grades=results["question_grades"],
         final_score=results["final_score"],
         total_questions=len(questions),
-        correct_answers=results["correct_count"]
+        correct_answers=results["correct_count"],
+        local_resolution_rate=results.get("local_resolution_rate")
     )
 
 
@@ -355,13 +682,20 @@ async def get_exam_status(exam_id: str):
     
     questions = storage.get_parsed_questions(exam_id)
     results = storage.get_results(exam_id)
+    extracted_text = exam.get("extracted_text") or ""
+    job_status = exam.get("status") or {}
     
     status_info = {
         "exam_id": exam_id,
         "uploaded": True,
         "file_type": exam.get("file_type"),
-        "text_extracted": bool(exam.get("extracted_text")),
-        "text_length": len(exam.get("extracted_text", "")),
+        "state": job_status.get("state", exam_jobs.DONE),
+        "progress": job_status.get("progress"),
+        "error": job_status.get("error"),
+        "failed_stage": job_status.get("failed_stage"),
+        "timestamps": job_status.get("timestamps", {}),
+        "text_extracted": bool(extracted_text),
+        "text_length": len(extracted_text),
         "parsed": bool(questions),
         "questions_count": len(questions) if questions else 0,
         "graded": bool(results),
@@ -376,4 +710,3 @@ async def get_exam_status(exam_id: str):
         status_info["processing_stage"] = "graded"
     
     return status_info
-
@@ -2,6 +2,8 @@
 Health check endpoints.
 """
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.services import grading_service, ocr_executor, parsing_service, rate_limiter, storage
 
 router = APIRouter()
 
@@ -11,3 +13,38 @@ async def health_check():
     """Health check endpoint."""
     return {"status": "healthy", "service": "exam-grading-api"}
 
+
+@router.get("/ready")
+async def readiness_check():
+    """
+    Readiness check: 200 once OCR models are loaded and warmed, 503 before.
+    
+    Point load balancer health checks here so cold workers get no traffic.
+    """
+    readiness = ocr_executor.get_readiness()
+    return JSONResponse(status_code=200 if readiness["ready"] else 503, content=readiness)
+
+
+@router.get("/health/caches")
+def cache_stats():
+    """Hit rates and sizes of the result caches."""
+    caches = {
+        "grade": grading_service.get_grade_cache(),
+        "ocr": ocr_executor.get_ocr_cache(),
+        "parse": parsing_service.get_parse_cache()
+    }
+    stats = {name: cache.stats() if cache is not None else None for name, cache in caches.items()}
+    stats["parse_in_flight"] = parsing_service.get_parse_flights().stats()
+    return stats
+
+
+@router.get("/health/storage")
+async def storage_stats():
+    """Exam storage size and eviction statistics."""
+    return storage.get_stats()
+
+
+@router.get("/health/gemini")
+async def gemini_stats():
+    """Gemini call, throttling and retry counters."""
+    return rate_limiter.get_gemini_limiter().stats()
@@ -0,0 +1,237 @@
+"""
+Content-addressed on-disk store for raw upload bytes.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Set, Tuple
+from app.config import settings
+
+try:
+    import zstandard
+except ImportError:  # optional: only needed for BLOB_COMPRESSION=zstd
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Bytes copied per step by put_file
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# Shared blob store (lazy loading)
+_blob_store: Optional["BlobStore"] = None
+
+
+class BlobStore:
+    """
+    Immutable blobs stored once per SHA-256 under root/ab/cd/<digest>.
+
+    Writes are atomic (temp file + rename), so concurrent uploads of the
+    same file are safe. Blobs may be zstd-compressed on disk (stored with
+    a .zst suffix). Storing a blob that already exists refreshes its
+    modification time, which sweep() uses as a grace period.
+    """
+
+    def __init__(self, root: str, compression: str = "none", zstd_level: int = 3):
+        self.root = root
+        self.compression = compression.lower()
+        self.zstd_level = zstd_level
+        if self.compression == "zstd" and zstandard is None:
+            logger.warning("BLOB_COMPRESSION=zstd but the zstandard package is not installed; storing uncompressed")
+            self.compression = "none"
+        elif self.compression not in ("none", "zstd"):
+            raise ValueError(f"Unknown BLOB_COMPRESSION: {compression}. Use 'none' or 'zstd'")
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, digest: str) -> str:
+        if len(digest) != 64 or not all(c in "0123456789abcdef" for c in digest):
+            raise ValueError(f"Invalid blob reference: {digest}")
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def _existing_path(self, digest: str) -> Optional[str]:
+        path = self._path(digest)
+        for candidate in (path, path + ".zst"):
+            if os.path.exists(candidate):
+                return candidate
+        return None
+
+    def _refresh(self, digest: str) -> bool:
+        """Mark an existing blob as just stored; False if there is none."""
+        path = self._existing_path(digest)
+        if path is None:
+            return False
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False  # swept in the meantime
+        return True
+
+    def put(self, data: bytes, digest: Optional[str] = None) -> str:
+        """
+        Store data and return its reference (the SHA-256 hex digest).
+
+        Args:
+            data: Blob contents
+            digest: SHA-256 of data, if already computed
+        """
+        digest = digest or hashlib.sha256(data).hexdigest()
+        if self._refresh(digest):
+            return digest
+
+        path = self._path(digest)
+        payload = data
+        if self.compression == "zstd":
+            path += ".zst"
+            payload = zstandard.ZstdCompressor(level=self.zstd_level).compress(data)
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                temp_file.write(payload)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        logger.debug(f"Stored blob {digest[:12]} ({len(data)} bytes, {len(payload)} on disk)")
+        return digest
+
+    def put_file(self, file_obj: BinaryIO, digest: Optional[str] = None) -> str:
+        """
+        Store the contents of a binary file, copying it in chunks.
+
+        Args:
+            file_obj: File positioned at the start of the blob (it is read to the end)
+            digest: SHA-256 of the contents, if already computed; otherwise it is
+                computed during the copy
+
+        Returns:
+            The blob reference (SHA-256 hex digest)
+        """
+        if digest is not None:
+            self._path(digest)
+            if self._refresh(digest):
+                return digest
+
+        staging = os.path.join(self.root, ".staging")
+        os.makedirs(staging, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=staging, prefix=".tmp-")
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                writer = temp_file
+                if self.compression == "zstd":
+                    writer = zstandard.ZstdCompressor(level=self.zstd_level).stream_writer(temp_file, closefd=False)
+                while True:
+                    chunk = file_obj.read(COPY_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    size += len(chunk)
+                    writer.write(chunk)
+                if writer is not temp_file:
+                    writer.close()
+            digest = digest or hasher.hexdigest()
+            path = self._path(digest) + (".zst" if self.compression == "zstd" else "")
+            if self._refresh(digest):
+                os.remove(temp_path)
+                return digest
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        logger.debug(f"Stored blob {digest[:12]} ({size} bytes, streamed)")
+        return digest
+
+    def get(self, digest: str) -> Optional[bytes]:
+        """Read a blob back, or None if it does not exist."""
+        path = self._existing_path(digest)
+        if path is None:
+            return None
+        with open(path, "rb") as blob_file:
+            if path.endswith(".zst"):
+                if zstandard is None:
+                    raise ValueError("Blob is zstd-compressed but the zstandard package is not installed")
+                # Streamed blobs do not record their size, so decompress as a stream
+                with zstandard.ZstdDecompressor().stream_reader(blob_file, closefd=False) as reader:
+                    return reader.readall()
+            return blob_file.read()
+
+    def exists(self, digest: str) -> bool:
+        """Whether a blob is stored."""
+        return self._existing_path(digest) is not None
+
+    def delete(self, digest: str):
+        """Remove a blob if present."""
+        path = self._existing_path(digest)
+        if path is not None:
+            os.remove(path)
+
+    def _iter_files(self) -> Iterator[Tuple[str, Optional[str]]]:
+        """Yield (path, digest) for every file; digest is None for leftover temp files."""
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                if filename.startswith(".tmp-") or directory.endswith(".staging"):
+                    yield path, None
+                else:
+                    yield path, filename[:-len(".zst")] if filename.endswith(".zst") else filename
+
+    def sweep(self, live_refs: Set[str], min_age_seconds: float = 0) -> int:
+        """
+        Delete blobs no exam references any more.
+
+        Blobs and leftover temp files modified within min_age_seconds are
+        kept, so uploads stored but not yet registered survive a sweep.
+
+        Args:
+            live_refs: References held by stored exams
+            min_age_seconds: Grace period since a blob was last stored
+
+        Returns:
+            Number of files removed
+        """
+        cutoff = time.time() - max(0, min_age_seconds)
+        removed = 0
+        for path, digest in self._iter_files():
+            if digest in live_refs:
+                continue
+            try:
+                if os.path.getmtime(path) > cutoff:
+                    continue
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            removed += 1
+        if removed:
+            logger.info(f"Swept {removed} unreferenced blob files")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the number of blobs and bytes on disk."""
+        count = 0
+        disk_bytes = 0
+        for path, digest in self._iter_files():
+            if digest is None:
+                continue
+            count += 1
+            disk_bytes += os.path.getsize(path)
+        return {"blobs": count, "disk_bytes": disk_bytes, "compression": self.compression}
+
+
+def get_blob_store() -> BlobStore:
+    """Get or initialize the shared blob store."""
+    global _blob_store
+    if _blob_store is None:
+        _blob_store = BlobStore(
+            settings.BLOB_STORE_PATH,
+            compression=settings.BLOB_COMPRESSION,
+            zstd_level=settings.BLOB_ZSTD_LEVEL
+        )
+    return _blob_store
@@ -0,0 +1,393 @@
+"""
+Two-tier cache: in-memory LRU in front of an on-disk SQLite store.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(*parts: Any) -> str:
+    """Build a stable SHA-256 cache key from JSON-serializable parts."""
+    payload = json.dumps(parts, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TieredCache:
+    """
+    Thread-safe cache of JSON-serializable values.
+
+    Lookups check an in-memory LRU first, then SQLite (if a path is given).
+    Entries expire after ttl_seconds and the oldest-accessed entries are
+    evicted once max_entries (or max_bytes of stored values) is exceeded.
+
+    The memory tier and the SQLite connection have separate locks, so the
+    async accessors can serve memory hits on the event loop while disk
+    reads and writes run in a worker thread.
+    """
+
+    # Keys per SQLite lookup (below SQLite's bound parameter limit)
+    DISK_LOOKUP_BATCH = 500
+
+    def __init__(
+        self,
+        name: str,
+        db_path: Optional[str] = None,
+        memory_entries: int = 1024,
+        max_entries: int = 100000,
+        ttl_seconds: Optional[float] = None,
+        max_bytes: Optional[int] = None
+    ):
+        self.name = name
+        self.db_path = db_path
+        self.memory_entries = max(0, memory_entries)
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        self.max_bytes = max_bytes if max_bytes and max_bytes > 0 else None
+
+        # Memory tier and counters; never held while waiting for _db_lock
+        self._lock = threading.Lock()
+        # SQLite connection; may take _lock briefly while held
+        self._db_lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writes_since_prune = 0
+        self._bytes_since_prune = 0
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "sets": 0,
+            "evictions": 0,
+            "expirations": 0
+        }
+
+        if db_path:
+            self._open_db(db_path)
+
+    def _open_db(self, db_path: str):
+        """Open (or create) the SQLite tier."""
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache(accessed_at)")
+        logger.info(f"Opened {self.name} cache at {db_path}")
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, created_at: float, value: Any):
+        """Insert into the memory tier, evicting the least recently used entry (_lock held)."""
+        if self.memory_entries == 0:
+            return
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+            if self._conn is None:
+                self._counters["evictions"] += 1
+
+    def _get_from_memory(self, keys: List[str], now: float) -> Dict[str, Any]:
+        """Memory-tier hits among keys; counts hits, and misses when there is no disk tier."""
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._memory.get(key)
+                if entry is None:
+                    continue
+                created_at, value = entry
+                if self._is_expired(created_at, now):
+                    del self._memory[key]
+                    self._counters["expirations"] += 1
+                    continue
+                self._memory.move_to_end(key)
+                found[key] = value
+            self._counters["hits"] += len(found)
+            self._counters["memory_hits"] += len(found)
+            if self._conn is None:
+                self._counters["misses"] += len(set(keys) - found.keys())
+        return found
+
+    def _get_from_disk(self, keys: List[str], now: float) -> Dict[str, Any]:
+        """SQLite-tier lookups for keys missing from memory (blocking)."""
+        found = {}
+        expired = 0
+        with self._db_lock:
+            if self._conn is not None:
+                for i in range(0, len(keys), self.DISK_LOOKUP_BATCH):
+                    batch = keys[i:i + self.DISK_LOOKUP_BATCH]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = self._conn.execute(
+                        f"SELECT key, value, created_at FROM cache WHERE key IN ({placeholders})", batch
+                    ).fetchall()
+                    for key, raw_value, created_at in rows:
+                        if self._is_expired(created_at, now):
+                            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                            expired += 1
+                        else:
+                            found[key] = (created_at, json.loads(raw_value))
+                if found:
+                    self._conn.executemany(
+                        "UPDATE cache SET accessed_at = ? WHERE key = ?", [(now, key) for key in found]
+                    )
+        with self._lock:
+            for key, (created_at, value) in found.items():
+                self._remember(key, created_at, value)
+            self._counters["expirations"] += expired
+            self._counters["hits"] += len(found)
+            self._counters["disk_hits"] += len(found)
+            self._counters["misses"] += len(set(keys) - found.keys())
+        return {key: value for key, (_, value) in found.items()}
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None on a miss."""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Look up several keys at once; returns the hits by key."""
+        now = time.time()
+        found = self._get_from_memory(keys, now)
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if missing and self._conn is not None:
+            found.update(self._get_from_disk(missing, now))
+        return found
+
+    async def get_async(self, key: str) -> Optional[Any]:
+        """Like get(), but SQLite lookups run in a worker thread."""
+        return (await self.get_many_async([key])).get(key)
+
+    async def get_many_async(self, keys: List[str]) -> Dict[str, Any]:
+        """Like get_many(): memory hits on the loop, one worker-thread trip for the disk tier."""
+        now = time.time()
+        found = self._get_from_memory(keys, now)
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if missing and self._conn is not None:
+            found.update(await asyncio.to_thread(self._get_from_disk, missing, now))
+        return found
+
+    def set(self, key: str, value: Any):
+        """Store a JSON-serializable value."""
+        self.set_many({key: value})
+
+    def set_many(self, items: Dict[str, Any]):
+        """Store several JSON-serializable values."""
+        now = time.time()
+        self._set_in_memory(items, now)
+        if self._conn is not None:
+            self._set_on_disk(items, now)
+
+    async def set_async(self, key: str, value: Any):
+        """Like set(), but the SQLite write runs in a worker thread."""
+        await self.set_many_async({key: value})
+
+    async def set_many_async(self, items: Dict[str, Any]):
+        """Like set_many(), with one worker-thread trip for the SQLite writes."""
+        now = time.time()
+        self._set_in_memory(items, now)
+        if self._conn is not None and items:
+            await asyncio.to_thread(self._set_on_disk, items, now)
+
+    def _set_in_memory(self, items: Dict[str, Any], now: float):
+        with self._lock:
+            for key, value in items.items():
+                self._remember(key, now, value)
+            self._counters["sets"] += len(items)
+
+    def _set_on_disk(self, items: Dict[str, Any], now: float):
+        """Write entries to SQLite, pruning every so often (blocking)."""
+        rows = [(key, json.dumps(value, ensure_ascii=False), now, now) for key, value in items.items()]
+        with self._db_lock:
+            if self._conn is None:
+                return
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)", rows
+            )
+            self._writes_since_prune += len(rows)
+            self._bytes_since_prune += sum(len(row[1]) for row in rows)
+            # Large values (e.g. OCR text) trigger pruning well before 100 writes
+            if self._writes_since_prune >= 100 or (
+                self.max_bytes is not None and self._bytes_since_prune * 10 >= self.max_bytes
+            ):
+                self._prune(now)
+
+    def _count(self, counter: str, amount: int):
+        with self._lock:
+            self._counters[counter] += amount
+
+    def _prune(self, now: float):
+        """Drop expired entries and enforce the disk tier size limits (_db_lock held)."""
+        self._writes_since_prune = 0
+        self._bytes_since_prune = 0
+        if self.ttl_seconds is not None:
+            cursor = self._conn.execute("DELETE FROM cache WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._count("expirations", max(cursor.rowcount, 0))
+        count = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)",
+                (overflow,)
+            )
+            self._count("evictions", overflow)
+            logger.info(f"Evicted {overflow} entries from {self.name} cache")
+        if self.max_bytes is not None:
+            self._prune_bytes()
+
+    def _disk_bytes(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(LENGTH(CAST(value AS BLOB))), 0) FROM cache").fetchone()[0]
+
+    def _prune_bytes(self):
+        """Evict the oldest-accessed entries until stored values fit in max_bytes (_db_lock held)."""
+        overflow = self._disk_bytes() - self.max_bytes
+        if overflow <= 0:
+            return
+        evicted = []
+        rows = self._conn.execute("SELECT key, LENGTH(CAST(value AS BLOB)) FROM cache ORDER BY accessed_at")
+        for key, size in rows:
+            if overflow <= 0:
+                break
+            evicted.append((key,))
+            overflow -= size
+        self._conn.executemany("DELETE FROM cache WHERE key = ?", evicted)
+        with self._lock:
+            for (key,) in evicted:
+                self._memory.pop(key, None)
+            self._counters["evictions"] += len(evicted)
+        logger.info(f"Evicted {len(evicted)} entries from {self.name} cache to stay under {self.max_bytes} bytes")
+
+    def prune(self):
+        """Force expiry and size eviction now."""
+        with self._db_lock:
+            if self._conn is not None:
+                self._prune(time.time())
+
+    def clear(self):
+        """Remove all entries from both tiers."""
+        with self._db_lock:
+            with self._lock:
+                self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM cache")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current sizes."""
+        with self._db_lock:
+            disk = None
+            if self._conn is not None:
+                disk = (self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0], self._disk_bytes())
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        if disk is not None:
+            stats["disk_entries"], stats["disk_bytes"] = disk
+        stats["name"] = self.name
+        return stats
+
+    def close(self):
+        """Close the SQLite connection."""
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait for and share its result (or exception). Works across
+    threads and event loops.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self._counters = {"calls": 0, "coalesced": 0}
+
+    def _claim(self, key: str) -> Tuple[Future, bool]:
+        """Return the in-flight future for key and whether this caller must run it."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self._counters["coalesced"] += 1
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            self._counters["calls"] += 1
+            return future, True
+
+    def _run(self, key: str, future: Future, fn: Callable, args: tuple):
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def _settle(self, key: str, future: Future, task: "asyncio.Future"):
+        """Copy a finished task's outcome to the shared future."""
+        if task.cancelled():
+            future.set_exception(asyncio.CancelledError())
+        elif task.exception() is not None:
+            future.set_exception(task.exception())
+        else:
+            future.set_result(task.result())
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def do(self, key: str, fn: Callable, *args) -> Any:
+        """Run fn(*args) once per key among concurrent callers, blocking until done."""
+        future, leader = self._claim(key)
+        if leader:
+            self._run(key, future, fn, args)
+        elif not future.done():
+            logger.info(f"Waiting for in-flight {self.name} call")
+        return future.result()
+
+    async def do_async(self, key: str, fn: Callable, *args, executor: Optional[Executor] = None) -> Any:
+        """
+        Like do(), but awaits the shared result.
+
+        Coroutine functions run as a task on the current loop (so a cancelled
+        leader does not cancel the shared call); plain functions run on executor.
+        """
+        future, leader = self._claim(key)
+        if leader and asyncio.iscoroutinefunction(fn):
+            task = asyncio.ensure_future(fn(*args))
+            task.add_done_callback(lambda done: self._settle(key, future, done))
+        elif leader:
+            asyncio.get_running_loop().run_in_executor(executor, self._run, key, future, fn, args)
+        elif not future.done():
+            logger.info(f"Waiting for in-flight {self.name} call")
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return call counters and the number of calls in flight."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["in_flight"] = len(self._calls)
+            stats["name"] = self.name
+            return stats
@@ -0,0 +1,186 @@
+"""
+Background job pipeline for uploaded exams: OCR and optional parsing.
+"""
+import logging
+import queue
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from app.config import settings
+from app.services import ocr_executor, parsing_service, storage
+
+logger = logging.getLogger(__name__)
+
+# Job states, in pipeline order
+QUEUED = "queued"
+RENDERING = "rendering"
+OCR = "ocr"
+PARSING = "parsing"
+DONE = "done"
+FAILED = "failed"
+
+# Work queue and worker threads (lazy loading)
+_job_queue: Optional[queue.Queue] = None
+_workers: List[threading.Thread] = []
+_workers_lock = threading.Lock()
+
+
+class JobQueueFullError(Exception):
+    """Raised when the job queue cannot accept more uploads."""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def new_job_status() -> Dict[str, Any]:
+    """Initial status record for a freshly uploaded exam."""
+    return {
+        "state": QUEUED,
+        "progress": None,
+        "error": None,
+        "failed_stage": None,
+        "timestamps": {QUEUED: _now()}
+    }
+
+
+def _set_state(exam_id: str, state: str, **details):
+    """Move an exam to a new state, stamping the time the state was entered."""
+    exam = storage.get_exam(exam_id)
+    if not exam:
+        return
+    status = dict(exam.get("status") or new_job_status())
+    timestamps = dict(status.get("timestamps") or {})
+    if status.get("state") != state:
+        timestamps[state] = _now()
+    status.update(details)
+    status["state"] = state
+    status["timestamps"] = timestamps
+    storage.update_exam(exam_id, status=status)
+
+
+def _ensure_workers() -> queue.Queue:
+    """Start the worker threads on first use."""
+    global _job_queue
+    with _workers_lock:
+        if _job_queue is None:
+            _job_queue = queue.Queue(maxsize=settings.JOB_QUEUE_MAX_SIZE)
+        alive = [worker for worker in _workers if worker.is_alive()]
+        for i in range(len(alive), max(1, settings.JOB_WORKERS)):
+            worker = threading.Thread(target=_worker_loop, name=f"exam-job-{i}", daemon=True)
+            worker.start()
+            alive.append(worker)
+        _workers[:] = alive
+        return _job_queue
+
+
+def _worker_loop():
+    """Pull jobs off the queue forever."""
+    while True:
+        job = _job_queue.get()
+        try:
+            process_exam_job(**job)
+        except Exception as e:
+            logger.error(f"Unexpected error in exam job {job.get('exam_id')}: {str(e)}", exc_info=True)
+        finally:
+            _job_queue.task_done()
+
+
+def submit_exam_job(
+    exam_id: str,
+    file_extension: str,
+    auto_parse: bool = False,
+    file_hash: Optional[str] = None
+):
+    """
+    Queue an uploaded exam for background OCR (and optional parsing).
+
+    The job carries only the exam ID; the worker reads the file from the
+    blob store, so queued uploads do not hold their bytes in memory.
+
+    Raises:
+        JobQueueFullError: If JOB_QUEUE_MAX_SIZE jobs are already waiting
+    """
+    job_queue = _ensure_workers()
+    try:
+        job_queue.put_nowait({
+            "exam_id": exam_id,
+            "file_extension": file_extension,
+            "auto_parse": auto_parse,
+            "file_hash": file_hash
+        })
+    except queue.Full:
+        raise JobQueueFullError(f"Processing queue is full ({settings.JOB_QUEUE_MAX_SIZE} exams waiting)")
+    logger.info(f"Queued exam {exam_id} for processing ({job_queue.qsize()} waiting)")
+
+
+def queue_depth() -> int:
+    """Number of jobs waiting for a worker."""
+    return _job_queue.qsize() if _job_queue is not None else 0
+
+
+def _too_little_text_error(text_length: int) -> str:
+    error_detail = f"Failed to extract text from file. Only {text_length} characters extracted. "
+    error_detail += "This might indicate: 1) The file is not readable, 2) OCR failed to detect text, "
+    error_detail += "3) The file format is not supported. Please try: "
+    error_detail += "- Using a clearer image file (.png, .jpg) with good contrast, "
+    error_detail += "- Using a text file (.txt) if possible, "
+    error_detail += "- Ensuring the text in the image is clear and not too small."
+    return error_detail
+
+
+def process_exam_job(
+    exam_id: str,
+    file_extension: str,
+    auto_parse: bool = False,
+    file_hash: Optional[str] = None
+):
+    """
+    Run the upload pipeline for one exam: render -> OCR -> (parse).
+
+    Progress and failures are recorded in the exam's status; nothing is raised.
+    """
+    stage = OCR
+
+    def on_progress(ocr_stage: str, pages_done: int, pages_total: int):
+        nonlocal stage
+        stage = ocr_stage
+        progress = {"page": pages_done, "total": pages_total} if ocr_stage == OCR else None
+        _set_state(exam_id, ocr_stage, progress=progress)
+
+    try:
+        file_bytes = storage.get_exam_file(exam_id)
+        if file_bytes is None:
+            raise ValueError(f"Uploaded file for exam {exam_id} is missing from the blob store")
+        
+        logger.info(f"Extracting text for exam {exam_id} ({file_extension})")
+        extracted_text = ocr_executor.extract_text_with_progress(
+            file_bytes,
+            file_extension,
+            on_progress,
+            file_hash=file_hash
+        )
+
+        text_length = len(extracted_text.strip()) if extracted_text else 0
+        logger.info(f"Extracted {text_length} characters for exam {exam_id}")
+        if not extracted_text or text_length < 10:
+            raise ValueError(_too_little_text_error(text_length))
+        if text_length < 100:
+            logger.warning(f"Warning: Only {text_length} characters extracted. This might not be enough to parse questions.")
+        storage.update_exam(exam_id, extracted_text=extracted_text)
+
+        if auto_parse:
+            stage = PARSING
+            _set_state(exam_id, PARSING, progress=None)
+            questions = parsing_service.parse_exam_text(extracted_text)
+            if not questions:
+                raise ValueError("No questions found in the extracted text")
+            storage.store_parsed_questions(exam_id, questions)
+            logger.info(f"Auto-parsed {len(questions)} questions for exam {exam_id}")
+
+        _set_state(exam_id, DONE, progress=None)
+        logger.info(f"Exam {exam_id} processed successfully")
+
+    except Exception as e:
+        logger.error(f"Processing exam {exam_id} failed during {stage}: {str(e)}")
+        _set_state(exam_id, FAILED, error=str(e), failed_stage=stage)
@@ -1,29 +1,156 @@
 """
 Gemini API service for exam parsing and answer grading.
 """
+import asyncio
 import json
 import logging
-from typing import List, Dict, Any
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import List, Dict, Any, Optional, Tuple, Union
 import google.generativeai as genai
 from app.config import settings
 from app.models import QuestionAnswer, QuestionGrade
+from app.services.rate_limiter import get_gemini_limiter
 
 logger = logging.getLogger(__name__)
 
 # Initialize Gemini client
 genai.configure(api_key=settings.GEMINI_API_KEY)
 
+# Long-lived model objects by model name, shared by blocking and async calls.
+# The library itself keeps one sync and one async API client per process.
+_models: Dict[str, genai.GenerativeModel] = {}
+_models_lock = threading.Lock()
 
-def parse_exam_text(text: str) -> List[QuestionAnswer]:
+# Runs blocking calls so they can be abandoned after GEMINI_TIMEOUT_SECONDS;
+# the pinned client library has no per-request timeout
+_call_executor: Optional[ThreadPoolExecutor] = None
+
+# Bump whenever grading prompts change so cached grades are not reused
+GRADING_PROMPT_VERSION = "1"
+
+# Bump whenever the exam parsing prompt changes so cached parses are not reused
+PARSING_PROMPT_VERSION = "1"
+
+# Shared by single and batch grading prompts
+SCORING_GUIDELINES = """SCORING GUIDELINES:
+- 100: Perfect match or equivalent correct answer
+- 80-99: Mostly correct with minor issues
+- 60-79: Partially correct
+- 40-59: Some relevant content but mostly incorrect
+- 20-39: Minimal relevant content
+- 0-19: Completely incorrect or no answer"""
+
+# Fixed prompt overhead per batch call and per-item output allowance (tokens)
+BATCH_PROMPT_OVERHEAD_TOKENS = 400
+BATCH_OUTPUT_TOKENS_PER_ITEM = 80
+
+# Output tokens budgeted for calls without an explicit max_output_tokens
+DEFAULT_OUTPUT_TOKENS = 256
+
+
+def _strip_code_fences(response_text: str) -> str:
+    """Remove markdown code blocks around a JSON response."""
+    response_text = response_text.strip()
+    if response_text.startswith("```json"):
+        response_text = response_text[7:]
+    if response_text.startswith("```"):
+        response_text = response_text[3:]
+    if response_text.endswith("```"):
+        response_text = response_text[:-3]
+    return response_text.strip()
+
+
+def _normalize_grade_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate and normalize a raw grading result from Gemini."""
+    score = float(result.get("score", 0))
+    score = max(0, min(100, score))  # Clamp between 0-100
+    is_correct = bool(result.get("is_correct", False)) or score == 100
+    explanation = result.get("explanation", "No explanation provided")
+    
+    return {
+        "score": score,
+        "is_correct": is_correct,
+        "explanation": explanation
+    }
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the token count of a text (~4 characters per token)."""
+    return len(text) // 4 + 1
+
+
+def get_model() -> genai.GenerativeModel:
+    """Get the shared model for GEMINI_MODEL."""
+    with _models_lock:
+        model = _models.get(settings.GEMINI_MODEL)
+        if model is None:
+            model = genai.GenerativeModel(settings.GEMINI_MODEL)
+            _models[settings.GEMINI_MODEL] = model
+        return model
+
+
+def _get_call_executor() -> ThreadPoolExecutor:
+    """Threads that run blocking Gemini calls (sized above the concurrency limit for abandoned calls)."""
+    global _call_executor
+    with _models_lock:
+        if _call_executor is None:
+            _call_executor = ThreadPoolExecutor(
+                max_workers=max(4, settings.GEMINI_MAX_CONCURRENCY * 2),
+                thread_name_prefix="gemini-call"
+            )
+        return _call_executor
+
+
+def _timeout_error() -> TimeoutError:
+    return TimeoutError(f"Gemini call timed out after {settings.GEMINI_TIMEOUT_SECONDS}s")
+
+
+def _estimate_call_tokens(prompt: str, generation_config: Optional[Any]) -> int:
+    """Tokens a call counts against the per-minute quota (prompt plus output allowance)."""
+    max_output_tokens = getattr(generation_config, "max_output_tokens", None) or DEFAULT_OUTPUT_TOKENS
+    return estimate_tokens(prompt) + max_output_tokens
+
+
+def generate(prompt: str, generation_config: Optional[Any] = None) -> str:
     """
-    Parse exam text into structured questions and answers using Gemini.
+    Send a prompt to Gemini and return the response text.
     
-    Args:
-        text: Raw OCR-extracted text from exam
-        
-    Returns:
-        List of QuestionAnswer objects
+    Calls are rate limited, concurrency limited and retried on quota and
+    server errors (including timeouts after GEMINI_TIMEOUT_SECONDS) by the
+    shared limiter.
     """
+    def call() -> str:
+        future = _get_call_executor().submit(
+            lambda: get_model().generate_content(prompt, generation_config=generation_config).text
+        )
+        try:
+            return future.result(timeout=settings.GEMINI_TIMEOUT_SECONDS)
+        except FutureTimeoutError:
+            future.cancel()
+            raise _timeout_error()
+    
+    return get_gemini_limiter().call(call, tokens=_estimate_call_tokens(prompt, generation_config))
+
+
+async def generate_async(prompt: str, generation_config: Optional[Any] = None) -> str:
+    """Send a prompt to Gemini without blocking the event loop (see generate)."""
+    async def call() -> str:
+        try:
+            response = await asyncio.wait_for(
+                get_model().generate_content_async(prompt, generation_config=generation_config),
+                timeout=settings.GEMINI_TIMEOUT_SECONDS
+            )
+        except asyncio.TimeoutError:
+            raise _timeout_error()
+        return response.text
+    
+    return await get_gemini_limiter().call_async(call, tokens=_estimate_call_tokens(prompt, generation_config))
+
+
+def _build_parse_prompt(text: str) -> str:
+    """Validate exam text and build the parsing prompt."""
     if not settings.GEMINI_API_KEY:
         raise ValueError("GEMINI_API_KEY not configured")
     
@@ -36,7 +163,7 @@ def parse_exam_text(text: str) -> List[QuestionAnswer]:
         logger.warning(f"Exam text is too short: {len(text)} characters")
         raise ValueError("Exam text is too short or empty. Please ensure the file contains readable exam content.")
     
-    prompt = f"""You are an expert at parsing exam documents. Extract all questions and their correct answers from the following exam text.
+    return f"""You are an expert at parsing exam documents. Extract all questions and their correct answers from the following exam text.
 
 EXAM TEXT:
 {text}
@@ -70,101 +197,109 @@ IMPORTANT:
 
 JSON OUTPUT:"""
 
-    try:
-        model = genai.GenerativeModel(settings.GEMINI_MODEL)
-        logger.info(f"Sending request to Gemini API using model: {settings.GEMINI_MODEL}")
-        
-        # Configure generation with timeout and retry
-        generation_config = genai.types.GenerationConfig(
-            temperature=0.1,
-            max_output_tokens=8192,
-        )
-        
-        response = model.generate_content(
-            prompt,
-            generation_config=generation_config,
-            request_options={'timeout': 30}
-        )
-        
-        # Extract JSON from response
-        response_text = response.text.strip()
-        logger.debug(f"Raw Gemini response (first 500 chars): {response_text[:500]}")
-        
-        # Remove markdown code blocks if present
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.startswith("```"):
-            response_text = response_text[3:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-        response_text = response_text.strip()
-        
-        # Try to extract JSON if there's extra text
-        # Look for JSON array pattern
-        json_start = response_text.find('[')
-        json_end = response_text.rfind(']')
-        if json_start != -1 and json_end != -1 and json_end > json_start:
-            response_text = response_text[json_start:json_end+1]
-        
-        # Parse JSON
-        parsed_data = json.loads(response_text)
-        
-        if not isinstance(parsed_data, list):
-            logger.error(f"Expected JSON array but got: {type(parsed_data)}")
-            raise ValueError("Expected JSON array")
-        
-        logger.info(f"Gemini returned {len(parsed_data)} items in JSON array")
-        
-        questions = []
-        for i, item in enumerate(parsed_data):
-            if not isinstance(item, dict):
-                logger.warning(f"Item {i} is not a dictionary, skipping")
-                continue
-            if "question" in item and "correct_answer" in item:
-                questions.append(QuestionAnswer(
-                    question=str(item["question"]).strip(),
-                    correct_answer=str(item["correct_answer"]).strip()
-                ))
-            else:
-                logger.warning(f"Item {i} missing 'question' or 'correct_answer' keys: {item.keys()}")
-        
-        if len(questions) == 0 and len(parsed_data) > 0:
-            logger.error(f"Parsed {len(parsed_data)} items but none had valid question/answer format")
-            logger.error(f"Sample item: {parsed_data[0] if parsed_data else 'N/A'}")
-            raise ValueError("Gemini returned data but no valid questions were found. The exam format may not be recognized.")
-        
-        logger.info(f"Successfully parsed {len(questions)} questions from exam")
-        return questions
-        
-    except json.JSONDecodeError as e:
+
+def _parse_generation_config():
+    return genai.types.GenerationConfig(
+        temperature=0.1,
+        max_output_tokens=8192,
+    )
+
+
+def _questions_from_response(response_text: str) -> List[QuestionAnswer]:
+    """Turn a parsing response into QuestionAnswer objects."""
+    # Extract JSON from response
+    response_text = response_text.strip()
+    logger.debug(f"Raw Gemini response (first 500 chars): {response_text[:500]}")
+    
+    # Remove markdown code blocks if present
+    response_text = _strip_code_fences(response_text)
+    
+    # Try to extract JSON if there's extra text
+    # Look for JSON array pattern
+    json_start = response_text.find('[')
+    json_end = response_text.rfind(']')
+    if json_start != -1 and json_end != -1 and json_end > json_start:
+        response_text = response_text[json_start:json_end+1]
+    
+    # Parse JSON
+    parsed_data = json.loads(response_text)
+    
+    if not isinstance(parsed_data, list):
+        logger.error(f"Expected JSON array but got: {type(parsed_data)}")
+        raise ValueError("Expected JSON array")
+    
+    logger.info(f"Gemini returned {len(parsed_data)} items in JSON array")
+    
+    questions = []
+    for i, item in enumerate(parsed_data):
+        if not isinstance(item, dict):
+            logger.warning(f"Item {i} is not a dictionary, skipping")
+            continue
+        if "question" in item and "correct_answer" in item:
+            questions.append(QuestionAnswer(
+                question=str(item["question"]).strip(),
+                correct_answer=str(item["correct_answer"]).strip()
+            ))
+        else:
+            logger.warning(f"Item {i} missing 'question' or 'correct_answer' keys: {item.keys()}")
+    
+    if len(questions) == 0 and len(parsed_data) > 0:
+        logger.error(f"Parsed {len(parsed_data)} items but none had valid question/answer format")
+        logger.error(f"Sample item: {parsed_data[0] if parsed_data else 'N/A'}")
+        raise ValueError("Gemini returned data but no valid questions were found. The exam format may not be recognized.")
+    
+    logger.info(f"Successfully parsed {len(questions)} questions from exam")
+    return questions
+
+
+def _parse_error(e: Exception, response_text: str) -> ValueError:
+    """Map a parsing failure to the ValueError reported to callers."""
+    if isinstance(e, json.JSONDecodeError):
         logger.error(f"JSON parsing error: {str(e)}")
         logger.error(f"Response text (first 1000 chars): {response_text[:1000]}")
-        raise ValueError(f"Failed to parse exam: Invalid JSON response from AI. Response: {response_text[:200]}")
-    except Exception as e:
-        logger.error(f"Error parsing exam with Gemini: {str(e)}", exc_info=True)
-        raise ValueError(f"Failed to parse exam: {str(e)}")
+        return ValueError(f"Failed to parse exam: Invalid JSON response from AI. Response: {response_text[:200]}")
+    logger.error(f"Error parsing exam with Gemini: {str(e)}", exc_info=True)
+    return ValueError(f"Failed to parse exam: {str(e)}")
 
 
-def grade_answer(
-    question: str,
-    correct_answer: str,
-    student_answer: str
-) -> Dict[str, Any]:
+def parse_exam_text(text: str) -> List[QuestionAnswer]:
     """
-    Grade a student's answer against the correct answer using Gemini.
+    Parse exam text into structured questions and answers using Gemini.
     
     Args:
-        question: The question text
-        correct_answer: The correct answer
-        student_answer: The student's answer
+        text: Raw OCR-extracted text from exam
         
     Returns:
-        Dictionary with score, is_correct, and explanation
+        List of QuestionAnswer objects
     """
+    prompt = _build_parse_prompt(text)
+    response_text = ""
+    try:
+        logger.info(f"Sending request to Gemini API using model: {settings.GEMINI_MODEL}")
+        response_text = generate(prompt, _parse_generation_config())
+        return _questions_from_response(response_text)
+    except Exception as e:
+        raise _parse_error(e, response_text)
+
+
+async def parse_exam_text_async(text: str) -> List[QuestionAnswer]:
+    """Async variant of parse_exam_text."""
+    prompt = _build_parse_prompt(text)
+    response_text = ""
+    try:
+        logger.info(f"Sending request to Gemini API using model: {settings.GEMINI_MODEL}")
+        response_text = await generate_async(prompt, _parse_generation_config())
+        return _questions_from_response(response_text)
+    except Exception as e:
+        raise _parse_error(e, response_text)
+
+
+def _build_grade_prompt(question: str, correct_answer: str, student_answer: str) -> str:
+    """Build the single-answer grading prompt."""
     if not settings.GEMINI_API_KEY:
         raise ValueError("GEMINI_API_KEY not configured")
     
-    prompt = f"""You are an expert exam grader. Grade the student's answer against the correct answer.
+    return f"""You are an expert exam grader. Grade the student's answer against the correct answer.
 
 QUESTION:
 {question}
@@ -186,13 +321,7 @@ INSTRUCTIONS:
   "explanation": "Brief explanation of why this score was given"
 }}
 
-SCORING GUIDELINES:
-- 100: Perfect match or equivalent correct answer
-- 80-99: Mostly correct with minor issues
-- 60-79: Partially correct
-- 40-59: Some relevant content but mostly incorrect
-- 20-39: Minimal relevant content
-- 0-19: Completely incorrect or no answer
+{SCORING_GUIDELINES}
 
 IMPORTANT:
 - Return ONLY the JSON object, no additional text
@@ -202,42 +331,272 @@ IMPORTANT:
 
 JSON OUTPUT:"""
 
-    try:
-        model = genai.GenerativeModel(settings.GEMINI_MODEL)
-        response = model.generate_content(prompt)
-        
-        # Extract JSON from response
-        response_text = response.text.strip()
-        
-        # Remove markdown code blocks if present
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.startswith("```"):
-            response_text = response_text[3:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-        response_text = response_text.strip()
-        
-        # Parse JSON
-        result = json.loads(response_text)
-        
-        # Validate and normalize
-        score = float(result.get("score", 0))
-        score = max(0, min(100, score))  # Clamp between 0-100
-        is_correct = result.get("is_correct", False) or score == 100
-        explanation = result.get("explanation", "No explanation provided")
-        
-        return {
-            "score": score,
-            "is_correct": is_correct,
-            "explanation": explanation
-        }
-        
-    except json.JSONDecodeError as e:
+
+def _grade_error(e: Exception, response_text: str) -> ValueError:
+    """Map a grading failure to the ValueError reported to callers."""
+    if isinstance(e, json.JSONDecodeError):
         logger.error(f"JSON parsing error: {str(e)}")
         logger.error(f"Response text: {response_text[:500]}")
-        raise ValueError(f"Failed to grade answer: Invalid JSON response from AI")
+        return ValueError(f"Failed to grade answer: Invalid JSON response from AI")
+    logger.error(f"Error grading answer with Gemini: {str(e)}")
+    return ValueError(f"Failed to grade answer: {str(e)}")
+
+
+def grade_answer(
+    question: str,
+    correct_answer: str,
+    student_answer: str
+) -> Dict[str, Any]:
+    """
+    Grade a student's answer against the correct answer using Gemini.
+    
+    Args:
+        question: The question text
+        correct_answer: The correct answer
+        student_answer: The student's answer
+        
+    Returns:
+        Dictionary with score, is_correct, and explanation
+    """
+    prompt = _build_grade_prompt(question, correct_answer, student_answer)
+    response_text = ""
+    try:
+        response_text = _strip_code_fences(generate(prompt))
+        return _normalize_grade_result(json.loads(response_text))
     except Exception as e:
-        logger.error(f"Error grading answer with Gemini: {str(e)}")
-        raise ValueError(f"Failed to grade answer: {str(e)}")
+        raise _grade_error(e, response_text)
+
+
+async def grade_answer_async(
+    question: str,
+    correct_answer: str,
+    student_answer: str
+) -> Dict[str, Any]:
+    """Async variant of grade_answer."""
+    prompt = _build_grade_prompt(question, correct_answer, student_answer)
+    response_text = ""
+    try:
+        response_text = _strip_code_fences(await generate_async(prompt))
+        return _normalize_grade_result(json.loads(response_text))
+    except Exception as e:
+        raise _grade_error(e, response_text)
+
+
+def chunk_grading_items(
+    items: List[Tuple[str, str, str]],
+    token_budget: int = None,
+    max_items: int = None
+) -> List[List[int]]:
+    """
+    Split grading items into batches that fit a prompt token budget.
+    
+    Args:
+        items: (question, correct_answer, student_answer) triples
+        token_budget: Maximum estimated prompt tokens per batch
+        max_items: Maximum number of items per batch
+        
+    Returns:
+        List of batches, each a list of indices into items (in order)
+    """
+    token_budget = token_budget or settings.GRADING_BATCH_TOKEN_BUDGET
+    max_items = max_items or settings.GRADING_BATCH_MAX_ITEMS
+    
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = BATCH_PROMPT_OVERHEAD_TOKENS
+    
+    for i, (question, correct_answer, student_answer) in enumerate(items):
+        item_tokens = estimate_tokens(question) + estimate_tokens(correct_answer) + estimate_tokens(student_answer) + 10
+        if current and (current_tokens + item_tokens > token_budget or len(current) >= max_items):
+            batches.append(current)
+            current = []
+            current_tokens = BATCH_PROMPT_OVERHEAD_TOKENS
+        # An oversized item still gets its own batch
+        current.append(i)
+        current_tokens += item_tokens
+    
+    if current:
+        batches.append(current)
+    
+    return batches
+
+
+def _build_batch_prompt(items: List[Tuple[str, str, str]]) -> str:
+    """Build a single grading prompt covering several answers."""
+    item_blocks = []
+    for i, (question, correct_answer, student_answer) in enumerate(items):
+        item_blocks.append(
+            f"ITEM {i}:\n"
+            f"QUESTION:\n{question}\n"
+            f"CORRECT ANSWER:\n{correct_answer}\n"
+            f"STUDENT ANSWER:\n{student_answer}"
+        )
+    items_text = "\n\n".join(item_blocks)
+    
+    return f"""You are an expert exam grader. Grade each student's answer against its correct answer.
+
+{items_text}
+
+INSTRUCTIONS:
+1. Grade every item independently - compare each student answer to its own correct answer
+2. Consider partial credit for partially correct answers
+3. Be fair but strict - only give full credit for fully correct answers
+4. Return ONLY a valid JSON array with exactly one object per item, in this exact format:
+[
+  {{
+    "item": 0,
+    "score": 85.5,
+    "is_correct": false,
+    "explanation": "Brief explanation of why this score was given"
+  }}
+]
+
+{SCORING_GUIDELINES}
+
+IMPORTANT:
+- Return ONLY the JSON array, no additional text
+- "item" must be the ITEM number being graded
+- Score should be a number between 0 and 100
+- is_correct should be true only if score is 100
+- Explanation should be concise (1-2 sentences)
+
+JSON OUTPUT:"""
+
+
+def _batch_generation_config(item_count: int):
+    return genai.types.GenerationConfig(
+        temperature=0.1,
+        max_output_tokens=min(8192, BATCH_OUTPUT_TOKENS_PER_ITEM * item_count + 256),
+    )
+
+
+def _batch_results_from_response(response_text: str, item_count: int) -> Dict[int, Dict[str, Any]]:
+    """Extract per-item grades from a batch response, skipping malformed entries."""
+    response_text = _strip_code_fences(response_text)
+    json_start = response_text.find('[')
+    json_end = response_text.rfind(']')
+    if json_start != -1 and json_end > json_start:
+        response_text = response_text[json_start:json_end+1]
+    
+    parsed_data = json.loads(response_text)
+    if not isinstance(parsed_data, list):
+        raise ValueError("Expected JSON array")
+    
+    parsed_results: Dict[int, Dict[str, Any]] = {}
+    for position, entry in enumerate(parsed_data):
+        if not isinstance(entry, dict) or "score" not in entry:
+            continue
+        try:
+            item_index = int(entry.get("item", position))
+            if 0 <= item_index < item_count and item_index not in parsed_results:
+                parsed_results[item_index] = _normalize_grade_result(entry)
+        except (TypeError, ValueError):
+            logger.warning(f"Malformed batch grading entry at position {position}: {entry}")
+    return parsed_results
+
+
+def _missing_batch_items(parsed_results: Dict[int, Dict[str, Any]], item_count: int) -> List[int]:
+    missing = [i for i in range(item_count) if i not in parsed_results]
+    if missing and item_count > 1:
+        logger.warning(f"Batch grading missing {len(missing)} of {item_count} items, grading them individually")
+    return missing
+
+
+def _grade_batch_chunk(items: List[Tuple[str, str, str]]) -> List[Dict[str, Any]]:
+    """
+    Grade one token-bounded chunk of items in a single Gemini call.
+    
+    Items whose result is missing or malformed are graded individually.
+    """
+    parsed_results: Dict[int, Dict[str, Any]] = {}
+    
+    if len(items) > 1:
+        try:
+            response_text = generate(_build_batch_prompt(items), _batch_generation_config(len(items)))
+            parsed_results = _batch_results_from_response(response_text, len(items))
+        except Exception as e:
+            logger.warning(f"Batch grading call failed for {len(items)} items, falling back to single grading: {str(e)}")
+    
+    for i in _missing_batch_items(parsed_results, len(items)):
+        parsed_results[i] = grade_answer(*items[i])
+    
+    return [parsed_results[i] for i in range(len(items))]
+
+
+async def _grade_batch_chunk_async(
+    items: List[Tuple[str, str, str]],
+    semaphore: Optional[asyncio.Semaphore] = None
+) -> List[Union[Dict[str, Any], BaseException]]:
+    """
+    Async variant of _grade_batch_chunk; fallback items are graded concurrently.
+    
+    The batch call and each fallback call hold their own semaphore slot.
+    A failed fallback call yields its exception in place of that item's result.
+    """
+    parsed_results: Dict[int, Union[Dict[str, Any], BaseException]] = {}
+    
+    if len(items) > 1:
+        try:
+            async with semaphore or nullcontext():
+                response_text = await generate_async(_build_batch_prompt(items), _batch_generation_config(len(items)))
+            parsed_results = _batch_results_from_response(response_text, len(items))
+        except Exception as e:
+            logger.warning(f"Batch grading call failed for {len(items)} items, falling back to single grading: {str(e)}")
+    
+    async def grade_fallback(item: Tuple[str, str, str]) -> Dict[str, Any]:
+        async with semaphore or nullcontext():
+            return await grade_answer_async(*item)
+    
+    missing = _missing_batch_items(parsed_results, len(items))
+    fallback_results = await asyncio.gather(*(grade_fallback(items[i]) for i in missing), return_exceptions=True)
+    parsed_results.update(zip(missing, fallback_results))
+    
+    return [parsed_results[i] for i in range(len(items))]
+
 
+def grade_answers_batch(items: List[Tuple[str, str, str]]) -> List[Dict[str, Any]]:
+    """
+    Grade several student answers with as few Gemini calls as possible.
+    
+    Items are chunked by GRADING_BATCH_TOKEN_BUDGET so the shared grading
+    instructions are sent once per chunk instead of once per answer.
+    
+    Args:
+        items: (question, correct_answer, student_answer) triples
+        
+    Returns:
+        List of dictionaries with score, is_correct, and explanation, in item order
+    """
+    if not settings.GEMINI_API_KEY:
+        raise ValueError("GEMINI_API_KEY not configured")
+    
+    results: List[Dict[str, Any]] = []
+    for batch in chunk_grading_items(items):
+        results.extend(_grade_batch_chunk([items[i] for i in batch]))
+    
+    return results
+
+
+async def grade_answers_batch_async(
+    items: List[Tuple[str, str, str]],
+    semaphore: Optional[asyncio.Semaphore] = None
+) -> List[Union[Dict[str, Any], BaseException]]:
+    """
+    Async variant of grade_answers_batch.
+    
+    Args:
+        items: (question, correct_answer, student_answer) triples
+        semaphore: Acquired around each Gemini call, batch or fallback
+        
+    Returns:
+        Grade dictionaries in item order; an item whose individual fallback
+        call failed holds the exception instead
+    """
+    if not settings.GEMINI_API_KEY:
+        raise ValueError("GEMINI_API_KEY not configured")
+    
+    results: List[Union[Dict[str, Any], BaseException]] = []
+    for batch in chunk_grading_items(items):
+        results.extend(await _grade_batch_chunk_async([items[i] for i in batch], semaphore))
+    
+    return results
@@ -1,12 +1,470 @@
 """
 Grading service for calculating final scores and aggregating results.
 """
+import asyncio
 import logging
-from typing import List
+import math
+import re
+import threading
+import unicodedata
+import weakref
+from typing import Any, AsyncIterator, Awaitable, Dict, List, Optional, Tuple, Union
+from app.config import settings
 from app.models import QuestionAnswer, StudentAnswer, QuestionGrade
+from app.services import gemini_service
+from app.services.cache import TieredCache, make_cache_key
 
 logger = logging.getLogger(__name__)
 
+# Caps concurrent Gemini grading calls across requests; asyncio primitives
+# are bound to one event loop, so there is one semaphore per loop
+_grading_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+_grading_semaphores_lock = threading.Lock()
+
+# Grade result cache (lazy loading)
+_grade_cache: Optional[TieredCache] = None
+
+
+def get_grading_semaphore() -> asyncio.Semaphore:
+    """Get the GRADING_CONCURRENCY limiter for the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _grading_semaphores_lock:
+        semaphore = _grading_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(max(1, settings.GRADING_CONCURRENCY))
+            _grading_semaphores[loop] = semaphore
+        return semaphore
+
+
+def get_grade_cache() -> Optional[TieredCache]:
+    """Get or initialize the grade result cache (None when disabled)."""
+    global _grade_cache
+    if _grade_cache is None and settings.GRADE_CACHE_ENABLED:
+        _grade_cache = TieredCache(
+            "grade",
+            db_path=settings.GRADE_CACHE_PATH or None,
+            memory_entries=settings.GRADE_CACHE_MEMORY_ENTRIES,
+            max_entries=settings.GRADE_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.GRADE_CACHE_TTL_SECONDS
+        )
+    return _grade_cache
+
+
+def normalize_student_answer(answer: str) -> str:
+    """Normalize an answer for cache lookups (Unicode form and whitespace only)."""
+    return " ".join(unicodedata.normalize("NFKC", answer).split())
+
+
+def grade_cache_key(question: QuestionAnswer, student_answer: str) -> str:
+    """Build the grade cache key for a question/answer pair."""
+    return make_cache_key(
+        question.question,
+        question.correct_answer,
+        normalize_student_answer(student_answer),
+        settings.GEMINI_MODEL,
+        gemini_service.GRADING_PROMPT_VERSION
+    )
+
+
+def _build_question_grade(
+    question: QuestionAnswer,
+    student_answer: StudentAnswer,
+    grade_result: Dict[str, Any],
+    grading_method: str = "llm"
+) -> QuestionGrade:
+    """Combine a question, the student's answer and a grading result."""
+    return QuestionGrade(
+        question_index=student_answer.question_index,
+        question=question.question,
+        correct_answer=question.correct_answer,
+        student_answer=student_answer.answer,
+        score=grade_result["score"],
+        is_correct=grade_result["is_correct"],
+        explanation=grade_result["explanation"],
+        grading_method=grading_method
+    )
+
+
+# Multiple-choice option: a single Latin (A-H) or Hebrew (א-ח) letter, optionally "(b)" / "b." / "b)"
+_CHOICE_PATTERN = re.compile(r"^\(?([a-h\u05d0-\u05d7])[).]?$")
+
+# Number with an optional trailing unit, e.g. "4", "-3.5", "12,5 cm", "1,000 kg", "50%"
+_NUMBER_PATTERN = re.compile(r"^([-+]?(?:\d{1,3}(?:,\d{3})+|\d+)(?:[.,]\d+)?)\s*([^\d\s]*)$")
+
+_THOUSANDS_PATTERN = re.compile(r"^[-+]?\d{1,3}(?:,\d{3})+(?:\.\d+)?$")
+
+# Unit -> (dimension, factor to the base unit of that dimension)
+_UNITS = {
+    "": ("none", 1.0),
+    "%": ("percent", 1.0),
+    "mm": ("length", 0.001), "cm": ("length", 0.01), "m": ("length", 1.0), "km": ("length", 1000.0),
+    "mg": ("mass", 0.001), "g": ("mass", 1.0), "kg": ("mass", 1000.0),
+    "ms": ("time", 0.001), "s": ("time", 1.0), "sec": ("time", 1.0), "min": ("time", 60.0),
+    "h": ("time", 3600.0), "hr": ("time", 3600.0),
+    "ml": ("volume", 0.001), "l": ("volume", 1.0),
+    "ס\"מ": ("length", 0.01), "מ'": ("length", 1.0), "מטר": ("length", 1.0), "ק\"מ": ("length", 1000.0),
+    "גרם": ("mass", 1.0), "ק\"ג": ("mass", 1000.0), "שניות": ("time", 1.0), "דקות": ("time", 60.0),
+}
+
+
+def normalize_for_match(text: str) -> str:
+    """
+    Normalize text for deterministic comparison.
+    
+    Applies Unicode compatibility decomposition, strips combining marks
+    (Hebrew niqqud and cantillation, Latin accents), case-folds, collapses
+    whitespace and drops trailing punctuation.
+    """
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(ch for ch in decomposed if unicodedata.category(ch) != "Mn")
+    collapsed = " ".join(stripped.casefold().split())
+    return collapsed.rstrip(".!;:")
+
+
+def _parse_number(text: str) -> Optional[Tuple[float, str]]:
+    """Parse "<number> [unit]" into (value in base units, dimension), or None."""
+    match = _NUMBER_PATTERN.match(text)
+    if not match:
+        return None
+    number, unit = match.groups()
+    if _THOUSANDS_PATTERN.match(number):
+        number = number.replace(",", "")  # "1,000" / "1,000.5"
+    else:
+        number = number.replace(",", ".")  # decimal comma, "12,5"
+    unit_info = _UNITS.get(unit.rstrip("."))
+    if unit_info is None:
+        return None
+    dimension, factor = unit_info
+    try:
+        return float(number) * factor, dimension
+    except ValueError:
+        return None
+
+
+def _local_result(score: float, explanation: str) -> Dict[str, Any]:
+    return {"score": score, "is_correct": score == 100.0, "explanation": explanation}
+
+
+def grade_locally(question: QuestionAnswer, student_answer: str) -> Optional[Dict[str, Any]]:
+    """
+    Try to grade an answer with deterministic rules, without calling Gemini.
+    
+    Resolves blank answers, exact/normalized text matches, multiple-choice
+    letters and numeric answers (with unit conversion and relative tolerance).
+    
+    Args:
+        question: The parsed question with its correct answer
+        student_answer: The student's answer text
+        
+    Returns:
+        Dictionary with score, is_correct, and explanation, or None if the
+        answer needs the LLM grader
+    """
+    correct = normalize_for_match(question.correct_answer)
+    student = normalize_for_match(student_answer)
+    
+    if not student:
+        return _local_result(0.0, "No answer provided.")
+    if not correct:
+        return None
+    if student == correct:
+        return _local_result(100.0, "Answer matches the correct answer.")
+    
+    correct_choice = _CHOICE_PATTERN.match(correct)
+    student_choice = _CHOICE_PATTERN.match(student)
+    if correct_choice and student_choice:
+        if correct_choice.group(1) == student_choice.group(1):
+            return _local_result(100.0, "Selected the correct option.")
+        return _local_result(
+            0.0,
+            f"Selected option {student_choice.group(1).upper()}, the correct option is {correct_choice.group(1).upper()}."
+        )
+    
+    correct_number = _parse_number(correct)
+    student_number = _parse_number(student)
+    if correct_number and student_number:
+        correct_value, correct_dimension = correct_number
+        student_value, student_dimension = student_number
+        if correct_dimension != student_dimension:
+            return None  # Missing or incompatible unit - let the LLM judge partial credit
+        if math.isclose(student_value, correct_value, rel_tol=settings.GRADING_NUMERIC_TOLERANCE, abs_tol=1e-9):
+            return _local_result(100.0, "Numeric answer matches the correct value.")
+        return _local_result(0.0, f"Numeric answer {student_answer.strip()} does not match {question.correct_answer.strip()}.")
+    
+    return None
+
+
+def local_resolution_rate(question_grades: List[QuestionGrade]) -> float:
+    """Fraction of grades produced by the local rule engine (0-1)."""
+    if not question_grades:
+        return 0.0
+    local_count = sum(1 for grade in question_grades if grade.grading_method == "rule")
+    return round(local_count / len(question_grades), 4)
+
+
+async def grade_question(question: QuestionAnswer, student_answer: StudentAnswer) -> QuestionGrade:
+    """
+    Grade a single student answer without blocking the event loop.
+    
+    Args:
+        question: The parsed question with its correct answer
+        student_answer: The student's answer to that question
+        
+    Returns:
+        QuestionGrade for the answer
+    """
+    async with get_grading_semaphore():
+        grade_result = await gemini_service.grade_answer_async(
+            question.question,
+            question.correct_answer,
+            student_answer.answer
+        )
+    
+    return _build_question_grade(question, student_answer, grade_result)
+
+
+# (position in student_answers, grade or the exception that prevented it)
+GradeOutcome = Tuple[int, Union[QuestionGrade, BaseException]]
+
+
+async def _grade_one(
+    position: int,
+    question: QuestionAnswer,
+    student_answer: StudentAnswer
+) -> List[GradeOutcome]:
+    """Grade one answer with its own Gemini call."""
+    try:
+        return [(position, await grade_question(question, student_answer))]
+    except Exception as e:
+        return [(position, e)]
+
+
+async def _grade_batch(
+    positions: List[int],
+    questions: List[QuestionAnswer],
+    student_answers: List[StudentAnswer]
+) -> List[GradeOutcome]:
+    """
+    Grade several answers with one multi-question Gemini call.
+    
+    Answers the batch call misses are graded with individual calls; an
+    answer whose call fails is marked as failed on its own.
+    """
+    items = [
+        (
+            questions[student_answers[i].question_index].question,
+            questions[student_answers[i].question_index].correct_answer,
+            student_answers[i].answer
+        )
+        for i in positions
+    ]
+    try:
+        batch_result = await gemini_service.grade_answers_batch_async(items, get_grading_semaphore())
+    except Exception as e:
+        return [(i, e) for i in positions]
+    return [
+        (
+            i,
+            batch_result[n] if isinstance(batch_result[n], BaseException)
+            else _build_question_grade(questions[student_answers[i].question_index], student_answers[i], batch_result[n])
+        )
+        for n, i in enumerate(positions)
+    ]
+
+
+def _llm_grading_calls(
+    questions: List[QuestionAnswer],
+    student_answers: List[StudentAnswer],
+    pending: List[int]
+) -> List[Awaitable[List[GradeOutcome]]]:
+    """One awaitable per Gemini call needed to grade the pending answers."""
+    if not settings.GRADING_BATCH_ENABLED:
+        return [_grade_one(i, questions[student_answers[i].question_index], student_answers[i]) for i in pending]
+    
+    items = [
+        (
+            questions[student_answers[i].question_index].question,
+            questions[student_answers[i].question_index].correct_answer,
+            student_answers[i].answer
+        )
+        for i in pending
+    ]
+    batches = gemini_service.chunk_grading_items(items)
+    logger.info(f"Grading {len(items)} answers in {len(batches)} batch call(s)")
+    return [_grade_batch([pending[n] for n in batch], questions, student_answers) for batch in batches]
+
+
+async def iter_student_grades(
+    questions: List[QuestionAnswer],
+    student_answers: List[StudentAnswer]
+) -> AsyncIterator[GradeOutcome]:
+    """
+    Grade student answers, yielding each result as soon as it is ready.
+    
+    Trivially decidable answers are resolved by grade_locally and previously
+    graded answers are served from the grade cache; these are yielded first.
+    The rest are fanned out as async Gemini calls, at most
+    GRADING_CONCURRENCY at once across all requests, and yielded in
+    completion order. With GRADING_BATCH_ENABLED, answers are grouped into
+    multi-question calls. Closing the iterator early cancels outstanding calls.
+    
+    Args:
+        questions: Parsed exam questions
+        student_answers: Student answers (indices must already be validated)
+        
+    Yields:
+        (position in student_answers, QuestionGrade or the exception that
+        prevented grading it)
+    """
+    results: List[Optional[QuestionGrade]] = [None] * len(student_answers)
+    cache_keys: List[Optional[str]] = [None] * len(student_answers)
+    
+    # Resolve trivially decidable answers locally
+    if settings.GRADING_FAST_PATH_ENABLED:
+        for i, answer in enumerate(student_answers):
+            question = questions[answer.question_index]
+            local_result = grade_locally(question, answer.answer)
+            if local_result is not None:
+                results[i] = _build_question_grade(question, answer, local_result, grading_method="rule")
+        local_count = sum(1 for result in results if result is not None)
+        if student_answers:
+            logger.info(f"Fast path resolved {local_count} of {len(student_answers)} answers locally")
+    
+    # Serve repeated answers from the cache before any LLM call (one disk lookup, off the loop)
+    grade_cache = get_grade_cache()
+    if grade_cache is not None:
+        for i, answer in enumerate(student_answers):
+            if results[i] is None:
+                cache_keys[i] = grade_cache_key(questions[answer.question_index], answer.answer)
+        cached_grades = await grade_cache.get_many_async([key for key in cache_keys if key is not None])
+        cache_hits = 0
+        for i, answer in enumerate(student_answers):
+            cached = cached_grades.get(cache_keys[i]) if cache_keys[i] is not None else None
+            if cached is not None:
+                results[i] = _build_question_grade(questions[answer.question_index], answer, cached, grading_method="cache")
+                cache_hits += 1
+        if cache_hits:
+            logger.info(f"Grade cache served {cache_hits} of {len(student_answers)} answers")
+    
+    for i, result in enumerate(results):
+        if result is not None:
+            yield i, result
+    
+    pending = [i for i, result in enumerate(results) if result is None]
+    if not pending:
+        return
+    
+    tasks = [asyncio.ensure_future(call) for call in _llm_grading_calls(questions, student_answers, pending)]
+    try:
+        for completed in asyncio.as_completed(tasks):
+            outcomes = await completed
+            if grade_cache is not None:
+                await grade_cache.set_many_async({
+                    cache_keys[i]: {
+                        "score": result.score,
+                        "is_correct": result.is_correct,
+                        "explanation": result.explanation
+                    }
+                    for i, result in outcomes
+                    if isinstance(result, QuestionGrade)
+                })
+            for i, result in outcomes:
+                yield i, result
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def grade_student_answers(
+    questions: List[QuestionAnswer],
+    student_answers: List[StudentAnswer]
+) -> List[QuestionGrade]:
+    """
+    Grade all student answers concurrently (see iter_student_grades).
+    
+    Args:
+        questions: Parsed exam questions
+        student_answers: Student answers (indices must already be validated)
+        
+    Returns:
+        List of QuestionGrade objects in the same order as student_answers
+        
+    Raises:
+        ValueError: If any answer failed to grade, listing every failed question
+    """
+    results: List[Union[QuestionGrade, BaseException, None]] = [None] * len(student_answers)
+    async for i, result in iter_student_grades(questions, student_answers):
+        results[i] = result
+    
+    errors = []
+    for answer, result in zip(student_answers, results):
+        if isinstance(result, BaseException):
+            logger.error(f"Failed to grade question {answer.question_index}: {str(result)}")
+            errors.append(f"question {answer.question_index}: {str(result)}")
+    
+    if errors:
+        raise ValueError(f"Failed to grade {len(errors)} of {len(student_answers)} answers - " + "; ".join(errors))
+    
+    return list(results)
+
+
+async def grade_class(
+    questions: List[QuestionAnswer],
+    submissions: List[List[StudentAnswer]]
+) -> Tuple[List[Union[List[QuestionGrade], ValueError]], int]:
+    """
+    Grade many students' answers to one exam as a single workload.
+    
+    Answers that are identical after normalization (same question, same
+    text) are graded once and shared. All distinct answers go through
+    iter_student_grades together, so every student draws from the same
+    GRADING_CONCURRENCY pool and, with batching, shares multi-question calls.
+    
+    Args:
+        questions: Parsed exam questions
+        submissions: Each student's answers (indices must already be validated)
+        
+    Returns:
+        (per student: QuestionGrade list in submission order, or a ValueError
+        naming the failed questions; number of distinct answers graded)
+    """
+    unique_positions: Dict[Tuple[int, str], int] = {}
+    unique_answers: List[StudentAnswer] = []
+    positions: List[List[int]] = []
+    for student_answers in submissions:
+        student_positions = []
+        for answer in student_answers:
+            key = (answer.question_index, normalize_student_answer(answer.answer))
+            if key not in unique_positions:
+                unique_positions[key] = len(unique_answers)
+                unique_answers.append(answer)
+            student_positions.append(unique_positions[key])
+        positions.append(student_positions)
+    
+    total_answers = sum(len(student_answers) for student_answers in submissions)
+    logger.info(f"Grading {len(submissions)} students: {total_answers} answers, {len(unique_answers)} distinct")
+    
+    graded: List[Union[QuestionGrade, BaseException, None]] = [None] * len(unique_answers)
+    async for i, result in iter_student_grades(questions, unique_answers):
+        graded[i] = result
+    
+    outcomes: List[Union[List[QuestionGrade], ValueError]] = []
+    for student_answers, student_positions in zip(submissions, positions):
+        grades = []
+        errors = []
+        for answer, position in zip(student_answers, student_positions):
+            result = graded[position]
+            if isinstance(result, BaseException):
+                errors.append(f"question {answer.question_index}: {str(result)}")
+            else:
+                grades.append(result.model_copy(update={"student_answer": answer.answer}))
+        if errors:
+            outcomes.append(ValueError(f"Failed to grade {len(errors)} of {len(student_answers)} answers - " + "; ".join(errors)))
+        else:
+            outcomes.append(grades)
+    
+    return outcomes, len(unique_answers)
+
 
 def calculate_final_grade(question_grades: List[QuestionGrade]) -> float:
     """
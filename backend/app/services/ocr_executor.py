@@ -0,0 +1,251 @@
+"""
+OCR executor: runs CPU-bound OCR off the event loop in a process pool.
+"""
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+from app.config import settings
+from app.services import ocr_service
+from app.services.cache import TieredCache, make_cache_key
+
+logger = logging.getLogger(__name__)
+
+ProgressCallback = ocr_service.ProgressCallback
+
+# Shared OCR executor (lazy loading); the lock keeps concurrent callers from building two
+_ocr_executor: Optional[Executor] = None
+_ocr_executor_lock = threading.Lock()
+
+# Extracted text by file content (lazy loading)
+_ocr_cache: Optional[TieredCache] = None
+
+
+def _init_ocr_worker(torch_threads: int):
+    """
+    Process pool initializer: cap torch threads and warm the EasyOCR reader.
+
+    Errors are logged rather than raised so a failed warm-up does not break
+    the pool; the reader is retried (and the error surfaced) on first use.
+    """
+    os.environ["OMP_NUM_THREADS"] = str(torch_threads)
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except Exception as e:
+        logger.warning(f"Could not set torch thread count: {str(e)}")
+
+    try:
+        ocr_service.get_ocr_reader()
+        logger.info(f"OCR worker {os.getpid()} ready ({torch_threads} torch threads)")
+    except Exception as e:
+        logger.error(f"OCR worker {os.getpid()} failed to warm up: {str(e)}")
+
+
+def get_ocr_executor() -> Executor:
+    """
+    Get or initialize the shared OCR executor.
+
+    OCR_WORKERS > 0 starts a process pool with one warmed reader per worker;
+    OCR_WORKERS = 0 runs OCR in a single background thread in this process.
+    """
+    global _ocr_executor
+    executor = _ocr_executor
+    if executor is not None:
+        return executor
+    with _ocr_executor_lock:
+        if _ocr_executor is None:
+            if settings.OCR_WORKERS > 0:
+                torch_threads = settings.OCR_TORCH_THREADS or max(1, (os.cpu_count() or 1) // settings.OCR_WORKERS)
+                logger.info(f"Starting OCR process pool: {settings.OCR_WORKERS} workers x {torch_threads} torch threads")
+                _ocr_executor = ProcessPoolExecutor(
+                    max_workers=settings.OCR_WORKERS,
+                    mp_context=multiprocessing.get_context(settings.OCR_MP_START_METHOD),
+                    initializer=_init_ocr_worker,
+                    initargs=(torch_threads,)
+                )
+            else:
+                logger.info("Running OCR in-process on a background thread")
+                _ocr_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ocr")
+        return _ocr_executor
+
+
+# Prewarm progress, reported by the readiness endpoint
+_readiness: Dict[str, Any] = {"state": "cold", "error": None, "warmup_seconds": None}
+_readiness_lock = threading.Lock()
+
+
+def _set_readiness(**fields):
+    with _readiness_lock:
+        _readiness.update(fields)
+
+
+def get_readiness() -> Dict[str, Any]:
+    """Prewarm state: cold, warming, ready, failed or disabled."""
+    with _readiness_lock:
+        readiness = dict(_readiness)
+    readiness["ready"] = readiness["state"] in ("ready", "disabled")
+    return readiness
+
+
+def prewarm():
+    """
+    Start the OCR executor and run a warm-up inference on every worker.
+    
+    Blocks until all workers are warm; see start_prewarm for the
+    non-blocking version used at startup.
+    """
+    _set_readiness(state="warming", error=None)
+    start_time = time.perf_counter()
+    try:
+        executor = get_ocr_executor()
+        # One warm-up per worker; each takes long enough that the pool spreads them
+        futures = [executor.submit(ocr_service.warm_up) for _ in range(max(1, settings.OCR_WORKERS))]
+        for future in futures:
+            future.result()
+    except Exception as e:
+        logger.error(f"OCR prewarm failed: {str(e)}")
+        _set_readiness(state="failed", error=str(e))
+        return
+    elapsed = time.perf_counter() - start_time
+    _set_readiness(state="ready", warmup_seconds=round(elapsed, 2))
+    logger.info(f"OCR ready after {elapsed:.1f}s")
+
+
+def start_prewarm():
+    """Prewarm OCR in a background thread (or mark it disabled)."""
+    if not settings.OCR_PREWARM:
+        _set_readiness(state="disabled")
+        return
+    threading.Thread(target=prewarm, name="ocr-prewarm", daemon=True).start()
+
+
+def get_ocr_cache() -> Optional[TieredCache]:
+    """Get or initialize the OCR result cache (None when disabled)."""
+    global _ocr_cache
+    if _ocr_cache is None and settings.OCR_CACHE_ENABLED:
+        _ocr_cache = TieredCache(
+            "ocr",
+            db_path=settings.OCR_CACHE_PATH or None,
+            memory_entries=settings.OCR_CACHE_MEMORY_ENTRIES,
+            max_bytes=settings.OCR_CACHE_MAX_MB * 1024 * 1024
+        )
+    return _ocr_cache
+
+
+def file_sha256(file_bytes: bytes) -> str:
+    """Content hash identifying an uploaded file."""
+    return hashlib.sha256(file_bytes).hexdigest()
+
+
+def ocr_cache_key(file_hash: str, file_extension: str) -> str:
+    """Build the OCR cache key for a file under the current OCR settings."""
+    return make_cache_key(file_hash, file_extension.lower(), ocr_service.ocr_settings_fingerprint())
+
+
+def shutdown_ocr_executor():
+    """Stop the OCR executor and its worker processes."""
+    global _ocr_executor
+    with _ocr_executor_lock:
+        if _ocr_executor is not None:
+            _ocr_executor.shutdown(wait=False, cancel_futures=True)
+            _ocr_executor = None
+
+
+def extract_text_with_progress(
+    file_bytes: bytes,
+    file_extension: str,
+    on_progress: Optional[ProgressCallback] = None,
+    file_hash: Optional[str] = None
+) -> str:
+    """
+    Extract text from a file, reporting rendering and per-page OCR progress.
+    
+    Results are cached by file content and OCR settings, so a re-upload of
+    the same file skips rendering and OCR entirely.
+    
+    PDF pages go through ocr_service.process_pdf_pages with their OCR
+    batches run in parallel on the OCR executor. This call blocks; run it
+    from a worker thread.
+    
+    Args:
+        file_bytes: File bytes
+        file_extension: File extension (e.g., '.pdf', '.png')
+        on_progress: Optional callback receiving (stage, pages_done, pages_total)
+        file_hash: SHA-256 of file_bytes, if already known
+        
+    Returns:
+        Extracted text string
+    """
+    if file_extension.lower() == '.txt':
+        return ocr_service.extract_text_from_file(file_bytes, file_extension)
+    
+    ocr_cache = get_ocr_cache()
+    cache_key = None
+    if ocr_cache is not None:
+        cache_key = ocr_cache_key(file_hash or file_sha256(file_bytes), file_extension)
+        cached = ocr_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"OCR cache hit ({len(cached)} characters), skipping OCR")
+            return cached
+    
+    text = _extract_text_with_progress(file_bytes, file_extension, on_progress)
+    if cache_key is not None and _is_complete(text):
+        ocr_cache.set(cache_key, text)
+    return text
+
+
+def _is_complete(text: str) -> bool:
+    """Whether every page was extracted (failed pages are retried next time, not cached)."""
+    return ocr_service.PAGE_ERROR_PREFIX not in text
+
+
+def _extract_text_with_progress(
+    file_bytes: bytes,
+    file_extension: str,
+    on_progress: Optional[ProgressCallback] = None
+) -> str:
+    """Uncached body of extract_text_with_progress."""
+    file_extension = file_extension.lower()
+    report = on_progress or (lambda stage, done, total: None)
+    
+    if file_extension == '.txt':
+        return ocr_service.extract_text_from_file(file_bytes, file_extension)
+    
+    if file_extension in ['.png', '.jpg', '.jpeg']:
+        report("ocr", 0, 1)
+        text = _wait_for_ocr(get_ocr_executor().submit(ocr_service.extract_text_from_image, file_bytes))
+        report("ocr", 1, 1)
+        return text
+    if file_extension != '.pdf':
+        raise ValueError(f"Unsupported file type: {file_extension}")
+    
+    try:
+        return ocr_service.process_pdf_pages(
+            file_bytes,
+            submit=get_ocr_executor().submit,
+            on_progress=report,
+            workers=settings.OCR_WORKERS
+        )
+    except BrokenProcessPool as e:
+        _handle_broken_pool(e)
+
+
+def _handle_broken_pool(error: BrokenProcessPool):
+    """Drop a crashed process pool (restarted on the next upload) and raise a user-facing error."""
+    logger.error(f"OCR process pool crashed, it will be restarted on the next upload: {str(error)}")
+    shutdown_ocr_executor()
+    raise ValueError("OCR worker crashed while processing the file. Please try again.") from error
+
+
+def _wait_for_ocr(future: Future) -> str:
+    """Wait for an OCR task, restarting the pool if a worker died."""
+    try:
+        return future.result()
+    except BrokenProcessPool as e:
+        _handle_broken_pool(e)
@@ -3,37 +3,74 @@ OCR service for extracting text from images and PDFs.
 """
 import io
 import logging
-from typing import Optional
+import math
+import os
+import queue
+import subprocess
+import threading
+import time
+import unicodedata
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Iterator, List, Optional, Tuple
+import numpy as np
 from PIL import Image
 import easyocr
-from pdf2image import convert_from_bytes
+from pdf2image import convert_from_bytes, pdfinfo_from_bytes
 from app.config import settings
+from app.services import preprocessing, upload_service
 
 logger = logging.getLogger(__name__)
 
+# Called with (stage, pages_done, pages_total)
+ProgressCallback = Callable[[str, int, int], None]
+
 # Initialize EasyOCR reader (lazy loading)
 _ocr_reader: Optional[easyocr.Reader] = None
 
+# Windows install location of Poppler used in development
+POPPLER_PATH = r"C:\poppler-25.12.0\Library\bin"
+
+# PDF rendering policy: large files render at a lower DPI for speed
+PDF_DPI = 150
+PDF_LARGE_FILE_DPI = 100
+PDF_LARGE_FILE_MB = 2
+OCR_MAX_WIDTH = 1200
+
+# Pixels added around a weak region before it is re-read at high resolution
+REFINE_PADDING = 4
+
+# Marks pages whose OCR failed in the combined text
+PAGE_ERROR_PREFIX = "[Error extracting text from page"
+
+OCR_ENGINE_VERSION = f"easyocr-{getattr(easyocr, '__version__', 'unknown')}"
+
+
+def get_ocr_languages() -> List[str]:
+    """Parse OCR_LANGUAGE into EasyOCR language codes."""
+    # Parse language setting - support multiple languages separated by + or comma
+    lang_setting = settings.OCR_LANGUAGE.strip()
+    if '+' in lang_setting:
+        languages = [lang.strip() for lang in lang_setting.split('+')]
+    elif ',' in lang_setting:
+        languages = [lang.strip() for lang in lang_setting.split(',')]
+    else:
+        languages = [lang_setting]
+    
+    # Remove empty strings
+    languages = [lang for lang in languages if lang]
+    
+    if not languages:
+        languages = ['en']  # Default to English
+    return languages
+
 
 def get_ocr_reader() -> easyocr.Reader:
     """Get or initialize OCR reader."""
     global _ocr_reader
     if _ocr_reader is None:
-        # Parse language setting - support multiple languages separated by + or comma
-        lang_setting = settings.OCR_LANGUAGE.strip()
-        if '+' in lang_setting:
-            languages = [lang.strip() for lang in lang_setting.split('+')]
-        elif ',' in lang_setting:
-            languages = [lang.strip() for lang in lang_setting.split(',')]
-        else:
-            languages = [lang_setting]
-        
-        # Remove empty strings
-        languages = [lang for lang in languages if lang]
-        
-        if not languages:
-            languages = ['en']  # Default to English
-        
+        languages = get_ocr_languages()
         logger.info(f"Initializing EasyOCR with languages: {languages}")
         logger.info("Note: First-time initialization may take several minutes to download models...")
         try:
@@ -45,179 +82,728 @@ def get_ocr_reader() -> easyocr.Reader:
     return _ocr_reader
 
 
-def extract_text_from_image(image_bytes: bytes) -> str:
+def _results_to_text(results: list) -> str:
+    """Combine EasyOCR results for one image into text, logging diagnostics."""
+    logger.info(f"OCR detected {len(results)} text regions")
+    
+    # Log confidence scores if available
+    if results:
+        confidences = [result[2] for result in results if len(result) > 2]
+        if confidences:
+            avg_confidence = sum(confidences) / len(confidences)
+            logger.info(f"Average OCR confidence: {avg_confidence:.2f}")
+    
+    # Combine all detected text
+    text_parts = [result[1] for result in results]
+    extracted_text = "\n".join(text_parts)
+    
+    logger.info(f"Extracted {len(extracted_text)} characters from image")
+    
+    # Log preview if text is short
+    if len(extracted_text) < 200:
+        logger.warning(f"Short text extracted. Preview: {extracted_text}")
+    else:
+        logger.debug(f"Text preview (first 200 chars): {extracted_text[:200]}")
+    
+    if len(extracted_text.strip()) == 0:
+        logger.warning("No text extracted from image. This might indicate:")
+        logger.warning("1. Image quality is too low")
+        logger.warning("2. Text is too small or unclear")
+        logger.warning("3. OCR language setting doesn't match the text language")
+        logger.warning(f"4. Current OCR language: {settings.OCR_LANGUAGE}")
+    
+    return extracted_text.strip()
+
+
+def extract_text_from_array(image_array: np.ndarray) -> str:
     """
-    Extract text from image bytes using EasyOCR.
+    Extract text from an in-memory image array using EasyOCR.
     
     Args:
-        image_bytes: Image file bytes
+        image_array: uint8 image, grayscale (H, W) or RGB (H, W, 3)
         
     Returns:
         Extracted text string
     """
     try:
         reader = get_ocr_reader()
-        image = Image.open(io.BytesIO(image_bytes))
         
         # Log image info
-        logger.info(f"Processing image: size={image.size}, mode={image.mode}")
-        
-        # Convert PIL Image to numpy array for EasyOCR
-        import numpy as np
-        image_array = np.array(image)
+        logger.info(f"Processing image: shape={image_array.shape}, dtype={image_array.dtype}")
         
         # Perform OCR
         logger.info("Running OCR on image...")
-        results = reader.readtext(image_array)
-        logger.info(f"OCR detected {len(results)} text regions")
+        results = reader.readtext(image_array, batch_size=settings.OCR_BATCH_SIZE)
+        return _results_to_text(results)
         
-        # Log confidence scores if available
-        if results:
-            confidences = [result[2] for result in results if len(result) > 2]
-            if confidences:
-                avg_confidence = sum(confidences) / len(confidences)
-                logger.info(f"Average OCR confidence: {avg_confidence:.2f}")
+    except Exception as e:
+        logger.error(f"Error extracting text from image: {str(e)}", exc_info=True)
+        raise ValueError(f"OCR extraction failed: {str(e)}")
+
+
+def warm_up() -> float:
+    """
+    Load the reader and run OCR once on a tiny synthetic image.
+    
+    The first inference allocates model buffers and is much slower than
+    later ones; doing it ahead of time keeps that cost off user requests.
+    
+    Returns:
+        Seconds the warm-up took
+    """
+    from PIL import ImageDraw
+    
+    start_time = time.perf_counter()
+    image = Image.new("L", (160, 40), 255)
+    ImageDraw.Draw(image).text((8, 12), "Warm up 123", fill=0)
+    get_ocr_reader().readtext(np.asarray(image), batch_size=settings.OCR_BATCH_SIZE)
+    elapsed = time.perf_counter() - start_time
+    logger.info(f"OCR warm-up finished in {elapsed:.1f}s (pid {os.getpid()})")
+    return elapsed
+
+
+def _pad_to_common_shape(image_arrays: List[np.ndarray]) -> List[np.ndarray]:
+    """
+    Pad images with white to one shape so they can share a detector batch.
+    
+    Padding (unlike resizing) keeps text at its original scale.
+    """
+    if len({image_array.ndim for image_array in image_arrays}) > 1:
+        image_arrays = [preprocessing.to_grayscale(image_array) for image_array in image_arrays]
+    height = max(image_array.shape[0] for image_array in image_arrays)
+    width = max(image_array.shape[1] for image_array in image_arrays)
+    
+    padded = []
+    for image_array in image_arrays:
+        pad_height = height - image_array.shape[0]
+        pad_width = width - image_array.shape[1]
+        if pad_height or pad_width:
+            padding = [(0, pad_height), (0, pad_width)] + [(0, 0)] * (image_array.ndim - 2)
+            image_array = np.pad(image_array, padding, mode="constant", constant_values=255)
+        padded.append(image_array)
+    return padded
+
+
+def split_into_tiles(image_array: np.ndarray, tile_height: int) -> List[np.ndarray]:
+    """
+    Split a tall image into horizontal tiles of roughly tile_height.
+    
+    Each cut is placed on the emptiest row near the target height so text
+    lines are not sliced in half.
+    """
+    height = image_array.shape[0]
+    if tile_height <= 0 or height <= tile_height * 1.5:
+        return [image_array]
+    
+    ink_per_row = (preprocessing.to_grayscale(image_array) < 128).sum(axis=1)
+    search = tile_height // 4
+    cuts = [0]
+    while height - cuts[-1] > tile_height * 1.5:
+        target = cuts[-1] + tile_height
+        window = ink_per_row[target - search:target + search]
+        # Emptiest row in the window, preferring the one closest to the target
+        candidates = np.flatnonzero(window == window.min())
+        cuts.append(target - search + int(candidates[np.argmin(np.abs(candidates - search))]))
+    cuts.append(height)
+    
+    return [image_array[top:bottom] for top, bottom in zip(cuts, cuts[1:])]
+
+
+def extract_text_from_arrays(image_arrays: List[np.ndarray]) -> List[str]:
+    """
+    OCR several images in one batched EasyOCR call.
+    
+    Detection and recognition run over the whole batch, amortizing the
+    per-call model overhead across pages.
+    
+    Args:
+        image_arrays: uint8 images (grayscale or RGB, any sizes)
         
-        # Combine all detected text
-        text_parts = [result[1] for result in results]
-        extracted_text = "\n".join(text_parts)
+    Returns:
+        Extracted text per image, in input order
+    """
+    if not image_arrays:
+        return []
+    if len(image_arrays) == 1:
+        return [extract_text_from_array(image_arrays[0])]
+    return [_results_to_text(image_results) for image_results in readtext_arrays(image_arrays)]
+
+
+def readtext_arrays(image_arrays: List[np.ndarray]) -> List[list]:
+    """
+    Raw EasyOCR results (box, text, confidence) for several images in one call.
+    
+    Images are padded at the bottom and right only, so boxes stay in each
+    image's own coordinates.
+    
+    Raises:
+        ValueError: If OCR fails
+    """
+    if not image_arrays:
+        return []
+    try:
+        reader = get_ocr_reader()
+        if len(image_arrays) == 1:
+            return [reader.readtext(image_arrays[0], batch_size=settings.OCR_BATCH_SIZE)]
+        batch = _pad_to_common_shape(image_arrays)
         
-        logger.info(f"Extracted {len(extracted_text)} characters from image")
+        logger.info(f"Running batched OCR on {len(batch)} images of shape {batch[0].shape}")
+        start_time = time.perf_counter()
+        results = reader.readtext_batched(
+            batch,
+            batch_size=settings.OCR_BATCH_SIZE,
+            workers=settings.OCR_BATCH_WORKERS
+        )
+        elapsed = time.perf_counter() - start_time
+        logger.info(f"Batched OCR: {len(batch)} images in {elapsed:.1f}s ({len(batch) / max(elapsed, 1e-6):.2f} pages/s)")
+        return results
         
-        # Log preview if text is short
-        if len(extracted_text) < 200:
-            logger.warning(f"Short text extracted. Preview: {extracted_text}")
-        else:
-            logger.debug(f"Text preview (first 200 chars): {extracted_text[:200]}")
+    except Exception as e:
+        logger.error(f"Error in batched OCR: {str(e)}", exc_info=True)
+        raise ValueError(f"OCR extraction failed: {str(e)}")
+
+
+def refine_low_confidence(results: list, high_res_array: np.ndarray, scale: float) -> Tuple[list, int]:
+    """
+    Re-read weak regions of a page from a higher-resolution image of it.
+    
+    Regions below OCR_REFINE_CONFIDENCE (at most OCR_REFINE_MAX_REGIONS,
+    weakest first) are cropped from high_res_array and recognized again
+    without re-running detection. A region's text is replaced in place when
+    the second reading is more confident, so results keep their positions.
+    
+    Args:
+        results: EasyOCR results (box, text, confidence) from the low-resolution pass
+        high_res_array: The same page rendered at a higher resolution
+        scale: high_res_array size divided by the size the boxes refer to
         
-        if len(extracted_text.strip()) == 0:
-            logger.warning("No text extracted from image. This might indicate:")
-            logger.warning("1. Image quality is too low")
-            logger.warning("2. Text is too small or unclear")
-            logger.warning("3. OCR language setting doesn't match the text language")
-            logger.warning(f"4. Current OCR language: {settings.OCR_LANGUAGE}")
+    Returns:
+        (merged results, number of regions improved)
+    """
+    weak = sorted(
+        (i for i, result in enumerate(results) if result[2] < settings.OCR_REFINE_CONFIDENCE),
+        key=lambda i: results[i][2]
+    )[:max(0, settings.OCR_REFINE_MAX_REGIONS)]
+    if not weak:
+        return results, 0
+    
+    high_res_array = preprocessing.to_grayscale(high_res_array)
+    height, width = high_res_array.shape
+    regions = {}
+    for i in weak:
+        box = np.asarray(results[i][0], dtype=np.float64) * scale
+        x_min = max(0, int(box[:, 0].min()) - REFINE_PADDING)
+        x_max = min(width, int(np.ceil(box[:, 0].max())) + REFINE_PADDING)
+        y_min = max(0, int(box[:, 1].min()) - REFINE_PADDING)
+        y_max = min(height, int(np.ceil(box[:, 1].max())) + REFINE_PADDING)
+        if x_max > x_min and y_max > y_min:
+            regions[i] = [x_min, x_max, y_min, y_max]
+    if not regions:
+        return results, 0
+    
+    # EasyOCR returns recognized regions sorted by position; match them back by top-left corner
+    reread = get_ocr_reader().recognize(
+        high_res_array,
+        horizontal_list=list(regions.values()),
+        free_list=[],
+        batch_size=settings.OCR_BATCH_SIZE
+    )
+    by_corner = {(int(box[0][0]), int(box[0][1])): (text, confidence) for box, text, confidence in reread}
+    
+    merged = list(results)
+    improved = 0
+    for i, (x_min, _, y_min, _) in regions.items():
+        text, confidence = by_corner.get((x_min, y_min), (None, -1.0))
+        if text is not None and confidence > results[i][2]:
+            merged[i] = (results[i][0], text, confidence)
+            improved += 1
+    return merged, improved
+
+
+def pil_to_ocr_array(image: Image.Image) -> np.ndarray:
+    """
+    Convert a PIL image to the array handed to EasyOCR.
+    
+    Grayscale and RGB images are exposed without re-encoding; other modes
+    (palette, RGBA, CMYK, 16-bit) are converted to grayscale first.
+    """
+    if image.mode not in ('L', 'RGB'):
+        image = image.convert('L')
+    return np.asarray(image, dtype=np.uint8)
+
+
+def extract_text_from_pil(image: Image.Image) -> str:
+    """
+    Extract text from a PIL image using EasyOCR.
+    
+    Args:
+        image: Decoded image
         
-        return extracted_text.strip()
+    Returns:
+        Extracted text string
+    """
+    image_array = preprocessing.preprocess(pil_to_ocr_array(image))
+    tiles = split_into_tiles(image_array, settings.OCR_TILE_HEIGHT)
+    if len(tiles) > 1:
+        logger.info(f"Split {image.size} image into {len(tiles)} tiles for batched OCR")
+        return "\n".join(text for text in extract_text_from_arrays(tiles) if text).strip()
+    return extract_text_from_array(image_array)
+
+
+def extract_text_from_image(image_bytes: bytes) -> str:
+    """
+    Extract text from image bytes using EasyOCR.
+    
+    Args:
+        image_bytes: Image file bytes
         
+    Returns:
+        Extracted text string
+    """
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        logger.info(f"Decoded image: size={image.size}, mode={image.mode}")
     except Exception as e:
-        logger.error(f"Error extracting text from image: {str(e)}", exc_info=True)
+        logger.error(f"Error decoding image: {str(e)}")
         raise ValueError(f"OCR extraction failed: {str(e)}")
+    return extract_text_from_pil(image)
 
 
-def extract_text_from_pdf(pdf_bytes: bytes) -> str:
+def _pdf_processing_error(e: Exception) -> ValueError:
+    """Translate a PDF rendering failure into a user-facing ValueError."""
+    error_msg = str(e)
+    logger.error(f"Error extracting text from PDF: {error_msg}", exc_info=True)
+    
+    # Check if it's a poppler error
+    if "poppler" in error_msg.lower() or "Unable to get page count" in error_msg or "pdf2image" in error_msg.lower():
+        detailed_error = (
+            "PDF processing failed: Poppler is not installed or not in PATH.\n\n"
+            "QUICK FIX - Download and install Poppler:\n"
+            "1. Download: https://github.com/oschwartz10612/poppler-windows/releases/latest\n"
+            "2. Extract to C:\\poppler\n"
+            "3. Add to PATH: C:\\poppler\\Library\\bin\n"
+            "4. Restart the server\n\n"
+            "OR use the batch file: התקנת_Poppler_Windows.md\n\n"
+            "Alternative solutions:\n"
+            "- Convert PDF to images (.png, .jpg) and upload those instead\n"
+            "- Use a text file (.txt) if you have the text version\n"
+            "- Use Docker (poppler is pre-installed in the Docker image)"
+        )
+    else:
+        detailed_error = (
+            f"PDF processing failed: {error_msg}\n\n"
+            "Please try:\n"
+            "1. Converting PDF to images (.png, .jpg) and upload those\n"
+            "2. Using a text file (.txt) if available\n"
+            "3. Ensuring the PDF contains readable text (not just images)\n"
+            "4. Installing Poppler if not already installed"
+        )
+    
+    return ValueError(detailed_error)
+
+
+def _ensure_poppler_on_path():
+    """Ensure Poppler is in PATH for this process."""
+    if POPPLER_PATH not in os.environ.get('PATH', ''):
+        os.environ['PATH'] = os.environ.get('PATH', '') + ';' + POPPLER_PATH
+        logger.info(f"Added Poppler to PATH: {POPPLER_PATH}")
+
+
+def score_text_layer(text: str) -> float:
     """
-    Extract text from PDF by converting to images and using OCR.
+    Score how usable an embedded PDF text layer is (0-1).
+    
+    Pages with too few characters score 0. Otherwise the score is the share of
+    visible characters that are real letters, digits, punctuation or symbols,
+    as opposed to control, private-use or replacement characters left behind
+    by broken font encodings.
+    """
+    visible = [ch for ch in text if not ch.isspace()]
+    if len(visible) < settings.PDF_TEXT_LAYER_MIN_CHARS:
+        return 0.0
+    good = sum(1 for ch in visible if ch != "\ufffd" and unicodedata.category(ch)[0] in "LNPS")
+    letters = sum(1 for ch in visible if ch.isalpha())
+    if letters / len(visible) < 0.3:
+        return 0.0  # Mostly digits/symbols - likely garbage or a scanned page number only
+    return good / len(visible)
+
+
+def is_usable_text_layer(text: Optional[str]) -> bool:
+    """Whether an embedded text layer can replace OCR for a page."""
+    return bool(text) and score_text_layer(text) >= 0.9
+
+
+def extract_pdf_text_layer(pdf_bytes: bytes, max_pages: Optional[int] = None) -> List[str]:
+    """
+    Extract the embedded text of each PDF page with poppler's pdftotext.
     
     Args:
         pdf_bytes: PDF file bytes
+        max_pages: Number of pages to read (default: PDF_MAX_PAGES)
         
     Returns:
-        Extracted text string
+        Text per page (empty for pages without text), or an empty list if
+        the text layer could not be read at all
     """
+    if not settings.PDF_TEXT_LAYER_ENABLED:
+        return []
+    
+    max_pages = max_pages or settings.PDF_MAX_PAGES
+    _ensure_poppler_on_path()
     try:
-        # Ensure Poppler is in PATH for this process
-        import os
-        poppler_path = r"C:\poppler-25.12.0\Library\bin"
-        if poppler_path not in os.environ.get('PATH', ''):
-            os.environ['PATH'] = os.environ.get('PATH', '') + ';' + poppler_path
-            logger.info(f"Added Poppler to PATH: {poppler_path}")
-        logger.info(f"Converting PDF to images (PDF size: {len(pdf_bytes)} bytes)")
-        
-        # Check PDF size and adjust DPI accordingly
-        pdf_size_mb = len(pdf_bytes) / (1024 * 1024)
-        if pdf_size_mb > 2:
-            dpi = 100  # Much lower DPI for faster processing
-            logger.info(f"PDF ({pdf_size_mb:.1f}MB), using DPI=100 for speed")
-        else:
-            dpi = 150  # Lower DPI for better speed
-            logger.info(f"PDF size: {pdf_size_mb:.1f}MB, using DPI=150")
-        
-        # Convert PDF to images with timeout protection
-        logger.info("Starting PDF conversion...")
-        images = convert_from_bytes(pdf_bytes, dpi=dpi, first_page=1, last_page=3)  # Limit to first 3 pages for speed
-        logger.info(f"PDF converted to {len(images)} page(s)")
-        
-        if len(images) == 0:
-            raise ValueError("PDF conversion resulted in 0 pages. The PDF might be corrupted or empty.")
-        
-        all_text = []
-        for i, image in enumerate(images):
-            logger.info(f"Processing PDF page {i + 1}/{len(images)} (size: {image.size})")
-            
-            # Optimize image for OCR
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            # Resize image for faster OCR
-            max_width = 1200
-            if image.width > max_width:
-                ratio = max_width / image.width
-                new_height = int(image.height * ratio)
-                image = image.resize((max_width, new_height), Image.Resampling.LANCZOS)
-                logger.info(f"Resized image to {image.size} for faster OCR")
-            
-            # Convert PIL Image to bytes for OCR with optimized quality
-            img_bytes = io.BytesIO()
-            image.save(img_bytes, format='PNG', optimize=True, quality=75)
-            img_bytes.seek(0)
-            
+        completed = subprocess.run(
+            ["pdftotext", "-layout", "-enc", "UTF-8", "-f", "1", "-l", str(max_pages), "-", "-"],
+            input=pdf_bytes,
+            capture_output=True,
+            timeout=30
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.warning(f"pdftotext unavailable, falling back to OCR for all pages: {str(e)}")
+        return []
+    
+    if completed.returncode != 0:
+        logger.warning(f"pdftotext failed ({completed.returncode}): {completed.stderr.decode('utf-8', 'replace')[:200]}")
+        return []
+    
+    # pdftotext terminates every page with a form feed
+    pages = completed.stdout.decode("utf-8", "replace").split("\f")
+    if pages and not pages[-1].strip():
+        pages = pages[:-1]
+    return [page.strip() for page in pages[:max_pages]]
+
+
+def get_pdf_page_count(pdf_bytes: bytes) -> int:
+    """Return the number of pages in a PDF (via poppler's pdfinfo)."""
+    try:
+        _ensure_poppler_on_path()
+        return int(pdfinfo_from_bytes(pdf_bytes)["Pages"])
+    except Exception as e:
+        raise _pdf_processing_error(e)
+
+
+def refinement_enabled() -> bool:
+    """
+    Whether PDFs are read in two passes.
+    
+    Needs OCR_REFINE_ENABLED and a preprocessing profile that keeps pixel
+    positions, so first-pass boxes map onto the high-resolution rendering.
+    """
+    return settings.OCR_REFINE_ENABLED and preprocessing.preserves_geometry()
+
+
+def _choose_pdf_dpi(pdf_bytes: bytes) -> int:
+    """Pick the rendering DPI from the PDF size (always the low DPI when refining)."""
+    if refinement_enabled():
+        logger.info(f"Two-pass OCR: first pass at DPI={PDF_LARGE_FILE_DPI}, weak regions at DPI={settings.OCR_REFINE_DPI}")
+        return PDF_LARGE_FILE_DPI
+    pdf_size_mb = len(pdf_bytes) / (1024 * 1024)
+    if pdf_size_mb > PDF_LARGE_FILE_MB:
+        logger.info(f"PDF ({pdf_size_mb:.1f}MB), using DPI={PDF_LARGE_FILE_DPI} for speed")
+        return PDF_LARGE_FILE_DPI  # Much lower DPI for faster processing
+    logger.info(f"PDF size: {pdf_size_mb:.1f}MB, using DPI={PDF_DPI}")
+    return PDF_DPI  # Lower DPI for better speed
+
+
+def _prepare_page_for_ocr(image: Image.Image) -> np.ndarray:
+    """
+    Convert a rendered page to a grayscale uint8 array sized for OCR.
+    
+    Pages are capped at OCR_MAX_WIDTH unless the preprocessing profile
+    picks the resolution itself from the measured text height.
+    """
+    # Grayscale is all EasyOCR's detector needs and a third of the RGB size
+    if image.mode != 'L':
+        image = image.convert('L')
+    
+    # Resize image for faster OCR
+    max_width = OCR_MAX_WIDTH
+    if image.width > max_width and "resolution" not in preprocessing.resolve_profile():
+        ratio = max_width / image.width
+        new_height = int(image.height * ratio)
+        image = image.resize((max_width, new_height), Image.Resampling.LANCZOS)
+    
+    return preprocessing.preprocess(np.asarray(image))
+
+
+def _render_pdf_image(pdf_bytes: bytes, page_number: int, dpi: int) -> Image.Image:
+    """Rasterize a single PDF page in grayscale."""
+    try:
+        images = convert_from_bytes(pdf_bytes, dpi=dpi, first_page=page_number, last_page=page_number, grayscale=True)
+    except Exception as e:
+        raise _pdf_processing_error(e)
+    if not images:
+        raise ValueError(f"PDF conversion produced no image for page {page_number}. The PDF might be corrupted.")
+    logger.info(f"Rendered PDF page {page_number} at DPI={dpi} (size: {images[0].size})")
+    return images[0]
+
+
+def _render_pdf_page(pdf_bytes: bytes, page_number: int, dpi: int) -> np.ndarray:
+    """Render a single PDF page and prepare it for OCR."""
+    return _prepare_page_for_ocr(_render_pdf_image(pdf_bytes, page_number, dpi))
+
+
+def _refine_pdf_page(pdf_bytes: bytes, page_number: int, page_array: np.ndarray, results: list) -> list:
+    """
+    Second pass for one page: re-read its low-confidence regions at OCR_REFINE_DPI.
+    
+    Falls back to the first-pass results if the page cannot be re-rendered or re-read.
+    """
+    if not any(result[2] < settings.OCR_REFINE_CONFIDENCE for result in results):
+        return results
+    try:
+        _ensure_poppler_on_path()
+        image = _render_pdf_image(pdf_bytes, page_number, settings.OCR_REFINE_DPI)
+        high_res_array = preprocessing.preprocess(pil_to_ocr_array(image))
+        scale = high_res_array.shape[1] / page_array.shape[1]
+        merged, improved = refine_low_confidence(results, high_res_array, scale)
+        weak = sum(1 for result in results if result[2] < settings.OCR_REFINE_CONFIDENCE)
+        logger.info(f"Page {page_number}: re-read {min(weak, settings.OCR_REFINE_MAX_REGIONS)} of {weak} low-confidence region(s), {improved} improved")
+        return merged
+    except Exception as e:
+        logger.warning(f"Page {page_number}: high-resolution pass failed, keeping first-pass text: {str(e)}")
+        return results
+
+
+def iter_pdf_pages(
+    pdf_bytes: bytes,
+    page_numbers: Optional[List[int]] = None,
+    prefetch: Optional[int] = None
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Render PDF pages one at a time, yielding (page_number, page_array).
+    
+    Each page is rasterized on its own, so only the pages being rendered,
+    waiting (at most `prefetch`) or being consumed are held in memory,
+    regardless of the PDF's length.
+    
+    Args:
+        pdf_bytes: PDF file bytes
+        page_numbers: 1-based pages to render (default: up to PDF_MAX_PAGES)
+        prefetch: Pages rendered ahead on a background thread (default: PDF_RENDER_PREFETCH, 0 = none)
+    """
+    if page_numbers is None:
+        page_numbers = list(range(1, min(get_pdf_page_count(pdf_bytes), settings.PDF_MAX_PAGES) + 1))
+    if not page_numbers:
+        return
+    
+    _ensure_poppler_on_path()
+    dpi = _choose_pdf_dpi(pdf_bytes)
+    prefetch = settings.PDF_RENDER_PREFETCH if prefetch is None else prefetch
+    
+    if prefetch <= 0:
+        for page_number in page_numbers:
+            yield page_number, _render_pdf_page(pdf_bytes, page_number, dpi)
+        return
+    
+    rendered: queue.Queue = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+    
+    def produce():
+        for page_number in page_numbers:
             try:
-                page_text = extract_text_from_image(img_bytes.getvalue())
-                all_text.append(page_text)
-                logger.info(f"Page {i + 1}: Extracted {len(page_text)} characters")
-                
-                # Early exit if we have enough text (optimization)
-                total_chars = sum(len(text) for text in all_text)
-                if total_chars > 1000 and i >= 1:  # Stop after 2 pages if we have enough text
-                    logger.info(f"Early exit: extracted {total_chars} characters from {i+1} pages")
+                item = (page_number, _render_pdf_page(pdf_bytes, page_number, dpi), None)
+            except Exception as e:
+                item = (page_number, None, e)
+            while not stop.is_set():
+                try:
+                    rendered.put(item, timeout=0.1)
                     break
-                    
-            except Exception as page_error:
-                logger.error(f"Error processing PDF page {i + 1}: {str(page_error)}")
-                all_text.append(f"[Error extracting text from page {i + 1}]")
-        
-        combined_text = "\n\n".join(all_text)
-        logger.info(f"Total extracted from PDF: {len(combined_text)} characters")
+                except queue.Full:
+                    continue
+            if stop.is_set() or item[2] is not None:
+                return
+    
+    producer = threading.Thread(target=produce, name="pdf-render", daemon=True)
+    producer.start()
+    try:
+        for _ in page_numbers:
+            page_number, page_array, error = rendered.get()
+            if error is not None:
+                raise error
+            yield page_number, page_array
+    finally:
+        stop.set()
+        producer.join(timeout=5)
+
+
+def plan_pdf_pages(pdf_bytes: bytes) -> List[Optional[str]]:
+    """
+    Decide how to read each PDF page, up to PDF_MAX_PAGES.
+    
+    Returns:
+        One entry per page: the embedded text if usable, or None if the page
+        must be rendered and OCR'd
+    """
+    page_count = get_pdf_page_count(pdf_bytes)
+    if page_count == 0:
+        raise ValueError("PDF has 0 pages. The PDF might be corrupted or empty.")
+    if page_count > settings.PDF_MAX_PAGES:
+        logger.warning(f"PDF has {page_count} pages; only the first {settings.PDF_MAX_PAGES} will be processed (PDF_MAX_PAGES)")
+    page_count = min(page_count, settings.PDF_MAX_PAGES)
+    
+    # Digitally generated pages already carry text - only OCR the rest
+    plan: List[Optional[str]] = [None] * page_count
+    text_layer = extract_pdf_text_layer(pdf_bytes, page_count)
+    for i, page_text in enumerate(text_layer[:page_count]):
+        if is_usable_text_layer(page_text):
+            plan[i] = page_text
+    if text_layer:
+        usable = sum(1 for page_text in plan if page_text is not None)
+        logger.info(f"PDF text layer usable on {usable}/{page_count} page(s)")
+    return plan
+
+
+def page_error_placeholder(page_number: int) -> str:
+    """Text substituted for a page whose OCR failed."""
+    return f"{PAGE_ERROR_PREFIX} {page_number}]"
+
+
+def combine_page_texts(page_texts: List[str]) -> str:
+    """
+    Join per-page OCR output into the final PDF text.
+    
+    Raises:
+        ValueError: If almost no text was extracted
+    """
+    combined_text = "\n\n".join(page_texts)
+    logger.info(f"Total extracted from PDF: {len(combined_text)} characters")
+    
+    if len(combined_text.strip()) < 10:
+        raise ValueError("PDF processing extracted very little text. The PDF might be image-based or corrupted. Try converting to images first.")
+    
+    return combined_text.strip()
+
+
+def read_pdf_page_batch(page_numbers: List[int], page_arrays: List[np.ndarray], pdf_bytes: Optional[bytes] = None) -> List[str]:
+    """
+    OCR a batch of rendered PDF pages; the unit of work process_pdf_pages submits.
+    
+    When pdf_bytes is given (two-pass OCR), weak regions of each page are
+    re-read from a high-resolution rendering before the page text is assembled.
+    """
+    if pdf_bytes is None:
+        return extract_text_from_arrays(page_arrays)
+    return [
+        _results_to_text(_refine_pdf_page(pdf_bytes, page_number, page_array, results))
+        for page_number, page_array, results in zip(page_numbers, page_arrays, readtext_arrays(page_arrays))
+    ]
+
+
+def _run_inline(fn: Callable, *args) -> Future:
+    """Run a call in this thread, wrapped in a completed Future."""
+    future: Future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def process_pdf_pages(
+    pdf_bytes: bytes,
+    submit: Optional[Callable[..., Future]] = None,
+    on_progress: Optional[ProgressCallback] = None,
+    workers: int = 1
+) -> str:
+    """
+    Extract text from a PDF: the text layer where usable, OCR for the rest.
+    
+    Pages needing OCR are rendered one at a time in the calling thread and
+    OCR'd in batches of up to OCR_PAGES_PER_BATCH pages via `submit`, with
+    a bounded number of rendered pages alive. A batch that fails is replaced
+    by page error placeholders; a crashed process pool is re-raised.
+    
+    Args:
+        pdf_bytes: PDF file bytes
+        submit: Executor-style submit(fn, *args) -> Future (default: run inline)
+        on_progress: Optional callback receiving (stage, pages_done, pages_total)
+        workers: Batches the executor runs in parallel
         
-        if len(combined_text.strip()) < 10:
-            raise ValueError("PDF processing extracted very little text. The PDF might be image-based or corrupted. Try converting to images first.")
+    Returns:
+        Extracted text string
+    """
+    submit = submit or _run_inline
+    report = on_progress or (lambda stage, done, total: None)
+    
+    report("rendering", 0, 0)
+    page_texts = plan_pdf_pages(pdf_bytes)
+    ocr_pages = [i + 1 for i, page_text in enumerate(page_texts) if page_text is None]
+    logger.info(f"Processing {len(page_texts)} PDF page(s), {len(ocr_pages)} need OCR")
+    report("ocr", 0, len(ocr_pages))
+    # Two-pass workers need the PDF to re-render pages; skip shipping it otherwise
+    refine_source = pdf_bytes if refinement_enabled() else None
+    if settings.OCR_REFINE_ENABLED and refine_source is None:
+        logger.warning(f"OCR_REFINE_ENABLED ignored: preprocessing profile {settings.OCR_PREPROCESS_PROFILE} moves or rescales pages")
+    
+    # Pages are rendered as they are needed and OCR'd in batches; cap the
+    # number of rendered pages held in memory while awaiting OCR
+    workers = max(1, workers)
+    pages_per_batch = max(1, min(settings.OCR_PAGES_PER_BATCH, math.ceil(len(ocr_pages) / workers)))
+    max_in_flight = workers + max(0, settings.PDF_RENDER_PREFETCH // pages_per_batch)
+    in_flight = deque()
+    batch: List[Tuple[int, np.ndarray]] = []
+    done = 0
+    
+    def submit_batch():
+        page_numbers = [page_number for page_number, _ in batch]
+        future = submit(read_pdf_page_batch, page_numbers, [page_array for _, page_array in batch], refine_source)
+        in_flight.append((page_numbers, future))
+        batch.clear()
+    
+    def collect_oldest():
+        nonlocal done
+        page_numbers, future = in_flight.popleft()
+        try:
+            batch_texts = future.result()
+        except BrokenProcessPool:
+            raise
+        except Exception as batch_error:
+            logger.error(f"Batched OCR failed for pages {page_numbers}: {str(batch_error)}")
+            batch_texts = [page_error_placeholder(page_number) for page_number in page_numbers]
+        for page_number, page_text in zip(page_numbers, batch_texts):
+            logger.info(f"Page {page_number}: Extracted {len(page_text)} characters")
+            page_texts[page_number - 1] = page_text
+            done += 1
+            report("ocr", done, len(ocr_pages))
+    
+    try:
+        for page_number, page_array in iter_pdf_pages(pdf_bytes, ocr_pages):
+            batch.append((page_number, page_array))
+            if len(batch) >= pages_per_batch:
+                submit_batch()
+                if len(in_flight) >= max_in_flight:
+                    collect_oldest()
+        if batch:
+            submit_batch()
+        while in_flight:
+            collect_oldest()
+    finally:
+        for _, future in in_flight:
+            future.cancel()
+    
+    return combine_page_texts(page_texts)
+
+
+def extract_text_from_pdf(pdf_bytes: bytes) -> str:
+    """
+    Extract text from PDF, using the embedded text layer where usable and
+    converting the remaining pages to images for OCR (in this thread).
+    
+    Args:
+        pdf_bytes: PDF file bytes
         
-        return combined_text.strip()
+    Returns:
+        Extracted text string
+    """
+    try:
+        return process_pdf_pages(pdf_bytes)
         
     except ValueError as e:
         # Re-raise ValueError as-is
         logger.error(f"PDF processing error: {str(e)}")
         raise
     except Exception as e:
-        error_msg = str(e)
-        logger.error(f"Error extracting text from PDF: {error_msg}", exc_info=True)
-        
-        # Check if it's a poppler error
-        if "poppler" in error_msg.lower() or "Unable to get page count" in error_msg or "poppler" in str(e).lower() or "pdf2image" in error_msg.lower():
-            detailed_error = (
-                "PDF processing failed: Poppler is not installed or not in PATH.\n\n"
-                "QUICK FIX - Download and install Poppler:\n"
-                "1. Download: https://github.com/oschwartz10612/poppler-windows/releases/latest\n"
-                "2. Extract to C:\\poppler\n"
-                "3. Add to PATH: C:\\poppler\\Library\\bin\n"
-                "4. Restart the server\n\n"
-                "OR use the batch file: התקנת_Poppler_Windows.md\n\n"
-                "Alternative solutions:\n"
-                "- Convert PDF to images (.png, .jpg) and upload those instead\n"
-                "- Use a text file (.txt) if you have the text version\n"
-                "- Use Docker (poppler is pre-installed in the Docker image)"
-            )
-        else:
-            detailed_error = (
-                f"PDF processing failed: {error_msg}\n\n"
-                "Please try:\n"
-                "1. Converting PDF to images (.png, .jpg) and upload those\n"
-                "2. Using a text file (.txt) if available\n"
-                "3. Ensuring the PDF contains readable text (not just images)\n"
-                "4. Installing Poppler if not already installed"
-            )
-        
-        raise ValueError(detailed_error)
+        raise _pdf_processing_error(e)
 
 
 def extract_text_from_file(file_bytes: bytes, file_extension: str) -> str:
@@ -239,10 +825,22 @@ def extract_text_from_file(file_bytes: bytes, file_extension: str) -> str:
         return extract_text_from_image(file_bytes)
     elif file_extension == '.txt':
         # Direct text file
-        try:
-            return file_bytes.decode('utf-8')
-        except UnicodeDecodeError:
-            return file_bytes.decode('latin-1')
+        return upload_service.decode_text(file_bytes)
     else:
         raise ValueError(f"Unsupported file type: {file_extension}")
 
+
+def ocr_settings_fingerprint() -> List:
+    """Everything besides the file bytes that can change the extracted text."""
+    return [
+        OCR_ENGINE_VERSION,
+        sorted(get_ocr_languages()),
+        [PDF_DPI, PDF_LARGE_FILE_DPI, PDF_LARGE_FILE_MB, OCR_MAX_WIDTH],
+        settings.PDF_MAX_PAGES,
+        settings.PDF_TEXT_LAYER_ENABLED,
+        settings.PDF_TEXT_LAYER_MIN_CHARS,
+        settings.OCR_TILE_HEIGHT,
+        preprocessing.resolve_profile(),
+        settings.OCR_TARGET_TEXT_HEIGHT,
+        [settings.OCR_REFINE_CONFIDENCE, settings.OCR_REFINE_DPI, settings.OCR_REFINE_MAX_REGIONS] if refinement_enabled() else None
+    ]
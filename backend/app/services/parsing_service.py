@@ -0,0 +1,278 @@
+"""
+Parsing service: cached, de-duplicated exam parsing with Gemini.
+"""
+import asyncio
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from app.config import settings
+from app.models import QuestionAnswer
+from app.services import gemini_service
+from app.services.cache import SingleFlight, TieredCache, make_cache_key
+
+logger = logging.getLogger(__name__)
+
+# Parse result cache (lazy loading)
+_parse_cache: Optional[TieredCache] = None
+
+# Parses currently running, by cache key
+_parse_flights = SingleFlight("parse")
+
+# Lines that start a new question: "12.", "12)", "(12)", "Q12", "Question 12", "שאלה 12"
+_QUESTION_START = re.compile(
+    r"^[ \t]*(?:(?:question|q\.?|שאלה)[ \t]*\d{1,3}|\(?\d{1,3}[.)])(?=\s)",
+    re.IGNORECASE | re.MULTILINE
+)
+
+# Leading numbering stripped before comparing questions from neighbouring chunks
+_NUMBERING = re.compile(r"^(?:(?:question|q\.?|שאלה)\s*)?\(?\d{1,3}[.):]?\s*", re.IGNORECASE)
+
+# Most questions the overlap between neighbouring chunks is expected to repeat
+_MERGE_WINDOW = 5
+
+# Shortest question prefix treated as the same question cut off at a chunk edge
+_MIN_PREFIX_CHARS = 20
+
+
+def get_parse_cache() -> Optional[TieredCache]:
+    """Get or initialize the parse result cache (None when disabled)."""
+    global _parse_cache
+    if _parse_cache is None and settings.PARSE_CACHE_ENABLED:
+        _parse_cache = TieredCache(
+            "parse",
+            db_path=settings.PARSE_CACHE_PATH or None,
+            memory_entries=settings.PARSE_CACHE_MEMORY_ENTRIES,
+            max_entries=settings.PARSE_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.PARSE_CACHE_TTL_SECONDS
+        )
+    return _parse_cache
+
+
+def get_parse_flights() -> SingleFlight:
+    """Registry of in-flight parse calls."""
+    return _parse_flights
+
+
+def parse_cache_key(text: str) -> str:
+    """Build the parse cache key for an exam text."""
+    return make_cache_key(
+        text.strip(),
+        settings.GEMINI_MODEL,
+        gemini_service.PARSING_PROMPT_VERSION,
+        settings.PARSE_CHUNK_CHARS
+    )
+
+
+def _find_cut(text: str, start: int, end: int) -> int:
+    """
+    Pick where a chunk starting at start should end, at most at end.
+    
+    Prefers the last question start in the second half of the window,
+    then the last blank line (page breaks), then the last newline.
+    """
+    floor = start + (end - start) // 2
+    question_starts = [m.start() for m in _QUESTION_START.finditer(text, floor, end) if m.start() > floor]
+    if question_starts:
+        return question_starts[-1]
+    for separator in ("\n\n", "\n"):
+        position = text.rfind(separator, floor, end)
+        if position > floor:
+            return position + len(separator)
+    return end
+
+
+def split_exam_text(text: str, max_chars: int, overlap_chars: int = 0) -> List[str]:
+    """
+    Split exam text into chunks of at most max_chars at question boundaries.
+    
+    Each chunk after the first repeats up to overlap_chars (whole lines)
+    of the previous one, so a question cut at a bad boundary still appears
+    complete in one chunk. Duplicates are removed by merge_questions.
+    
+    Args:
+        text: Extracted exam text
+        max_chars: Chunk size limit (0 returns the text as one chunk)
+        overlap_chars: Characters of context carried into the next chunk
+        
+    Returns:
+        Chunks in document order
+    """
+    text = text.strip()
+    if max_chars <= 0 or len(text) <= max_chars:
+        return [text]
+    overlap_chars = min(max(0, overlap_chars), max_chars // 4)
+    
+    chunks = []
+    start = 0
+    while len(text) - start > max_chars:
+        previous_start = start
+        cut = _find_cut(text, start, start + max_chars)
+        chunks.append(text[start:cut].strip())
+        next_start = cut
+        if overlap_chars:
+            # Back up to the earliest line start within the overlap window
+            line_start = text.find("\n", cut - overlap_chars, cut - 1)
+            if line_start != -1 and line_start + 1 > start:
+                next_start = line_start + 1
+        start = next_start
+    tail = text[start:].strip()
+    if chunks and len(tail) < max_chars // 4:
+        # Fold a short remainder into the previous chunk rather than parse it alone
+        chunks[-1] = text[previous_start:].strip()
+    else:
+        chunks.append(tail)
+    return [chunk for chunk in chunks if chunk]
+
+
+def _normalize_question(question: str) -> str:
+    normalized = " ".join(question.lower().split())
+    return _NUMBERING.sub("", normalized)
+
+
+def _same_question(first: QuestionAnswer, second: QuestionAnswer) -> bool:
+    """Equal normalized texts, or one a prefix of the other (cut off at a chunk edge)."""
+    shorter, longer = sorted((_normalize_question(first.question), _normalize_question(second.question)), key=len)
+    return shorter == longer or (len(shorter) >= _MIN_PREFIX_CHARS and longer.startswith(shorter))
+
+
+def _overlap_length(previous: List[QuestionAnswer], current: List[QuestionAnswer]) -> int:
+    """How many leading questions of a chunk repeat the trailing questions of the chunk before it."""
+    for length in range(min(_MERGE_WINDOW, len(previous), len(current)), 0, -1):
+        if all(_same_question(old, new) for old, new in zip(previous[-length:], current[:length])):
+            return length
+    return 0
+
+
+def merge_questions(chunk_questions: List[List[QuestionAnswer]]) -> List[QuestionAnswer]:
+    """
+    Merge per-chunk parses in order, dropping questions repeated by the overlap.
+    
+    Only the head of each chunk is compared, against the tail of the chunk
+    before it: the longest run of leading questions that pairwise match the
+    previous chunk's trailing questions (equal normalized text, or one a
+    prefix of the other for a question cut off at the chunk edge) is merged
+    into them. Repeated questions elsewhere are kept. Merged pairs keep the
+    longer text, and the answer from whichever copy has one.
+    """
+    merged: List[QuestionAnswer] = []
+    previous: List[QuestionAnswer] = []
+    for questions in chunk_questions:
+        overlap = _overlap_length(previous, questions)
+        for offset, question in enumerate(questions[:overlap]):
+            index = len(merged) - overlap + offset
+            existing = merged[index]
+            merged[index] = QuestionAnswer(
+                question=max(existing.question, question.question, key=len),
+                correct_answer=max(existing.correct_answer, question.correct_answer, key=len)
+            )
+        merged.extend(questions[overlap:])
+        if questions:
+            previous = merged[len(merged) - len(questions):]
+    return merged
+
+
+def _chunks_for(text: str) -> List[str]:
+    chunks = split_exam_text(text, settings.PARSE_CHUNK_CHARS, settings.PARSE_CHUNK_OVERLAP_CHARS)
+    if len(chunks) > 1:
+        logger.info(f"Parsing {len(text)} chars of exam text in {len(chunks)} chunks")
+    return chunks
+
+
+def _parse_chunked(text: str) -> List[QuestionAnswer]:
+    """Parse text with Gemini, one call per chunk in parallel."""
+    chunks = _chunks_for(text)
+    if len(chunks) == 1:
+        return gemini_service.parse_exam_text(text)
+    workers = max(1, min(settings.PARSE_CHUNK_CONCURRENCY, len(chunks)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="parse-chunk") as executor:
+        chunk_questions = list(executor.map(gemini_service.parse_exam_text, chunks))
+    return merge_questions(chunk_questions)
+
+
+async def _parse_chunked_async(text: str) -> List[QuestionAnswer]:
+    """Async variant of _parse_chunked."""
+    chunks = _chunks_for(text)
+    if len(chunks) == 1:
+        return await gemini_service.parse_exam_text_async(text)
+    semaphore = asyncio.Semaphore(max(1, settings.PARSE_CHUNK_CONCURRENCY))
+    
+    async def parse_chunk(chunk: str) -> List[QuestionAnswer]:
+        async with semaphore:
+            return await gemini_service.parse_exam_text_async(chunk)
+    
+    chunk_questions = await asyncio.gather(*(parse_chunk(chunk) for chunk in chunks))
+    return merge_questions(chunk_questions)
+
+
+def _parse_and_cache(text: str, cache_key: str) -> List[QuestionAnswer]:
+    """Parse with Gemini (or the cache) and store non-empty results."""
+    parse_cache = get_parse_cache()
+    if parse_cache is not None:
+        # Another flight may have finished between the caller's lookup and now
+        cached = parse_cache.get(cache_key)
+        if cached is not None:
+            return [QuestionAnswer(**question) for question in cached]
+    
+    questions = _parse_chunked(text)
+    if parse_cache is not None and questions:
+        parse_cache.set(cache_key, [question.model_dump() for question in questions])
+    return questions
+
+
+async def _parse_and_cache_async(text: str, cache_key: str) -> List[QuestionAnswer]:
+    """Async variant of _parse_and_cache."""
+    parse_cache = get_parse_cache()
+    if parse_cache is not None:
+        cached = await parse_cache.get_async(cache_key)
+        if cached is not None:
+            return [QuestionAnswer(**question) for question in cached]
+    
+    questions = await _parse_chunked_async(text)
+    if parse_cache is not None and questions:
+        await parse_cache.set_async(cache_key, [question.model_dump() for question in questions])
+    return questions
+
+
+def _cached_questions(cached: Optional[list]) -> Optional[List[QuestionAnswer]]:
+    if cached is None:
+        return None
+    logger.info(f"Parse cache hit ({len(cached)} questions)")
+    return [QuestionAnswer(**question) for question in cached]
+
+
+def parse_exam_text(text: str) -> List[QuestionAnswer]:
+    """
+    Parse exam text into questions, reusing earlier parses of the same text.
+    
+    Concurrent callers with the same text share a single Gemini call.
+    Texts longer than PARSE_CHUNK_CHARS are split at question boundaries
+    and the chunks parsed in parallel. This call blocks; use parse_exam_text_async from request handlers.
+    
+    Args:
+        text: Extracted exam text
+        
+    Returns:
+        List of QuestionAnswer objects
+    """
+    cache_key = parse_cache_key(text)
+    parse_cache = get_parse_cache()
+    cached = _cached_questions(parse_cache.get(cache_key) if parse_cache is not None else None)
+    if cached is not None:
+        return cached
+    return _parse_flights.do(cache_key, _parse_and_cache, text, cache_key)
+
+
+async def parse_exam_text_async(text: str) -> List[QuestionAnswer]:
+    """
+    Parse exam text with the async Gemini client.
+    
+    Same caching and coalescing as parse_exam_text; callers in other
+    threads or requests share the same in-flight call.
+    """
+    cache_key = parse_cache_key(text)
+    parse_cache = get_parse_cache()
+    cached = _cached_questions(await parse_cache.get_async(cache_key) if parse_cache is not None else None)
+    if cached is not None:
+        return cached
+    return await _parse_flights.do_async(cache_key, _parse_and_cache_async, text, cache_key)
@@ -0,0 +1,212 @@
+"""
+Image preprocessing ahead of OCR.
+
+Each step takes and returns a uint8 NumPy image and is built from
+vectorized NumPy and PIL operations. Steps are combined into named
+profiles selected with Settings.OCR_PREPROCESS_PROFILE.
+"""
+import logging
+from typing import Callable, Dict, List
+import numpy as np
+from PIL import Image
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Named step sequences; "none" leaves images untouched
+PROFILES: Dict[str, List[str]] = {
+    "none": [],
+    "grayscale": ["grayscale"],
+    "clean": ["grayscale", "contrast", "crop"],
+    "scan": ["grayscale", "contrast", "deskew", "crop", "resolution"],
+    "binary": ["grayscale", "contrast", "deskew", "crop", "resolution", "binarize"]
+}
+
+# Steps that move, rotate or rescale the image
+GEOMETRIC_STEPS = {"deskew", "crop", "resolution"}
+
+# Pixels darker than this count as ink when measuring layout
+INK_THRESHOLD = 128
+
+# Deskew search range and resolution (degrees), and the width it is estimated at
+DESKEW_MAX_ANGLE = 5.0
+DESKEW_STEP = 0.5
+DESKEW_SAMPLE_WIDTH = 800
+
+# Whitespace kept around the text when cropping margins (pixels)
+CROP_PADDING = 16
+
+# Resolution targeting: allowed scale range, changes smaller than this are skipped,
+# and the largest side produced
+RESOLUTION_MIN_SCALE = 0.5
+RESOLUTION_MAX_SCALE = 2.5
+RESOLUTION_TOLERANCE = 0.15
+RESOLUTION_MAX_SIDE = 4000
+
+
+def to_grayscale(image_array: np.ndarray) -> np.ndarray:
+    """Collapse an RGB array to uint8 grayscale (ITU-R 601 luma)."""
+    if image_array.ndim == 2:
+        return image_array
+    return (image_array[..., :3] @ np.array([0.299, 0.587, 0.114])).astype(np.uint8)
+
+
+def normalize_contrast(image_array: np.ndarray, low_percentile: float = 1, high_percentile: float = 99) -> np.ndarray:
+    """Stretch intensities so the given percentiles map to black and white."""
+    low, high = np.percentile(image_array, [low_percentile, high_percentile])
+    if high - low < 1:
+        return image_array
+    lut = np.clip((np.arange(256) - low) * 255.0 / (high - low), 0, 255).astype(np.uint8)
+    return lut[image_array]
+
+
+def otsu_threshold(image_array: np.ndarray) -> int:
+    """Global threshold maximizing between-class variance of the histogram."""
+    histogram = np.bincount(to_grayscale(image_array).ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256)
+    weight_dark = np.cumsum(histogram)
+    weight_light = weight_dark[-1] - weight_dark
+    sum_dark = np.cumsum(histogram * levels)
+    mean_dark = sum_dark / np.maximum(weight_dark, 1)
+    mean_light = (sum_dark[-1] - sum_dark) / np.maximum(weight_light, 1)
+    between = weight_dark * weight_light * (mean_dark - mean_light) ** 2
+    return int(np.argmax(between))
+
+
+def binarize(image_array: np.ndarray) -> np.ndarray:
+    """Map pixels to pure black or white with Otsu's threshold."""
+    gray = to_grayscale(image_array)
+    return np.where(gray > otsu_threshold(gray), 255, 0).astype(np.uint8)
+
+
+def _ink_mask(image_array: np.ndarray) -> np.ndarray:
+    return to_grayscale(image_array) < INK_THRESHOLD
+
+
+def estimate_skew(image_array: np.ndarray) -> float:
+    """
+    Estimate the text rotation in degrees from horizontal projection profiles.
+    
+    Rotating by the right angle lines text rows up with pixel rows, which
+    maximizes the variance of the per-row ink counts.
+    """
+    gray = to_grayscale(image_array)
+    image = Image.fromarray(gray)
+    if image.width > DESKEW_SAMPLE_WIDTH:
+        image = image.resize((DESKEW_SAMPLE_WIDTH, max(1, image.height * DESKEW_SAMPLE_WIDTH // image.width)))
+    # Rotate the ink mask (white on black) so the exposed corners add no ink
+    ink = Image.fromarray(np.where(np.asarray(image) < INK_THRESHOLD, 255, 0).astype(np.uint8))
+    
+    best_angle, best_score = 0.0, -1.0
+    for angle in np.arange(-DESKEW_MAX_ANGLE, DESKEW_MAX_ANGLE + DESKEW_STEP / 2, DESKEW_STEP):
+        rows = np.asarray(ink.rotate(float(angle), resample=Image.Resampling.NEAREST)).sum(axis=1, dtype=np.float64)
+        score = rows.var()
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+
+def deskew(image_array: np.ndarray) -> np.ndarray:
+    """Rotate the image so text lines are horizontal."""
+    angle = estimate_skew(image_array)
+    if abs(angle) < DESKEW_STEP / 2:
+        return image_array
+    logger.debug(f"Deskewing by {angle:.1f} degrees")
+    fill = 255 if image_array.ndim == 2 else (255,) * image_array.shape[2]
+    rotated = Image.fromarray(image_array).rotate(angle, resample=Image.Resampling.BILINEAR, expand=True, fillcolor=fill)
+    return np.asarray(rotated)
+
+
+def crop_margins(image_array: np.ndarray, padding: int = CROP_PADDING) -> np.ndarray:
+    """Crop blank margins down to the inked area plus padding."""
+    ink = _ink_mask(image_array)
+    rows = np.flatnonzero(ink.any(axis=1))
+    cols = np.flatnonzero(ink.any(axis=0))
+    if rows.size == 0 or cols.size == 0:
+        return image_array
+    top = max(0, rows[0] - padding)
+    bottom = min(image_array.shape[0], rows[-1] + 1 + padding)
+    left = max(0, cols[0] - padding)
+    right = min(image_array.shape[1], cols[-1] + 1 + padding)
+    return image_array[top:bottom, left:right]
+
+
+def estimate_text_height(image_array: np.ndarray) -> float:
+    """
+    Median height in pixels of text lines, from runs of inked rows (0 if none).
+    
+    Rows count as inked when at least 0.5% of their pixels are ink.
+    """
+    ink = _ink_mask(image_array)
+    inked_rows = ink.sum(axis=1) >= max(1, ink.shape[1] // 200)
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], inked_rows.astype(np.int8), [0]))))
+    heights = edges[1::2] - edges[::2]
+    heights = heights[heights >= 3]
+    return float(np.median(heights)) if heights.size else 0.0
+
+
+def target_resolution(image_array: np.ndarray, text_height: int = None) -> np.ndarray:
+    """Rescale so text lines are about text_height pixels (OCR_TARGET_TEXT_HEIGHT) tall."""
+    text_height = text_height or settings.OCR_TARGET_TEXT_HEIGHT
+    measured = estimate_text_height(image_array)
+    if measured <= 0:
+        return image_array
+    scale = float(np.clip(text_height / measured, RESOLUTION_MIN_SCALE, RESOLUTION_MAX_SCALE))
+    scale = min(scale, RESOLUTION_MAX_SIDE / max(image_array.shape[:2]))
+    if abs(scale - 1) < RESOLUTION_TOLERANCE:
+        return image_array
+    height, width = image_array.shape[:2]
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    logger.debug(f"Text height {measured:.0f}px, rescaling {width}x{height} by {scale:.2f}")
+    return np.asarray(Image.fromarray(image_array).resize(size, Image.Resampling.LANCZOS))
+
+
+STEPS: Dict[str, Callable[[np.ndarray], np.ndarray]] = {
+    "grayscale": to_grayscale,
+    "contrast": normalize_contrast,
+    "binarize": binarize,
+    "deskew": deskew,
+    "crop": crop_margins,
+    "resolution": target_resolution
+}
+
+
+def resolve_profile(profile: str = None) -> List[str]:
+    """
+    Step names for a profile name or a comma-separated list of steps.
+    
+    Raises:
+        ValueError: If the profile or a step is unknown
+    """
+    profile = (settings.OCR_PREPROCESS_PROFILE if profile is None else profile).strip().lower()
+    if profile in PROFILES:
+        return list(PROFILES[profile])
+    steps = [step.strip() for step in profile.split(",") if step.strip()]
+    unknown = [step for step in steps if step not in STEPS]
+    if unknown or not steps:
+        raise ValueError(
+            f"Unknown OCR_PREPROCESS_PROFILE: {profile}. Use one of {sorted(PROFILES)} "
+            f"or a comma-separated list of {sorted(STEPS)}"
+        )
+    return steps
+
+
+def preserves_geometry(profile: str = None) -> bool:
+    """Whether a profile keeps pixel positions, so coordinates map back to the page by scaling alone."""
+    return not GEOMETRIC_STEPS.intersection(resolve_profile(profile))
+
+
+def preprocess(image_array: np.ndarray, profile: str = None) -> np.ndarray:
+    """
+    Run an image through the steps of a preprocessing profile.
+    
+    Args:
+        image_array: uint8 grayscale or RGB image
+        profile: Profile name or step list (default: OCR_PREPROCESS_PROFILE)
+    
+    Returns:
+        The processed image (the input itself for the "none" profile)
+    """
+    for step in resolve_profile(profile):
+        image_array = STEPS[step](image_array)
+    return np.ascontiguousarray(image_array)
@@ -0,0 +1,306 @@
+"""
+Client-side rate limiting, adaptive concurrency and retries for Gemini calls.
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# HTTP status codes worth retrying; quota errors and overload also shrink concurrency
+_THROTTLE_CODES = {429}
+_SERVER_ERROR_CODES = {500, 502, 503, 504}
+
+# Shared limiter for all Gemini calls (lazy loading)
+_gemini_limiter: Optional["RateLimiter"] = None
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at per_minute.
+
+    reserve() always succeeds and returns how long the caller must wait,
+    so it works for both blocking and async callers.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1) -> float:
+        """Take amount tokens and return the seconds to wait before using them."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD concurrency limit: +1 per limit-many successes, halved on throttling.
+
+    Decreases are applied at most once per cooldown so a burst of failures
+    from one overload event does not collapse the limit to the minimum.
+    Threads wait on a condition; coroutines wait on futures that release()
+    resolves on their own event loop.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1, cooldown_seconds: float = 1.0):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.cooldown_seconds = cooldown_seconds
+        self._limit = float(self.max_limit)
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+        self._async_waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def try_acquire(self) -> bool:
+        with self._condition:
+            if self._in_flight < int(self._limit):
+                self._in_flight += 1
+                return True
+            return False
+
+    def acquire(self):
+        """Block until a slot is free."""
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                self._condition.wait()
+            self._in_flight += 1
+
+    async def acquire_async(self):
+        """Wait for a free slot without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                if self._in_flight < int(self._limit):
+                    self._in_flight += 1
+                    return
+                waiter = loop.create_future()
+                entry = (loop, waiter)
+                self._async_waiters.append(entry)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                with self._condition:
+                    if entry in self._async_waiters:
+                        self._async_waiters.remove(entry)
+                    else:
+                        self._wake_async_waiters()  # pass on the wakeup this waiter received
+                raise
+
+    def _wake_async_waiters(self):
+        """Wake as many async waiters as there are free slots (lock held)."""
+        free = int(self._limit) - self._in_flight
+        while free > 0 and self._async_waiters:
+            loop, waiter = self._async_waiters.popleft()
+            try:
+                loop.call_soon_threadsafe(_resolve_waiter, waiter)
+            except RuntimeError:
+                continue  # the waiter's loop is closed
+            free -= 1
+
+    def release(self, throttled: bool = False):
+        """Free a slot and adjust the limit from the call's outcome."""
+        with self._condition:
+            self._in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                if now - self._last_decrease >= self.cooldown_seconds:
+                    self._limit = max(float(self.min_limit), self._limit / 2)
+                    self._last_decrease = now
+                    logger.warning(f"Gemini throttled, concurrency limit lowered to {int(self._limit)}")
+            else:
+                self._limit = min(float(self.max_limit), self._limit + 1 / self._limit)
+            self._condition.notify_all()
+            self._wake_async_waiters()
+
+
+def _resolve_waiter(waiter: asyncio.Future):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+def classify_error(error: BaseException) -> Optional[str]:
+    """
+    Classify a failed call: "throttled", "server" (both retried) or None.
+
+    Google API errors carry the HTTP status in `code`; timeouts and dropped
+    connections are treated as server errors.
+    """
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        if code in _THROTTLE_CODES:
+            return "throttled"
+        if code in _SERVER_ERROR_CODES:
+            return "server"
+        return None
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return "server"
+    return None
+
+
+class RateLimiter:
+    """
+    Shared gate for API calls: request and token buckets, adaptive
+    concurrency, and retries with exponential backoff and full jitter.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_concurrency: int = 8,
+        min_concurrency: int = 1,
+        max_retries: int = 4,
+        retry_base_seconds: float = 1.0,
+        retry_max_seconds: float = 30.0
+    ):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.concurrency = AdaptiveConcurrency(max_concurrency, min_concurrency)
+        self.max_retries = max(0, max_retries)
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+
+        self._lock = threading.Lock()
+        self._counters = {
+            "calls": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "throttled_waits": 0,
+            "throttled_wait_seconds": 0.0,
+            "retries": 0,
+            "quota_errors": 0,
+            "server_errors": 0
+        }
+
+    def _count(self, name: str, amount: float = 1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def _reserve(self, tokens: int) -> float:
+        """Reserve one request and the estimated tokens; return the wait needed."""
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.reserve(tokens))
+        if wait > 0:
+            self._count("throttled_waits")
+            self._count("throttled_wait_seconds", wait)
+            logger.info(f"Rate limit reached, delaying Gemini call by {wait:.2f}s")
+        return wait
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given retry attempt (0-based)."""
+        return random.uniform(0, min(self.retry_max_seconds, self.retry_base_seconds * 2 ** attempt))
+
+    def _after_failure(self, error: BaseException, attempt: int) -> Optional[float]:
+        """Record a failure; return the backoff delay if the call should be retried."""
+        kind = classify_error(error)
+        self.concurrency.release(throttled=kind is not None)
+        if kind == "throttled":
+            self._count("quota_errors")
+        elif kind == "server":
+            self._count("server_errors")
+        if kind is None or attempt >= self.max_retries:
+            self._count("failed")
+            return None
+        delay = self.backoff_delay(attempt)
+        self._count("retries")
+        logger.warning(f"Gemini call failed ({kind}: {str(error)[:200]}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+        return delay
+
+    def call(self, fn: Callable[..., Any], *args, tokens: int = 0) -> Any:
+        """Run a blocking call under the limits, retrying retriable errors."""
+        self._count("calls")
+        attempt = 0
+        while True:
+            wait = self._reserve(tokens)
+            if wait > 0:
+                time.sleep(wait)
+            self.concurrency.acquire()
+            try:
+                result = fn(*args)
+            except Exception as e:
+                delay = self._after_failure(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.concurrency.release()
+            self._count("succeeded")
+            return result
+
+    async def call_async(self, fn: Callable[..., Awaitable[Any]], *args, tokens: int = 0) -> Any:
+        """Async variant of call for coroutine functions."""
+        self._count("calls")
+        attempt = 0
+        while True:
+            wait = self._reserve(tokens)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await self.concurrency.acquire_async()
+            try:
+                result = await fn(*args)
+            except asyncio.CancelledError:
+                self.concurrency.release()
+                raise
+            except Exception as e:
+                delay = self._after_failure(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self.concurrency.release()
+            self._count("succeeded")
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Return call counters and the current concurrency state."""
+        with self._lock:
+            stats = dict(self._counters)
+        stats["throttled_wait_seconds"] = round(stats["throttled_wait_seconds"], 3)
+        stats["concurrency_limit"] = self.concurrency.limit
+        stats["in_flight"] = self.concurrency.in_flight
+        return stats
+
+
+def get_gemini_limiter() -> RateLimiter:
+    """Get or initialize the limiter shared by all Gemini calls."""
+    global _gemini_limiter
+    if _gemini_limiter is None:
+        _gemini_limiter = RateLimiter(
+            requests_per_minute=settings.GEMINI_RPM_LIMIT,
+            tokens_per_minute=settings.GEMINI_TPM_LIMIT,
+            max_concurrency=settings.GEMINI_MAX_CONCURRENCY,
+            min_concurrency=settings.GEMINI_MIN_CONCURRENCY,
+            max_retries=settings.GEMINI_MAX_RETRIES,
+            retry_base_seconds=settings.GEMINI_RETRY_BASE_SECONDS,
+            retry_max_seconds=settings.GEMINI_RETRY_MAX_SECONDS
+        )
+    return _gemini_limiter
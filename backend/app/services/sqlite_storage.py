@@ -0,0 +1,297 @@
+"""
+SQLite storage backend: persistent, shared by all worker processes on a host.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+from app.models import QuestionAnswer, QuestionGrade
+from app.services.storage import ExamStore
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS exams ("
+    "exam_id TEXT PRIMARY KEY, file_type TEXT, filename TEXT, file_hash TEXT, "
+    "file_ref TEXT, extracted_text TEXT, questions TEXT, status TEXT, "
+    "created_at REAL NOT NULL, updated_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS idx_exams_file_hash ON exams(file_hash, created_at)",
+    "CREATE TABLE IF NOT EXISTS results ("
+    "exam_id TEXT PRIMARY KEY REFERENCES exams(exam_id) ON DELETE CASCADE, "
+    "final_score REAL, correct_count INTEGER, local_resolution_rate REAL, graded_at REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS question_grades ("
+    "exam_id TEXT NOT NULL REFERENCES exams(exam_id) ON DELETE CASCADE, "
+    "position INTEGER NOT NULL, grade TEXT NOT NULL, "
+    "PRIMARY KEY (exam_id, position))",
+    "CREATE TABLE IF NOT EXISTS student_results ("
+    "exam_id TEXT NOT NULL REFERENCES exams(exam_id) ON DELETE CASCADE, "
+    "student_id TEXT NOT NULL, final_score REAL, correct_count INTEGER, local_resolution_rate REAL, "
+    "question_grades TEXT NOT NULL, graded_at REAL NOT NULL, "
+    "PRIMARY KEY (exam_id, student_id))"
+]
+
+# Columns update_exam may set, and whether they hold JSON
+_EXAM_FIELDS = {
+    "file_type": False,
+    "filename": False,
+    "file_hash": False,
+    "file_ref": False,
+    "extracted_text": False,
+    "questions": True,
+    "status": True
+}
+
+_SELECT_EXAM = (
+    "SELECT exam_id, file_type, filename, file_hash, file_ref, extracted_text, questions, status "
+    "FROM exams WHERE exam_id = ?"
+)
+_INSERT_EXAM = (
+    "INSERT OR REPLACE INTO exams "
+    "(exam_id, file_type, filename, file_hash, file_ref, extracted_text, questions, status, created_at, updated_at) "
+    "VALUES (?, ?, ?, ?, ?, ?, NULL, ?, ?, ?)"
+)
+_INSERT_RESULTS = (
+    "INSERT OR REPLACE INTO results (exam_id, final_score, correct_count, local_resolution_rate, graded_at) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
+_INSERT_GRADE = "INSERT INTO question_grades (exam_id, position, grade) VALUES (?, ?, ?)"
+_INSERT_STUDENT_RESULTS = (
+    "INSERT OR REPLACE INTO student_results "
+    "(exam_id, student_id, final_score, correct_count, local_resolution_rate, question_grades, graded_at) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def _dump_questions(questions: Optional[List[QuestionAnswer]]) -> Optional[str]:
+    if questions is None:
+        return None
+    return json.dumps([question.model_dump() for question in questions], ensure_ascii=False)
+
+
+def _load_questions(raw_questions: Optional[str]) -> Optional[List[QuestionAnswer]]:
+    if raw_questions is None:
+        return None
+    return [QuestionAnswer(**question) for question in json.loads(raw_questions)]
+
+
+def _dump_grades(grades: Optional[List[QuestionGrade]]) -> str:
+    return json.dumps([grade.model_dump() for grade in grades or []], ensure_ascii=False)
+
+
+class SQLiteExamStore(ExamStore):
+    """
+    Exams in a single SQLite file in WAL mode.
+
+    Each thread gets its own connection; readers never block the writer.
+    All statements are parameterized so sqlite3 reuses their prepared
+    forms, and per-question grades are written in one batched transaction.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            # Databases created before uploads moved to the blob store
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(exams)")}
+            if "file_ref" not in columns:
+                conn.execute("ALTER TABLE exams ADD COLUMN file_ref TEXT")
+        logger.info(f"Opened SQLite exam storage at {db_path}")
+
+    def _conn(self) -> sqlite3.Connection:
+        """This thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, cached_statements=256, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def create_exam(
+        self,
+        exam_id: str,
+        file_ref: str,
+        file_type: str,
+        filename: str,
+        status: Dict,
+        file_hash: Optional[str] = None,
+        extracted_text: Optional[str] = None
+    ):
+        now = time.time()
+        status_json = json.dumps(status) if status is not None else None
+        with self._conn() as conn:
+            conn.execute(
+                _INSERT_EXAM,
+                (exam_id, file_type, filename, file_hash, file_ref, extracted_text, status_json, now, now)
+            )
+
+    def update_exam(self, exam_id: str, **fields: Any):
+        if not fields:
+            return
+        unknown = set(fields) - set(_EXAM_FIELDS)
+        if unknown:
+            raise ValueError(f"Cannot update unknown exam fields: {sorted(unknown)}")
+
+        assignments = []
+        values = []
+        for field in sorted(fields):
+            value = fields[field]
+            if field == "questions":
+                value = _dump_questions(value)
+            elif _EXAM_FIELDS[field] and value is not None:
+                value = json.dumps(value)
+            assignments.append(f"{field} = ?")
+            values.append(value)
+        values.extend([time.time(), exam_id])
+
+        with self._conn() as conn:
+            conn.execute(f"UPDATE exams SET {', '.join(assignments)}, updated_at = ? WHERE exam_id = ?", values)
+
+    def delete_exam(self, exam_id: str):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM exams WHERE exam_id = ?", (exam_id,))
+
+    def get_exam(self, exam_id: str) -> Optional[Dict]:
+        row = self._conn().execute(_SELECT_EXAM, (exam_id,)).fetchone()
+        if row is None:
+            return None
+        exam_id, file_type, filename, file_hash, file_ref, extracted_text, questions, status = row
+        return {
+            "exam_id": exam_id,
+            "file_ref": file_ref,
+            "file_type": file_type,
+            "filename": filename,
+            "file_hash": file_hash,
+            "extracted_text": extracted_text,
+            "questions": _load_questions(questions),
+            "results": self.get_results(exam_id),
+            "status": json.loads(status) if status is not None else None
+        }
+
+    def find_exam_by_hash(self, file_hash: str) -> Optional[str]:
+        row = self._conn().execute(
+            "SELECT exam_id FROM exams WHERE file_hash = ? ORDER BY created_at DESC LIMIT 1",
+            (file_hash,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def file_refs(self) -> Set[str]:
+        rows = self._conn().execute("SELECT DISTINCT file_ref FROM exams WHERE file_ref IS NOT NULL").fetchall()
+        return {row[0] for row in rows}
+
+    def store_parsed_questions(self, exam_id: str, questions: List[QuestionAnswer]):
+        self.update_exam(exam_id, questions=questions)
+
+    def get_parsed_questions(self, exam_id: str) -> Optional[List[QuestionAnswer]]:
+        row = self._conn().execute("SELECT questions FROM exams WHERE exam_id = ?", (exam_id,)).fetchone()
+        return _load_questions(row[0]) if row else None
+
+    def store_results(self, exam_id: str, results: Dict):
+        grades = [
+            (exam_id, position, json.dumps(grade.model_dump(), ensure_ascii=False))
+            for position, grade in enumerate(results.get("question_grades") or [])
+        ]
+        with self._conn() as conn:
+            exists = conn.execute("SELECT 1 FROM exams WHERE exam_id = ?", (exam_id,)).fetchone()
+            if not exists:
+                return
+            conn.execute(
+                _INSERT_RESULTS,
+                (
+                    exam_id,
+                    results.get("final_score"),
+                    results.get("correct_count"),
+                    results.get("local_resolution_rate"),
+                    time.time()
+                )
+            )
+            conn.execute("DELETE FROM question_grades WHERE exam_id = ?", (exam_id,))
+            conn.executemany(_INSERT_GRADE, grades)
+
+    def get_results(self, exam_id: str) -> Optional[Dict]:
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT final_score, correct_count, local_resolution_rate FROM results WHERE exam_id = ?",
+            (exam_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        grades = conn.execute(
+            "SELECT grade FROM question_grades WHERE exam_id = ? ORDER BY position",
+            (exam_id,)
+        ).fetchall()
+        return {
+            "question_grades": [QuestionGrade(**json.loads(grade)) for (grade,) in grades],
+            "final_score": row[0],
+            "correct_count": row[1],
+            "local_resolution_rate": row[2]
+        }
+
+    def store_student_results(self, exam_id: str, student_results: Dict[str, Dict]):
+        now = time.time()
+        rows = [
+            (
+                exam_id,
+                student_id,
+                results.get("final_score"),
+                results.get("correct_count"),
+                results.get("local_resolution_rate"),
+                _dump_grades(results.get("question_grades")),
+                now
+            )
+            for student_id, results in student_results.items()
+        ]
+        with self._conn() as conn:
+            exists = conn.execute("SELECT 1 FROM exams WHERE exam_id = ?", (exam_id,)).fetchone()
+            if not exists:
+                return
+            conn.executemany(_INSERT_STUDENT_RESULTS, rows)
+
+    def get_student_results(self, exam_id: str) -> Dict[str, Dict]:
+        rows = self._conn().execute(
+            "SELECT student_id, final_score, correct_count, local_resolution_rate, question_grades "
+            "FROM student_results WHERE exam_id = ? ORDER BY student_id",
+            (exam_id,)
+        ).fetchall()
+        return {
+            student_id: {
+                "question_grades": [QuestionGrade(**grade) for grade in json.loads(grades)],
+                "final_score": final_score,
+                "correct_count": correct_count,
+                "local_resolution_rate": local_resolution_rate
+            }
+            for student_id, final_score, correct_count, local_resolution_rate, grades in rows
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._conn()
+        return {
+            "backend": "sqlite",
+            "entries": conn.execute("SELECT COUNT(*) FROM exams").fetchone()[0],
+            "graded_entries": conn.execute("SELECT COUNT(*) FROM results").fetchone()[0],
+            "student_results": conn.execute("SELECT COUNT(*) FROM student_results").fetchone()[0],
+            "file_bytes": os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0
+        }
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
@@ -1,12 +1,410 @@
 """
-In-memory storage for exams and results.
+Storage for exams and results.
+
+The module-level functions delegate to a backend selected by
+Settings.STORAGE_TYPE: "memory" (default, per process) or "sqlite"
+(persistent and shareable between worker processes). Raw upload bytes
+live in the blob store; exam records only hold a reference to them.
 """
+import logging
+import sys
+import threading
+import time
 import uuid
-from typing import Dict, Optional, List
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Dict, Optional, List, Set, Union
+from pydantic import BaseModel
+from app.config import settings
 from app.models import QuestionAnswer
+from app.services.blob_store import get_blob_store
+
+logger = logging.getLogger(__name__)
+
+
+class ExamStore(ABC):
+    """Interface implemented by storage backends."""
+
+    @abstractmethod
+    def create_exam(
+        self,
+        exam_id: str,
+        file_ref: str,
+        file_type: str,
+        filename: str,
+        status: Dict,
+        file_hash: Optional[str] = None,
+        extracted_text: Optional[str] = None
+    ):
+        """Register an uploaded exam whose file is stored in the blob store under file_ref."""
+
+    @abstractmethod
+    def update_exam(self, exam_id: str, **fields):
+        """Update fields of an existing exam."""
+
+    @abstractmethod
+    def delete_exam(self, exam_id: str):
+        """Remove an exam and everything stored for it."""
+
+    @abstractmethod
+    def get_exam(self, exam_id: str) -> Optional[Dict]:
+        """Get exam data by ID."""
+
+    @abstractmethod
+    def find_exam_by_hash(self, file_hash: str) -> Optional[str]:
+        """Get the ID of the most recent exam uploaded with this file content."""
+
+    @abstractmethod
+    def file_refs(self) -> Set[str]:
+        """Blob references held by stored exams."""
+
+    @abstractmethod
+    def store_parsed_questions(self, exam_id: str, questions: List[QuestionAnswer]):
+        """Store parsed questions for an exam."""
+
+    @abstractmethod
+    def get_parsed_questions(self, exam_id: str) -> Optional[List[QuestionAnswer]]:
+        """Get parsed questions for an exam."""
+
+    @abstractmethod
+    def store_results(self, exam_id: str, results: Dict):
+        """Store grading results."""
+
+    @abstractmethod
+    def get_results(self, exam_id: str) -> Optional[Dict]:
+        """Get grading results for an exam."""
+
+    @abstractmethod
+    def store_student_results(self, exam_id: str, student_results: Dict[str, Dict]):
+        """Store grading results for several students, replacing theirs if present."""
+
+    @abstractmethod
+    def get_student_results(self, exam_id: str) -> Dict[str, Dict]:
+        """Get grading results for every student graded against an exam, by student ID."""
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry counts and sizes, for introspection."""
+        return {}
+
+    def close(self):
+        """Release any resources held by the backend."""
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate bytes held by a value, following containers and models."""
+    if value is None:
+        return 0
+    if isinstance(value, (str, bytes, int, float, bool)):
+        return sys.getsizeof(value)
+    if isinstance(value, BaseModel):
+        return sys.getsizeof(value) + estimate_size(value.__dict__)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+# Exams in any other state are still being processed and are never evicted
+_SETTLED_STATES = (None, "done", "failed")
+
+
+class MemoryExamStore(ExamStore):
+    """
+    Per-process storage in plain dicts; lost on restart.
+
+    Optionally bounded by entry count, estimated bytes and idle time. The
+    least recently used settled exams are evicted first; with a spill
+    store, evicted exams move there and are restored on their next access.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 0,
+        max_bytes: int = 0,
+        ttl_seconds: float = 0,
+        spill_store: Optional[ExamStore] = None
+    ):
+        self.max_entries = max(0, max_entries)
+        self.max_bytes = max(0, max_bytes)
+        self.ttl_seconds = max(0, ttl_seconds)
+        self.spill_store = spill_store
+
+        self._lock = threading.RLock()
+        self._exams: "OrderedDict[str, Dict]" = OrderedDict()
+        # Estimated bytes per field, per exam
+        self._sizes: Dict[str, Dict[str, int]] = {}
+        self._accessed: Dict[str, float] = {}
+        self._total_bytes = 0
+        # File content hash -> exam_id, for recognizing re-uploads
+        self._exams_by_hash: Dict[str, str] = {}
+        self._counters = {"evictions": 0, "expirations": 0, "spilled": 0, "restored": 0}
+
+    def _measure(self, exam_id: str, fields: Dict[str, Any]):
+        """Update byte accounting for changed fields (lock held)."""
+        sizes = self._sizes.setdefault(exam_id, {})
+        for field, value in fields.items():
+            size = estimate_size(value)
+            self._total_bytes += size - sizes.get(field, 0)
+            sizes[field] = size
+
+    def _insert(self, exam: Dict):
+        """Add an exam as the most recently used entry (lock held)."""
+        exam_id = exam["exam_id"]
+        self._exams[exam_id] = exam
+        self._accessed[exam_id] = time.monotonic()
+        self._measure(exam_id, exam)
+        if exam.get("file_hash"):
+            self._exams_by_hash[exam["file_hash"]] = exam_id
+
+    def _remove(self, exam_id: str) -> Optional[Dict]:
+        """Drop an exam from memory (lock held)."""
+        exam = self._exams.pop(exam_id, None)
+        if exam is None:
+            return None
+        self._accessed.pop(exam_id, None)
+        self._total_bytes -= sum(self._sizes.pop(exam_id, {}).values())
+        if self.spill_store is None and self._exams_by_hash.get(exam.get("file_hash")) == exam_id:
+            del self._exams_by_hash[exam["file_hash"]]
+        return exam
+
+    def _is_pinned(self, exam: Dict) -> bool:
+        return (exam.get("status") or {}).get("state") not in _SETTLED_STATES
+
+    def _is_expired(self, exam_id: str, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - self._accessed[exam_id] > self.ttl_seconds
+
+    def _evict(self, exam_id: str, expired: bool = False):
+        """Remove an exam from memory, spilling it to disk if configured (lock held)."""
+        exam = self._remove(exam_id)
+        self._counters["expirations" if expired else "evictions"] += 1
+        if self.spill_store is not None:
+            self.spill_store.create_exam(
+                exam_id,
+                exam.get("file_ref"),
+                exam.get("file_type"),
+                exam.get("filename"),
+                exam.get("status"),
+                file_hash=exam.get("file_hash"),
+                extracted_text=exam.get("extracted_text")
+            )
+            if exam.get("questions") is not None:
+                self.spill_store.store_parsed_questions(exam_id, exam["questions"])
+            if exam.get("results") is not None:
+                self.spill_store.store_results(exam_id, exam["results"])
+            if exam.get("student_results"):
+                self.spill_store.store_student_results(exam_id, exam["student_results"])
+            self._counters["spilled"] += 1
+
+    def _enforce_limits(self, keep: Optional[str] = None):
+        """Expire idle exams, then evict LRU exams until within limits (lock held)."""
+        now = time.monotonic()
+        if self.ttl_seconds > 0:
+            for exam_id in list(self._exams):
+                if not self._is_expired(exam_id, now):
+                    break  # entries are in access order
+                if exam_id != keep and not self._is_pinned(self._exams[exam_id]):
+                    self._evict(exam_id, expired=True)
+
+        def over_limit() -> bool:
+            return (
+                (self.max_entries and len(self._exams) > self.max_entries)
+                or (self.max_bytes and self._total_bytes > self.max_bytes)
+            )
+
+        if not over_limit():
+            return
+        for exam_id in list(self._exams):
+            if not over_limit():
+                break
+            if exam_id != keep and not self._is_pinned(self._exams[exam_id]):
+                self._evict(exam_id)
+
+    def _lookup(self, exam_id: str) -> Optional[Dict]:
+        """Find an exam, restoring it from the spill store if needed (lock held)."""
+        exam = self._exams.get(exam_id)
+        if exam is not None:
+            if self._is_expired(exam_id, time.monotonic()) and not self._is_pinned(exam):
+                self._evict(exam_id, expired=True)
+            else:
+                self._exams.move_to_end(exam_id)
+                self._accessed[exam_id] = time.monotonic()
+                return exam
+
+        if self.spill_store is None:
+            return None
+        exam = self.spill_store.get_exam(exam_id)
+        if exam is None:
+            return None
+        exam["student_results"] = self.spill_store.get_student_results(exam_id) or None
+        self.spill_store.delete_exam(exam_id)
+        self._insert(exam)
+        self._counters["restored"] += 1
+        self._enforce_limits(keep=exam_id)
+        return exam
+
+    def create_exam(
+        self,
+        exam_id: str,
+        file_ref: str,
+        file_type: str,
+        filename: str,
+        status: Dict,
+        file_hash: Optional[str] = None,
+        extracted_text: Optional[str] = None
+    ):
+        with self._lock:
+            self._remove(exam_id)
+            self._insert({
+                "exam_id": exam_id,
+                "file_ref": file_ref,
+                "file_type": file_type,
+                "filename": filename,
+                "file_hash": file_hash,
+                "extracted_text": extracted_text,
+                "questions": None,
+                "results": None,
+                "student_results": None,
+                "status": status
+            })
+            self._enforce_limits(keep=exam_id)
+
+    def _update(self, exam_id: str, fields: Dict[str, Any]):
+        with self._lock:
+            exam = self._lookup(exam_id)
+            if exam is None:
+                return
+            exam.update(fields)
+            self._measure(exam_id, fields)
+            self._enforce_limits(keep=exam_id)
+
+    def update_exam(self, exam_id: str, **fields):
+        self._update(exam_id, fields)
+
+    def delete_exam(self, exam_id: str):
+        with self._lock:
+            exam = self._remove(exam_id)
+            if exam and self._exams_by_hash.get(exam.get("file_hash")) == exam_id:
+                del self._exams_by_hash[exam["file_hash"]]
+            if self.spill_store is not None:
+                self.spill_store.delete_exam(exam_id)
 
-# In-memory storage
-_exams: Dict[str, Dict] = {}
+    def get_exam(self, exam_id: str) -> Optional[Dict]:
+        with self._lock:
+            return self._lookup(exam_id)
+
+    def find_exam_by_hash(self, file_hash: str) -> Optional[str]:
+        with self._lock:
+            exam_id = self._exams_by_hash.get(file_hash)
+            if exam_id in self._exams:
+                return exam_id
+            if self.spill_store is not None:
+                return self.spill_store.find_exam_by_hash(file_hash)
+            return None
+
+    def file_refs(self) -> Set[str]:
+        with self._lock:
+            refs = {exam["file_ref"] for exam in self._exams.values() if exam.get("file_ref")}
+            if self.spill_store is not None:
+                refs |= self.spill_store.file_refs()
+            return refs
+
+    def store_parsed_questions(self, exam_id: str, questions: List[QuestionAnswer]):
+        self._update(exam_id, {"questions": questions})
+
+    def get_parsed_questions(self, exam_id: str) -> Optional[List[QuestionAnswer]]:
+        exam = self.get_exam(exam_id)
+        return exam.get("questions") if exam else None
+
+    def store_results(self, exam_id: str, results: Dict):
+        self._update(exam_id, {"results": results})
+
+    def get_results(self, exam_id: str) -> Optional[Dict]:
+        exam = self.get_exam(exam_id)
+        return exam.get("results") if exam else None
+
+    def store_student_results(self, exam_id: str, student_results: Dict[str, Dict]):
+        with self._lock:
+            exam = self._lookup(exam_id)
+            if exam is None:
+                return
+            merged = dict(exam.get("student_results") or {})
+            merged.update(student_results)
+            self._update(exam_id, {"student_results": merged})
+
+    def get_student_results(self, exam_id: str) -> Dict[str, Dict]:
+        exam = self.get_exam(exam_id)
+        return dict(exam.get("student_results") or {}) if exam else {}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._enforce_limits()
+            bytes_by_field: Dict[str, int] = {}
+            for sizes in self._sizes.values():
+                for field, size in sizes.items():
+                    bytes_by_field[field] = bytes_by_field.get(field, 0) + size
+            stats = {
+                "backend": "memory",
+                "entries": len(self._exams),
+                "pinned_entries": sum(1 for exam in self._exams.values() if self._is_pinned(exam)),
+                "estimated_bytes": self._total_bytes,
+                "bytes_by_field": bytes_by_field,
+                "limits": {
+                    "max_entries": self.max_entries or None,
+                    "max_bytes": self.max_bytes or None,
+                    "ttl_seconds": self.ttl_seconds or None
+                },
+                **self._counters
+            }
+            if self.spill_store is not None:
+                stats["spill"] = self.spill_store.stats()
+            return stats
+
+    def close(self):
+        if self.spill_store is not None:
+            self.spill_store.close()
+
+
+# Active backend (lazy loading)
+_store: Optional[ExamStore] = None
+
+# Blobs written by create_exam calls whose exam is not registered yet
+_pending_refs: Counter = Counter()
+_pending_lock = threading.Lock()
+
+# Background blob sweeper
+_sweeper_stop = threading.Event()
+_sweeper_thread: Optional[threading.Thread] = None
+
+
+def create_store(storage_type: str) -> ExamStore:
+    """Build the storage backend named by storage_type."""
+    storage_type = storage_type.lower()
+    if storage_type == "memory":
+        spill_store = None
+        if settings.STORAGE_SPILL_PATH:
+            from app.services.sqlite_storage import SQLiteExamStore
+            spill_store = SQLiteExamStore(settings.STORAGE_SPILL_PATH)
+        return MemoryExamStore(
+            max_entries=settings.STORAGE_MAX_EXAMS,
+            max_bytes=settings.STORAGE_MAX_MB * 1024 * 1024,
+            ttl_seconds=settings.STORAGE_TTL_SECONDS,
+            spill_store=spill_store
+        )
+    if storage_type == "sqlite":
+        from app.services.sqlite_storage import SQLiteExamStore
+        return SQLiteExamStore(settings.STORAGE_SQLITE_PATH)
+    raise ValueError(f"Unknown STORAGE_TYPE: {storage_type}. Use 'memory' or 'sqlite'")
+
+
+def get_store() -> ExamStore:
+    """Get or initialize the configured storage backend."""
+    global _store
+    if _store is None:
+        _store = create_store(settings.STORAGE_TYPE)
+        logger.info(f"Using {settings.STORAGE_TYPE} exam storage")
+    return _store
 
 
 def generate_exam_id() -> str:
@@ -14,43 +412,160 @@ def generate_exam_id() -> str:
     return str(uuid.uuid4())
 
 
-def store_exam(exam_id: str, file_bytes: bytes, file_type: str, extracted_text: str):
-    """Store exam data."""
-    _exams[exam_id] = {
-        "exam_id": exam_id,
-        "file_bytes": file_bytes,
-        "file_type": file_type,
-        "extracted_text": extracted_text,
-        "questions": None,
-        "results": None
-    }
+@contextmanager
+def _registering(file_ref: Optional[str]):
+    """Protect a blob from delete_exam while its exam is being registered."""
+    if not file_ref:
+        yield
+        return
+    with _pending_lock:
+        _pending_refs[file_ref] += 1
+    try:
+        yield
+    finally:
+        with _pending_lock:
+            _pending_refs[file_ref] -= 1
+            if _pending_refs[file_ref] <= 0:
+                del _pending_refs[file_ref]
+
+
+def create_exam(
+    exam_id: str,
+    file_data: Union[bytes, BinaryIO],
+    file_type: str,
+    filename: str,
+    status: Dict,
+    file_hash: Optional[str] = None
+):
+    """
+    Register an uploaded exam whose text has not been extracted yet.
+    
+    The file (bytes, or a binary file read from its current position) is
+    written to the blob store; identical files share one blob. The blob is
+    removed once no exam references it (see delete_exam and sweep_blobs).
+    """
+    with _registering(file_hash):
+        if isinstance(file_data, bytes):
+            file_ref = get_blob_store().put(file_data, digest=file_hash)
+        else:
+            file_ref = get_blob_store().put_file(file_data, digest=file_hash)
+        with _registering(file_ref):
+            get_store().create_exam(exam_id, file_ref, file_type, filename, status, file_hash=file_ref)
+
+
+def get_exam_file(exam_id: str) -> Optional[bytes]:
+    """Read an exam's uploaded file back from the blob store."""
+    exam = get_store().get_exam(exam_id)
+    if not exam or not exam.get("file_ref"):
+        return None
+    return get_blob_store().get(exam["file_ref"])
+
+
+def update_exam(exam_id: str, **fields: Any):
+    """Update fields of an existing exam."""
+    get_store().update_exam(exam_id, **fields)
+
+
+def delete_exam(exam_id: str):
+    """
+    Remove an exam and everything stored for it.
+    
+    Its blob is deleted too, unless another exam or an upload of the same
+    file still being registered in this process references it.
+    """
+    store = get_store()
+    exam = store.get_exam(exam_id)
+    store.delete_exam(exam_id)
+    file_ref = exam.get("file_ref") if exam else None
+    if not file_ref:
+        return
+    with _pending_lock:
+        if _pending_refs[file_ref] > 0 or file_ref in store.file_refs():
+            return
+        get_blob_store().delete(file_ref)
+
+
+def sweep_blobs() -> int:
+    """
+    Delete blobs left behind by evicted, expired or deleted exams.
+    
+    Blobs stored within BLOB_SWEEP_GRACE_SECONDS are kept, so uploads in
+    progress in other worker processes are not affected.
+    
+    Returns:
+        Number of files removed
+    """
+    return get_blob_store().sweep(get_store().file_refs(), settings.BLOB_SWEEP_GRACE_SECONDS)
+
+
+def _sweep_loop():
+    while not _sweeper_stop.wait(settings.BLOB_SWEEP_INTERVAL_SECONDS):
+        try:
+            sweep_blobs()
+        except Exception as e:
+            logger.error(f"Blob sweep failed: {str(e)}")
+
+
+def start_blob_sweeper():
+    """Sweep unreferenced blobs every BLOB_SWEEP_INTERVAL_SECONDS in a background thread (0 disables)."""
+    global _sweeper_thread
+    if settings.BLOB_SWEEP_INTERVAL_SECONDS <= 0 or _sweeper_thread is not None:
+        return
+    _sweeper_stop.clear()
+    _sweeper_thread = threading.Thread(target=_sweep_loop, name="blob-sweeper", daemon=True)
+    _sweeper_thread.start()
+
+
+def stop_blob_sweeper():
+    """Stop the background blob sweeper, if running."""
+    global _sweeper_thread
+    if _sweeper_thread is None:
+        return
+    _sweeper_stop.set()
+    _sweeper_thread.join()
+    _sweeper_thread = None
+
+
+def find_exam_by_hash(file_hash: str) -> Optional[str]:
+    """Get the ID of the most recent exam uploaded with this file content."""
+    return get_store().find_exam_by_hash(file_hash)
 
 
 def get_exam(exam_id: str) -> Optional[Dict]:
     """Get exam data by ID."""
-    return _exams.get(exam_id)
+    return get_store().get_exam(exam_id)
+
+
+def get_stats() -> Dict[str, Any]:
+    """Entry counts, estimated sizes and eviction counters of the active backend."""
+    return get_store().stats()
 
 
 def store_parsed_questions(exam_id: str, questions: List[QuestionAnswer]):
     """Store parsed questions for an exam."""
-    if exam_id in _exams:
-        _exams[exam_id]["questions"] = questions
+    get_store().store_parsed_questions(exam_id, questions)
 
 
 def get_parsed_questions(exam_id: str) -> Optional[List[QuestionAnswer]]:
     """Get parsed questions for an exam."""
-    exam = _exams.get(exam_id)
-    return exam.get("questions") if exam else None
+    return get_store().get_parsed_questions(exam_id)
 
 
 def store_results(exam_id: str, results: Dict):
     """Store grading results."""
-    if exam_id in _exams:
-        _exams[exam_id]["results"] = results
+    get_store().store_results(exam_id, results)
 
 
 def get_results(exam_id: str) -> Optional[Dict]:
     """Get grading results for an exam."""
-    exam = _exams.get(exam_id)
-    return exam.get("results") if exam else None
+    return get_store().get_results(exam_id)
+
+
+def store_student_results(exam_id: str, student_results: Dict[str, Dict]):
+    """Store grading results for several students of one exam, keyed by student ID."""
+    get_store().store_student_results(exam_id, student_results)
+
 
+def get_student_results(exam_id: str) -> Dict[str, Dict]:
+    """Get per-student grading results for an exam, keyed by student ID."""
+    return get_store().get_student_results(exam_id)
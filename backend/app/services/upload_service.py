@@ -0,0 +1,210 @@
+"""
+Upload validation: size limit, content sniffing and hashing in one streaming pass.
+"""
+import codecs
+import hashlib
+import logging
+import os
+from typing import BinaryIO, NamedTuple, Optional
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Bytes read per step while validating an upload
+CHUNK_SIZE = 1024 * 1024
+
+# Bytes inspected to recognize the file type
+SNIFF_BYTES = 8192
+
+# Allowance for multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# Leading bytes of each supported binary format
+_MAGIC_NUMBERS = [
+    (b"%PDF-", ".pdf"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"\xff\xd8\xff", ".jpg")
+]
+
+# Leading bytes of ZIP archives (regular and empty)
+_ZIP_MAGIC_NUMBERS = (b"PK\x03\x04", b"PK\x05\x06")
+
+# Extensions naming the same format as another
+_EXTENSION_ALIASES = {".jpeg": ".jpg"}
+
+# Control characters allowed in text files
+_TEXT_CONTROL_BYTES = set(b"\t\n\r\f\b")
+
+# Byte order marks of text encodings that contain NUL bytes (UTF-32 first: its LE mark starts like UTF-16's)
+_UNICODE_BOMS = [
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16")
+]
+
+
+class UploadRejectedError(ValueError):
+    """Raised when an upload is not a supported file."""
+
+
+class UploadTooLargeError(UploadRejectedError):
+    """Raised when an upload exceeds MAX_FILE_SIZE_MB."""
+
+
+class UploadInfo(NamedTuple):
+    """What validation learned about an upload."""
+    file_type: str
+    size: int
+    sha256: str
+
+
+def max_upload_bytes() -> int:
+    """Largest accepted upload, from MAX_FILE_SIZE_MB."""
+    return int(settings.MAX_FILE_SIZE_MB * 1024 * 1024)
+
+
+def _canonical(extension: str) -> str:
+    extension = extension.lower()
+    return _EXTENSION_ALIASES.get(extension, extension)
+
+
+def _allowed_types() -> set:
+    return {_canonical(extension) for extension in settings.ALLOWED_EXTENSIONS}
+
+
+def _unicode_encoding(data: bytes) -> Optional[str]:
+    """UTF-16/32 codec named by a leading byte order mark, if any."""
+    for bom, encoding in _UNICODE_BOMS:
+        if data.startswith(bom):
+            return encoding
+    return None
+
+
+def _looks_like_text(head: bytes) -> bool:
+    """
+    Whether leading bytes look like a text file: few control characters,
+    and no NULs unless a byte order mark declares UTF-16 or UTF-32.
+    """
+    if not head:
+        return False
+    encoding = _unicode_encoding(head)
+    if encoding is not None:
+        codes = [ord(char) for char in head.decode(encoding, "ignore")]
+    elif b"\x00" in head:
+        return False
+    else:
+        codes = list(head)
+    control = sum(1 for code in codes if code < 32 and code not in _TEXT_CONTROL_BYTES)
+    return control <= len(codes) // 100
+
+
+def decode_text(data: bytes) -> str:
+    """Decode an uploaded text file: UTF-16/32 by byte order mark, else UTF-8, else Latin-1."""
+    encoding = _unicode_encoding(data)
+    if encoding is not None:
+        return data.decode(encoding, "replace")
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return data.decode("latin-1")
+
+
+def sniff_file_type(head: bytes) -> Optional[str]:
+    """
+    Recognize a file from its leading bytes.
+
+    Returns:
+        ".pdf", ".png", ".jpg" or ".txt", or None if unrecognized
+    """
+    for magic, file_type in _MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return file_type
+    if _looks_like_text(head):
+        return ".txt"
+    return None
+
+
+def is_zip_archive(file_obj: BinaryIO) -> bool:
+    """Whether a file starts like a ZIP archive (the position is restored)."""
+    position = file_obj.tell()
+    head = file_obj.read(4)
+    file_obj.seek(position)
+    return head.startswith(_ZIP_MAGIC_NUMBERS)
+
+
+def _unsupported_type_error() -> UploadRejectedError:
+    allowed = ", ".join(sorted(extension.lstrip(".").upper() for extension in _allowed_types()))
+    return UploadRejectedError(f"Unsupported file type. Allowed: {allowed}")
+
+
+def check_filename(filename: Optional[str]):
+    """
+    Reject a file whose name has an extension outside ALLOWED_EXTENSIONS.
+
+    Names without an extension pass; the content decides their type.
+
+    Raises:
+        UploadRejectedError: If the extension is not allowed
+    """
+    extension = os.path.splitext(filename or "")[1]
+    if extension and _canonical(extension) not in _allowed_types():
+        raise _unsupported_type_error()
+
+
+def max_upload_request_bytes(bulk: bool = False) -> int:
+    """Largest request body accepted for a single upload, or for a bulk upload (BULK_UPLOAD_MAX_MB)."""
+    if bulk:
+        return int(settings.BULK_UPLOAD_MAX_MB * 1024 * 1024) + MULTIPART_OVERHEAD_BYTES
+    return max_upload_bytes() + MULTIPART_OVERHEAD_BYTES
+
+
+def declared_size_too_large(content_length: Optional[str], bulk: bool = False) -> bool:
+    """Whether a request's Content-Length already rules out a valid single (or bulk) upload."""
+    try:
+        return int(content_length) > max_upload_request_bytes(bulk)
+    except (TypeError, ValueError):
+        return False
+
+
+def inspect_upload(file_obj: BinaryIO) -> UploadInfo:
+    """
+    Validate an uploaded file in chunks and hash it on the way.
+
+    The type is taken from the content, not the file name, and checked
+    against ALLOWED_EXTENSIONS after the first chunk; reading stops as soon
+    as MAX_FILE_SIZE_MB is exceeded. The file is rewound afterwards.
+
+    Args:
+        file_obj: Seekable binary file (e.g. the spooled file behind an UploadFile)
+
+    Returns:
+        UploadInfo with the detected type, size and SHA-256
+
+    Raises:
+        UploadTooLargeError: If the file exceeds the size limit
+        UploadRejectedError: If the content is not an allowed file type
+    """
+    limit = max_upload_bytes()
+    digest = hashlib.sha256()
+    size = 0
+    file_type = None
+
+    file_obj.seek(0)
+    while True:
+        chunk = file_obj.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        if file_type is None:
+            file_type = sniff_file_type(chunk[:SNIFF_BYTES])
+            if file_type is None or file_type not in _allowed_types():
+                raise _unsupported_type_error()
+        size += len(chunk)
+        if size > limit:
+            raise UploadTooLargeError(f"File too large. Maximum size: {settings.MAX_FILE_SIZE_MB}MB")
+        digest.update(chunk)
+    file_obj.seek(0)
+
+    if file_type is None:
+        raise UploadRejectedError("File is empty")
+    return UploadInfo(file_type=file_type, size=size, sha256=digest.hexdigest())
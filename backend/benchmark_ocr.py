@@ -0,0 +1,212 @@
+"""
+OCR pipeline benchmark.
+
+Measures the per-page cost of handing rendered pages to OCR, and
+(with --ocr) page-by-page versus batched EasyOCR throughput. With
+--profiles, compares OCR time and character accuracy per preprocessing
+profile (ground truth comes from the synthetic pages or --truth).
+
+Usage:
+    python benchmark_ocr.py                  # synthetic A4 pages
+    python benchmark_ocr.py --pdf exam.pdf   # real pages (needs Poppler)
+    python benchmark_ocr.py --ocr            # include EasyOCR inference
+    python benchmark_ocr.py --ocr --batch-sizes 1,4,8,16
+    python benchmark_ocr.py --profiles none,clean,scan,binary --skew 2
+    python benchmark_ocr.py --pdf exam.pdf --truth exam.txt --profiles none,scan
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from app.services import ocr_service, preprocessing
+
+
+def synthetic_page_lines(page_number):
+    """The text lines drawn on a synthetic page."""
+    return [
+        f"{question}. What is {question} + {question}? Answer: {2 * question}"
+        for question in range(page_number * 100, page_number * 100 + 20)
+    ]
+
+
+def make_synthetic_pages(count, dpi=150, skew=0.0):
+    """Create A4-sized pages with a few lines of exam-like text, optionally rotated like a scan."""
+    width, height = int(8.27 * dpi), int(11.69 * dpi)
+    font = ImageFont.load_default(size=max(12, dpi // 6))
+    pages = []
+    for page_number in range(1, count + 1):
+        page = Image.new("RGB", (width, height), "white")
+        draw = ImageDraw.Draw(page)
+        for line, text in enumerate(synthetic_page_lines(page_number)):
+            draw.text((dpi // 2, dpi // 2 + line * dpi // 2), text, fill="black", font=font)
+        if skew:
+            page = page.rotate(skew, resample=Image.Resampling.BILINEAR, fillcolor="white")
+        pages.append(page)
+    return pages
+
+
+def load_pdf_pages(path, count):
+    """Render the first pages of a PDF the way the OCR service does."""
+    from pdf2image import convert_from_path
+    return convert_from_path(path, dpi=150, first_page=1, last_page=count)
+
+
+def png_round_trip(page):
+    """Previous handoff: RGB -> resize -> PNG encode -> decode -> array copy."""
+    image = page.convert("RGB") if page.mode != "RGB" else page
+    if image.width > 1200:
+        image = image.resize((1200, int(image.height * 1200 / image.width)), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", optimize=True, quality=75)
+    return np.array(Image.open(io.BytesIO(buffer.getvalue())))
+
+
+def array_handoff(page):
+    """Current handoff: grayscale -> resize -> array view."""
+    return ocr_service._prepare_page_for_ocr(page)
+
+
+def measure(name, handoff, pages, run_ocr):
+    """Time one handoff over all pages and record peak traced allocations."""
+    reader = ocr_service.get_ocr_reader() if run_ocr else None
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    for page in pages:
+        page_array = handoff(page)
+        if reader is not None:
+            reader.readtext(page_array)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    per_page_ms = elapsed * 1000 / len(pages)
+    print(f"{name:<16} {per_page_ms:9.1f} ms/page   peak alloc {peak / (1024 * 1024):7.1f} MB   {len(pages) / elapsed:6.2f} pages/s")
+    return per_page_ms, peak
+
+
+def measure_batched(pages, pages_per_batch, batch_size):
+    """OCR prepared pages in groups through the batched EasyOCR path."""
+    ocr_service.settings.OCR_BATCH_SIZE = batch_size
+    page_arrays = [array_handoff(page) for page in pages]
+    ocr_service.get_ocr_reader()
+
+    start = time.perf_counter()
+    for i in range(0, len(page_arrays), pages_per_batch):
+        ocr_service.extract_text_from_arrays(page_arrays[i:i + pages_per_batch])
+    elapsed = time.perf_counter() - start
+
+    name = f"{pages_per_batch} pg x bs {batch_size}"
+    print(f"{name:<16} {elapsed * 1000 / len(pages):9.1f} ms/page   {len(pages) / elapsed:6.2f} pages/s")
+    return len(pages) / elapsed
+
+
+def edit_distance(a, b):
+    """Levenshtein distance between two strings (one row of the table at a time)."""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = np.arange(len(b) + 1)
+    for i, char in enumerate(a, 1):
+        substitutions = previous[:-1] + (np.frombuffer(b.encode("utf-32-le"), dtype=np.uint32) != ord(char))
+        current = np.empty_like(previous)
+        current[0] = i
+        current[1:] = np.minimum(previous[1:] + 1, substitutions)
+        # Insertions chain along the row: current[j] = min(current[j], current[j-1] + 1)
+        current = np.minimum.accumulate(current - np.arange(len(b) + 1)) + np.arange(len(b) + 1)
+        previous = current
+    return int(previous[-1])
+
+
+def character_accuracy(text, truth):
+    """1 - edit distance / truth length, comparing whitespace-normalized text."""
+    text, truth = " ".join(text.split()), " ".join(truth.split())
+    if not truth:
+        return 1.0 if not text else 0.0
+    return max(0.0, 1 - edit_distance(text, truth) / len(truth))
+
+
+def measure_profile(profile, pages, truths):
+    """OCR every page with one preprocessing profile; report time and accuracy."""
+    ocr_service.settings.OCR_PREPROCESS_PROFILE = profile
+    ocr_service.get_ocr_reader()
+
+    prepare_seconds = ocr_seconds = 0.0
+    accuracies = []
+    for page, truth in zip(pages, truths):
+        start = time.perf_counter()
+        page_array = array_handoff(page)
+        prepared = time.perf_counter()
+        text = ocr_service.extract_text_from_array(page_array)
+        prepare_seconds += prepared - start
+        ocr_seconds += time.perf_counter() - prepared
+        accuracies.append(character_accuracy(text, truth))
+
+    accuracy = sum(accuracies) / len(accuracies)
+    print(f"{profile:<24} prep {prepare_seconds * 1000 / len(pages):7.1f} ms/page   "
+          f"OCR {ocr_seconds * 1000 / len(pages):8.1f} ms/page   accuracy {accuracy * 100:5.1f}%")
+    return accuracy
+
+
+def load_truths(path, page_count):
+    """Ground truth per page from a text file, pages separated by form feeds."""
+    with open(path, encoding="utf-8") as handle:
+        truths = handle.read().split("\f")
+    if len(truths) < page_count:
+        raise SystemExit(f"{path} has {len(truths)} page(s) of ground truth, need {page_count}")
+    return truths[:page_count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", help="PDF file to render instead of synthetic pages")
+    parser.add_argument("--pages", type=int, default=5, help="number of pages")
+    parser.add_argument("--ocr", action="store_true", help="also run EasyOCR on each page")
+    parser.add_argument("--batch-sizes", default="1,4,8", help="recognizer batch sizes to compare with --ocr")
+    parser.add_argument("--pages-per-batch", type=int, default=4, help="pages per batched OCR call")
+    parser.add_argument("--profiles", help="comma-separated preprocessing profiles to compare (runs OCR)")
+    parser.add_argument("--truth", help="ground-truth text for --pdf, pages separated by form feeds")
+    parser.add_argument("--skew", type=float, default=0.0, help="rotate synthetic pages by this many degrees")
+    args = parser.parse_args()
+
+    pages = load_pdf_pages(args.pdf, args.pages) if args.pdf else make_synthetic_pages(args.pages, skew=args.skew)
+    print(f"=== Page handoff ({len(pages)} page(s), {pages[0].size[0]}x{pages[0].size[1]}{', with OCR' if args.ocr else ''}) ===")
+
+    old_ms, old_peak = measure("png round trip", png_round_trip, pages, args.ocr)
+    new_ms, new_peak = measure("array handoff", array_handoff, pages, args.ocr)
+
+    print(f"\nSaved {old_ms - new_ms:.1f} ms/page ({(1 - new_ms / old_ms) * 100:.0f}%), "
+          f"peak allocations {(1 - new_peak / old_peak) * 100:.0f}% lower")
+
+    if args.ocr:
+        print(f"\n=== Batched OCR ({len(pages)} page(s)) ===")
+        baseline = measure_batched(pages, 1, 1)
+        best = max(
+            (measure_batched(pages, args.pages_per_batch, int(batch_size)), batch_size)
+            for batch_size in args.batch_sizes.split(",")
+        )
+        print(f"\nBest: batch size {best[1]} at {best[0]:.2f} pages/s ({best[0] / baseline:.1f}x page-by-page)")
+
+    if args.profiles:
+        if args.pdf and not args.truth:
+            raise SystemExit("--profiles with --pdf needs --truth")
+        truths = (
+            load_truths(args.truth, len(pages)) if args.pdf
+            else ["\n".join(synthetic_page_lines(page_number)) for page_number in range(1, len(pages) + 1)]
+        )
+        print(f"\n=== Preprocessing profiles ({len(pages)} page(s)) ===")
+        profiles = [profile.strip() for profile in args.profiles.split(",")]
+        for profile in profiles:
+            preprocessing.resolve_profile(profile)
+        results = [(measure_profile(profile, pages, truths), profile) for profile in profiles]
+        best = max(results)
+        print(f"\nMost accurate: {best[1]} at {best[0] * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
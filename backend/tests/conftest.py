@@ -4,6 +4,8 @@ Pytest configuration and fixtures.
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
+from app.services import blob_store, grading_service, ocr_executor, ocr_service, parsing_service, rate_limiter
+from app.services.cache import TieredCache
 
 
 @pytest.fixture
@@ -11,3 +13,71 @@ def client():
     """Test client fixture."""
     return TestClient(app)
 
+
+@pytest.fixture(autouse=True)
+def isolated_grade_cache(monkeypatch):
+    """Give every test an empty, memory-only grade cache."""
+    cache = TieredCache("grade-test")
+    monkeypatch.setattr(grading_service, "_grade_cache", cache)
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def isolated_ocr_cache(monkeypatch):
+    """Give every test an empty, memory-only OCR cache."""
+    cache = TieredCache("ocr-test")
+    monkeypatch.setattr(ocr_executor, "_ocr_cache", cache)
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def isolated_parse_cache(monkeypatch):
+    """Give every test an empty, memory-only parse cache."""
+    cache = TieredCache("parse-test")
+    monkeypatch.setattr(parsing_service, "_parse_cache", cache)
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def isolated_blob_store(monkeypatch, tmp_path):
+    """Write uploads to a per-test blob store."""
+    store = blob_store.BlobStore(str(tmp_path / "blobs"))
+    monkeypatch.setattr(blob_store, "_blob_store", store)
+    return store
+
+
+@pytest.fixture(autouse=True)
+def isolated_gemini_limiter(monkeypatch):
+    """Give every test a fresh Gemini limiter without quotas or retry delays."""
+    limiter = rate_limiter.RateLimiter(max_concurrency=16, retry_base_seconds=0, retry_max_seconds=0)
+    monkeypatch.setattr(rate_limiter, "_gemini_limiter", limiter)
+    return limiter
+
+
+class FakeRefineReader:
+    """First pass finds one confident and one weak line; the second pass reads regions clearly."""
+    
+    def __init__(self):
+        self.recognized = []
+    
+    def readtext(self, image, **kwargs):
+        return [
+            ([[10, 10], [90, 10], [90, 20], [10, 20]], "1. What is 2+2?", 0.95),
+            ([[10, 30], [60, 30], [60, 40], [10, 40]], "Answcr: 4", 0.3)
+        ]
+    
+    def recognize(self, image, horizontal_list, free_list, **kwargs):
+        self.recognized.append((image.shape, horizontal_list))
+        # EasyOCR sorts regions by position and reports them with clipped corners
+        return [
+            ([[x_min, y_min], [x_max, y_min], [x_max, y_max], [x_min, y_max]], "Answer: 4", 0.9)
+            for x_min, x_max, y_min, y_max in sorted(horizontal_list, key=lambda box: box[2])
+        ]
+
+
+@pytest.fixture
+def refine_reader(monkeypatch):
+    """EasyOCR stand-in for two-pass OCR tests, installed as the OCR reader."""
+    reader = FakeRefineReader()
+    monkeypatch.setattr(ocr_service, "get_ocr_reader", lambda: reader)
+    return reader
@@ -0,0 +1,106 @@
+"""
+Unit tests for the blob store.
+"""
+import hashlib
+import pytest
+from app.services import blob_store, storage
+
+
+def test_put_is_content_addressed(tmp_path):
+    """Test identical content is stored once and read back intact."""
+    store = blob_store.BlobStore(str(tmp_path))
+    data = b"%PDF-1.4 exam" * 1000
+    
+    ref = store.put(data)
+    assert ref == hashlib.sha256(data).hexdigest()
+    assert store.put(data) == ref
+    assert store.get(ref) == data
+    assert store.stats()["blobs"] == 1
+    
+    store.delete(ref)
+    assert store.get(ref) is None
+
+
+def test_put_file_streams_and_dedupes(tmp_path):
+    """Test file objects are copied in chunks and share blobs with put()."""
+    import io
+    
+    store = blob_store.BlobStore(str(tmp_path))
+    data = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 10000
+    
+    ref = store.put_file(io.BytesIO(data))
+    assert ref == hashlib.sha256(data).hexdigest()
+    assert store.get(ref) == data
+    assert store.put(data) == ref
+    assert store.put_file(io.BytesIO(data), digest=ref) == ref
+    assert store.stats()["blobs"] == 1
+
+
+def test_empty_blob(tmp_path):
+    """Test zero-length files round-trip."""
+    store = blob_store.BlobStore(str(tmp_path))
+    assert store.get(store.put(b"")) == b""
+
+
+def test_zstd_compression(tmp_path):
+    """Test compressed blobs are smaller on disk and read back intact."""
+    pytest.importorskip("zstandard")
+    store = blob_store.BlobStore(str(tmp_path), compression="zstd")
+    data = b"1. What is 2+2?\n" * 10000
+    
+    ref = store.put(data)
+    assert store.get(ref) == data
+    assert store.stats()["disk_bytes"] < len(data)
+
+
+def test_invalid_reference_is_rejected(tmp_path):
+    """Test references cannot escape the store directory."""
+    store = blob_store.BlobStore(str(tmp_path))
+    with pytest.raises(ValueError):
+        store.get("../../etc/passwd")
+
+
+def test_exam_record_holds_only_a_reference(isolated_blob_store):
+    """Test uploads go to the blob store and the exam keeps a reference."""
+    exam_id = storage.generate_exam_id()
+    storage.create_exam(exam_id, b"scanned exam", ".png", "exam.png", {"state": "queued"})
+    
+    exam = storage.get_exam(exam_id)
+    assert "file_bytes" not in exam
+    assert isolated_blob_store.exists(exam["file_ref"])
+    assert storage.get_exam_file(exam_id) == b"scanned exam"
+    storage.delete_exam(exam_id)
+
+
+def test_sweep_removes_unreferenced_blobs(tmp_path):
+    """Test sweeps keep referenced and recently stored blobs."""
+    import os
+    
+    store = blob_store.BlobStore(str(tmp_path))
+    live = store.put(b"live exam")
+    dead = store.put(b"deleted exam")
+    fresh = store.put(b"upload in progress")
+    for ref in (live, dead):
+        os.utime(store._existing_path(ref), (0, 0))
+    
+    assert store.sweep({live}, min_age_seconds=60) == 1
+    assert store.exists(live)
+    assert not store.exists(dead)
+    assert store.exists(fresh)
+    
+    os.utime(store._existing_path(live), (0, 0))
+    assert store.put(b"live exam") == live
+    assert store.sweep(set(), min_age_seconds=60) == 0
+
+
+def test_deleting_an_exam_releases_its_blob(isolated_blob_store):
+    """Test a blob is deleted with the last exam referencing it."""
+    first, second = storage.generate_exam_id(), storage.generate_exam_id()
+    storage.create_exam(first, b"shared exam", ".png", "a.png", {"state": "queued"})
+    storage.create_exam(second, b"shared exam", ".png", "b.png", {"state": "queued"})
+    file_ref = storage.get_exam(first)["file_ref"]
+    
+    storage.delete_exam(first)
+    assert isolated_blob_store.exists(file_ref)
+    storage.delete_exam(second)
+    assert not isolated_blob_store.exists(file_ref)
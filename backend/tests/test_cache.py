@@ -0,0 +1,103 @@
+"""
+Unit tests for the tiered cache.
+"""
+import time
+from app.services.cache import TieredCache, make_cache_key
+
+
+def test_make_cache_key_is_stable():
+    """Test keys depend only on the parts."""
+    assert make_cache_key("q", "a", 1) == make_cache_key("q", "a", 1)
+    assert make_cache_key("q", "a") != make_cache_key("q", "b")
+
+
+def test_memory_lru_eviction():
+    """Test the memory tier evicts the least recently used entry."""
+    cache = TieredCache("test", memory_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    """Test values persist across cache instances."""
+    db_path = str(tmp_path / "cache.sqlite3")
+    cache = TieredCache("test", db_path=db_path)
+    cache.set("key", {"score": 100.0})
+    cache.close()
+    
+    reopened = TieredCache("test", db_path=db_path)
+    assert reopened.get("key") == {"score": 100.0}
+    stats = reopened.stats()
+    assert stats["disk_hits"] == 1
+    assert stats["hits"] == 1
+
+
+def test_ttl_expiry(tmp_path):
+    """Test expired entries are treated as misses."""
+    cache = TieredCache("test", db_path=str(tmp_path / "cache.sqlite3"), ttl_seconds=0.01)
+    cache.set("key", "value")
+    time.sleep(0.02)
+    
+    assert cache.get("key") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_disk_size_eviction(tmp_path):
+    """Test the disk tier is trimmed to max_entries."""
+    cache = TieredCache("test", db_path=str(tmp_path / "cache.sqlite3"), memory_entries=0, max_entries=3)
+    for i in range(5):
+        cache.set(f"key{i}", i)
+    cache.prune()
+    
+    assert cache.stats()["disk_entries"] == 3
+    assert cache.get("key0") is None
+    assert cache.get("key4") == 4
+
+
+def test_disk_byte_budget_eviction(tmp_path):
+    """Test the disk tier evicts the oldest-accessed entries beyond max_bytes."""
+    cache = TieredCache("test", db_path=str(tmp_path / "cache.sqlite3"), memory_entries=0, max_bytes=250)
+    for i in range(4):
+        cache.set(f"key{i}", "x" * 98)  # 100 bytes as JSON
+    cache.prune()
+    
+    stats = cache.stats()
+    assert stats["disk_entries"] == 2
+    assert stats["disk_bytes"] == 200
+    assert cache.get("key1") is None
+    assert cache.get("key3") == "x" * 98
+
+
+async def test_async_access_keeps_disk_io_off_the_loop(tmp_path, monkeypatch):
+    """Test async lookups serve memory hits inline and batch disk work onto a worker thread."""
+    import threading
+    
+    db_path = str(tmp_path / "cache.sqlite3")
+    writer = TieredCache("test", db_path=db_path)
+    await writer.set_many_async({"a": 1, "b": 2})
+    writer.close()
+    
+    cache = TieredCache("test", db_path=db_path)
+    disk_threads = []
+    get_from_disk = cache._get_from_disk
+    
+    def recording_get_from_disk(keys, now):
+        disk_threads.append((threading.current_thread(), list(keys)))
+        return get_from_disk(keys, now)
+    
+    monkeypatch.setattr(cache, "_get_from_disk", recording_get_from_disk)
+    
+    assert await cache.get_many_async(["a", "b", "missing"]) == {"a": 1, "b": 2}
+    assert await cache.get_async("a") == 1
+    
+    assert len(disk_threads) == 1
+    assert disk_threads[0][0] is not threading.main_thread()
+    assert disk_threads[0][1] == ["a", "b", "missing"]
+    stats = cache.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (2, 1, 1)
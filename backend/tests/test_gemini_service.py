@@ -0,0 +1,160 @@
+"""
+Unit tests for Gemini service helpers (no network calls).
+"""
+import asyncio
+import json
+import time
+import pytest
+from app.config import settings
+from app.services import gemini_service
+
+
+class FakeResponse:
+    """Minimal stand-in for a Gemini response."""
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """
+    GenerativeModel replacement returning a canned response.
+    
+    Accepts only the keyword arguments google-generativeai 0.3.2 understands;
+    the real library forwards anything else into the request proto and fails.
+    """
+    calls = []
+    instances = 0
+    delay = 0.0
+    response_text = "[]"
+    
+    def __init__(self, model_name):
+        self.model_name = model_name
+        FakeModel.instances += 1
+    
+    def generate_content(self, contents, *, generation_config=None, safety_settings=None, stream=False):
+        FakeModel.calls.append(contents)
+        time.sleep(FakeModel.delay)
+        return FakeResponse(FakeModel.response_text)
+    
+    async def generate_content_async(self, contents, *, generation_config=None, safety_settings=None, stream=False):
+        FakeModel.calls.append(contents)
+        await asyncio.sleep(FakeModel.delay)
+        return FakeResponse(FakeModel.response_text)
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    """Patch Gemini model construction and API key."""
+    FakeModel.calls = []
+    FakeModel.instances = 0
+    FakeModel.delay = 0.0
+    monkeypatch.setattr(settings, "GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(gemini_service.genai, "GenerativeModel", FakeModel)
+    monkeypatch.setattr(gemini_service, "_models", {})
+    return FakeModel
+
+
+def test_chunk_grading_items_respects_budget():
+    """Test items are split into ordered chunks within the token budget."""
+    items = [("q" * 400, "a", "b")] * 5
+    batches = gemini_service.chunk_grading_items(items, token_budget=700, max_items=10)
+    assert [i for batch in batches for i in batch] == [0, 1, 2, 3, 4]
+    assert all(len(batch) <= 2 for batch in batches)
+    
+    batches = gemini_service.chunk_grading_items(items, token_budget=100000, max_items=2)
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+
+
+def test_grade_answers_batch_single_call(fake_model):
+    """Test a batch is graded with one model call."""
+    fake_model.response_text = "```json\n" + json.dumps([
+        {"item": 1, "score": 0, "is_correct": False, "explanation": "wrong"},
+        {"item": 0, "score": 100, "is_correct": True, "explanation": "right"},
+    ]) + "\n```"
+    
+    results = gemini_service.grade_answers_batch([("Q1", "4", "4"), ("Q2", "Paris", "Rome")])
+    
+    assert len(fake_model.calls) == 1
+    assert [r["score"] for r in results] == [100.0, 0.0]
+    assert results[0]["is_correct"] is True
+
+
+def test_grade_answers_batch_falls_back_for_missing_items(fake_model, monkeypatch):
+    """Test missing batch items are graded individually."""
+    fake_model.response_text = json.dumps([
+        {"item": 0, "score": 100, "is_correct": True, "explanation": "right"},
+        {"item": 1, "explanation": "no score"},
+    ])
+    single_calls = []
+    
+    def fake_grade_answer(question, correct_answer, student_answer):
+        single_calls.append(question)
+        return {"score": 50.0, "is_correct": False, "explanation": "single"}
+    
+    monkeypatch.setattr(gemini_service, "grade_answer", fake_grade_answer)
+    
+    results = gemini_service.grade_answers_batch([("Q1", "4", "4"), ("Q2", "Paris", "Rome")])
+    
+    assert single_calls == ["Q2"]
+    assert [r["explanation"] for r in results] == ["right", "single"]
+
+
+async def test_async_batch_fallbacks_fail_per_item(fake_model, monkeypatch):
+    """Test a failed fallback only fails its own item and each fallback takes its own slot."""
+    fake_model.response_text = "not json"
+    semaphore = asyncio.Semaphore(2)
+    running = []
+    concurrency = []
+    
+    async def fake_grade_answer_async(question, correct_answer, student_answer):
+        running.append(question)
+        concurrency.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(question)
+        if question == "Q2":
+            raise ValueError("bad response")
+        return {"score": 100.0, "is_correct": True, "explanation": question}
+    
+    monkeypatch.setattr(gemini_service, "grade_answer_async", fake_grade_answer_async)
+    
+    results = await gemini_service.grade_answers_batch_async([("Q1", "4", "4"), ("Q2", "4", "5"), ("Q3", "4", "4")], semaphore)
+    
+    assert results[0]["explanation"] == "Q1"
+    assert isinstance(results[1], ValueError)
+    assert results[2]["explanation"] == "Q3"
+    assert max(concurrency) == 2
+    assert not semaphore.locked()
+
+
+def test_model_is_reused(fake_model):
+    """Test one model object serves every call."""
+    fake_model.response_text = json.dumps({"score": 100, "is_correct": True, "explanation": "right"})
+    
+    for _ in range(3):
+        assert gemini_service.grade_answer("Q1", "4", "4")["score"] == 100.0
+    
+    assert fake_model.instances == 1
+
+
+async def test_calls_time_out(fake_model, monkeypatch, isolated_gemini_limiter):
+    """Test slow calls are abandoned after GEMINI_TIMEOUT_SECONDS on both paths."""
+    monkeypatch.setattr(settings, "GEMINI_TIMEOUT_SECONDS", 0.05)
+    monkeypatch.setattr(isolated_gemini_limiter, "max_retries", 0)
+    fake_model.delay = 0.5
+    
+    with pytest.raises(TimeoutError):
+        gemini_service.generate("prompt")
+    with pytest.raises(TimeoutError):
+        await gemini_service.generate_async("prompt")
+
+
+async def test_async_variants(fake_model):
+    """Test async grading and parsing use the shared async model."""
+    fake_model.response_text = json.dumps({"score": 40, "is_correct": False, "explanation": "partial"})
+    result = await gemini_service.grade_answer_async("Q1", "4", "5")
+    assert result == {"score": 40.0, "is_correct": False, "explanation": "partial"}
+    
+    fake_model.response_text = json.dumps([{"question": "What is 2+2?", "correct_answer": "4"}])
+    questions = await gemini_service.parse_exam_text_async("1. What is 2+2? Answer: 4 and more text")
+    assert [question.correct_answer for question in questions] == ["4"]
+    assert fake_model.instances == 1  # one model for this event loop
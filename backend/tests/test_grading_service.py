@@ -83,3 +83,191 @@ def test_count_correct_answers():
     correct_count = count_correct_answers(question_grades)
     assert correct_count == 2
 
+
+
+async def test_grade_student_answers_preserves_order(monkeypatch):
+    """Test concurrent grading returns grades in submission order."""
+    import asyncio
+    from app.models import QuestionAnswer, StudentAnswer
+    from app.services import gemini_service, grading_service
+    
+    monkeypatch.setattr(grading_service.settings, "GRADING_FAST_PATH_ENABLED", False)
+    
+    async def fake_grade_answer(question, correct_answer, student_answer):
+        # Earlier questions finish last
+        await asyncio.sleep(0.05 if question == "Q0" else 0.0)
+        score = 100.0 if student_answer == correct_answer else 0.0
+        return {"score": score, "is_correct": score == 100.0, "explanation": "ok"}
+    
+    monkeypatch.setattr(gemini_service, "grade_answer_async", fake_grade_answer)
+    
+    questions = [QuestionAnswer(question=f"Q{i}", correct_answer=str(i)) for i in range(3)]
+    answers = [
+        StudentAnswer(question_index=0, answer="0"),
+        StudentAnswer(question_index=2, answer="x"),
+        StudentAnswer(question_index=1, answer="1")
+    ]
+    
+    grades = await grading_service.grade_student_answers(questions, answers)
+    assert [grade.question_index for grade in grades] == [0, 2, 1]
+    assert [grade.score for grade in grades] == [100.0, 0.0, 100.0]
+
+
+async def test_grade_student_answers_reports_failed_questions(monkeypatch):
+    """Test grading failures name every failed question."""
+    from app.models import QuestionAnswer, StudentAnswer
+    from app.services import gemini_service, grading_service
+    
+    monkeypatch.setattr(grading_service.settings, "GRADING_FAST_PATH_ENABLED", False)
+    
+    async def fake_grade_answer(question, correct_answer, student_answer):
+        if question == "Q1":
+            raise ValueError("Failed to grade answer: quota exceeded")
+        return {"score": 100.0, "is_correct": True, "explanation": "ok"}
+    
+    monkeypatch.setattr(gemini_service, "grade_answer_async", fake_grade_answer)
+    
+    questions = [QuestionAnswer(question=f"Q{i}", correct_answer="A") for i in range(2)]
+    answers = [StudentAnswer(question_index=i, answer="A") for i in range(2)]
+    
+    with pytest.raises(ValueError, match="question 1"):
+        await grading_service.grade_student_answers(questions, answers)
+
+
+async def test_grade_student_answers_uses_cache(monkeypatch):
+    """Test identical answers are only sent to Gemini once."""
+    from app.models import QuestionAnswer, StudentAnswer
+    from app.services import gemini_service, grading_service
+    
+    monkeypatch.setattr(grading_service.settings, "GRADING_FAST_PATH_ENABLED", False)
+    calls = []
+    
+    async def fake_grade_answer(question, correct_answer, student_answer):
+        calls.append(student_answer)
+        return {"score": 100.0, "is_correct": True, "explanation": "ok"}
+    
+    monkeypatch.setattr(gemini_service, "grade_answer_async", fake_grade_answer)
+    
+    questions = [QuestionAnswer(question="Capital of France?", correct_answer="Paris")]
+    await grading_service.grade_student_answers(questions, [StudentAnswer(question_index=0, answer="Paris")])
+    grades = await grading_service.grade_student_answers(questions, [StudentAnswer(question_index=0, answer="  Paris ")])
+    
+    assert calls == ["Paris"]
+    assert grades[0].student_answer == "  Paris "
+    assert grades[0].score == 100.0
+
+
+@pytest.mark.parametrize("correct_answer,student_answer,expected_score", [
+    ("Paris", "  paris. ", 100.0),
+    ("שָׁלוֹם", "שלום", 100.0),
+    ("B", "(b)", 100.0),
+    ("B", "c", 0.0),
+    ("ב", "ב.", 100.0),
+    ("4", "4.0", 100.0),
+    ("3.1416", "3,1415", 100.0),
+    ("1,000", "1000", 100.0),
+    ("1.5 m", "150 cm", 100.0),
+    ("12", "13", 0.0),
+    ("Paris", "", 0.0),
+])
+def test_grade_locally_decides(correct_answer, student_answer, expected_score):
+    """Test the rule engine resolves trivially decidable answers."""
+    from app.models import QuestionAnswer
+    from app.services.grading_service import grade_locally
+    
+    result = grade_locally(QuestionAnswer(question="Q", correct_answer=correct_answer), student_answer)
+    assert result is not None
+    assert result["score"] == expected_score
+    assert result["is_correct"] == (expected_score == 100.0)
+
+
+@pytest.mark.parametrize("correct_answer,student_answer", [
+    ("Paris", "The capital is Paris"),
+    ("1.5 m", "1.5"),
+    ("5 kg", "5 m"),
+    ("B", "Photosynthesis"),
+])
+def test_grade_locally_escalates(correct_answer, student_answer):
+    """Test undecidable answers are left for the LLM."""
+    from app.models import QuestionAnswer
+    from app.services.grading_service import grade_locally
+    
+    assert grade_locally(QuestionAnswer(question="Q", correct_answer=correct_answer), student_answer) is None
+
+
+async def test_grade_student_answers_fast_path_skips_gemini(monkeypatch):
+    """Test locally resolved answers never reach Gemini."""
+    from app.models import QuestionAnswer, StudentAnswer
+    from app.services import gemini_service, grading_service
+    
+    calls = []
+    
+    async def fake_grade_answer(question, correct_answer, student_answer):
+        calls.append(question)
+        return {"score": 70.0, "is_correct": False, "explanation": "partial"}
+    
+    monkeypatch.setattr(gemini_service, "grade_answer_async", fake_grade_answer)
+    
+    questions = [
+        QuestionAnswer(question="2+2?", correct_answer="4"),
+        QuestionAnswer(question="Explain gravity", correct_answer="Mass attracts mass")
+    ]
+    answers = [StudentAnswer(question_index=0, answer="4"), StudentAnswer(question_index=1, answer="Things fall")]
+    
+    grades = await grading_service.grade_student_answers(questions, answers)
+    
+    assert calls == ["Explain gravity"]
+    assert [grade.grading_method for grade in grades] == ["rule", "llm"]
+    assert grading_service.local_resolution_rate(grades) == 0.5
+
+
+async def test_iter_student_grades_yields_in_completion_order(monkeypatch):
+    """Test local results come first and LLM results stream as they finish."""
+    import asyncio
+    from app.models import QuestionAnswer, StudentAnswer
+    from app.services import gemini_service, grading_service
+    
+    async def fake_grade_answer(question, correct_answer, student_answer):
+        await asyncio.sleep(0.05 if question == "Q0" else 0.0)
+        return {"score": 50.0, "is_correct": False, "explanation": "partial"}
+    
+    monkeypatch.setattr(gemini_service, "grade_answer_async", fake_grade_answer)
+    
+    questions = [QuestionAnswer(question=f"Q{i}", correct_answer=f"answer {i}") for i in range(3)]
+    answers = [
+        StudentAnswer(question_index=0, answer="something else"),
+        StudentAnswer(question_index=1, answer="another thing"),
+        StudentAnswer(question_index=2, answer="answer 2")
+    ]
+    
+    positions = [i async for i, grade in grading_service.iter_student_grades(questions, answers)]
+    assert positions == [2, 1, 0]
+
+
+async def test_grade_class_grades_identical_answers_once(monkeypatch):
+    """Test a class shares one grading call per distinct answer and reports failures per student."""
+    from app.models import QuestionAnswer, StudentAnswer
+    from app.services import gemini_service, grading_service
+    
+    calls = []
+    
+    async def fake_grade_answer(question, correct_answer, student_answer):
+        calls.append(student_answer)
+        if student_answer == "boom":
+            raise ValueError("Gemini unavailable")
+        return {"score": 50.0, "is_correct": False, "explanation": "partial"}
+    
+    monkeypatch.setattr(gemini_service, "grade_answer_async", fake_grade_answer)
+    questions = [QuestionAnswer(question="Explain gravity", correct_answer="Mass attracts mass")]
+    submissions = [
+        [StudentAnswer(question_index=0, answer="Things fall")],
+        [StudentAnswer(question_index=0, answer="  Things   fall ")],
+        [StudentAnswer(question_index=0, answer="boom")]
+    ]
+    
+    outcomes, unique_answers = await grading_service.grade_class(questions, submissions)
+    assert unique_answers == 2
+    assert sorted(calls) == ["Things fall", "boom"]
+    assert outcomes[0][0].score == outcomes[1][0].score == 50.0
+    assert outcomes[1][0].student_answer == "  Things   fall "
+    assert isinstance(outcomes[2], ValueError)
@@ -45,3 +45,392 @@ def test_grade_nonexistent_exam(client):
     )
     assert response.status_code == 400
 
+
+
+def _wait_for_state(client, exam_id, states=("done", "failed"), timeout=5.0):
+    """Poll the status endpoint until the exam reaches one of states."""
+    import time
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status_info = client.get(f"/api/exams/{exam_id}/status").json()
+        if status_info["state"] in states:
+            return status_info
+        time.sleep(0.02)
+    raise AssertionError(f"Exam {exam_id} did not finish processing")
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "utf-16"])
+def test_upload_text_file_processed_in_background(client, encoding):
+    """Test upload returns immediately and the job extracts the text."""
+    content = "1. What is 2+2?\nAnswer: 4\n2. Capital of France?\nAnswer: Paris"
+    response = client.post(
+        "/api/exams/upload",
+        files={"file": ("exam.txt", content.encode(encoding), "text/plain")}
+    )
+    assert response.status_code == 202
+    assert response.json()["status"] == "queued"
+    exam_id = response.json()["exam_id"]
+    
+    status_info = _wait_for_state(client, exam_id)
+    assert status_info["state"] == "done"
+    assert status_info["text_extracted"] is True
+    assert {"queued", "done"} <= set(status_info["timestamps"])
+    
+    text = client.get(f"/api/exams/{exam_id}/text").json()
+    assert text["text"] == content
+
+
+def test_upload_unreadable_file_reports_failure(client):
+    """Test a job that extracts too little text ends in the failed state."""
+    response = client.post(
+        "/api/exams/upload",
+        files={"file": ("empty.txt", b"   ", "text/plain")}
+    )
+    exam_id = response.json()["exam_id"]
+    
+    status_info = _wait_for_state(client, exam_id)
+    assert status_info["state"] == "failed"
+    assert status_info["failed_stage"] == "ocr"
+    assert "Only 0 characters" in status_info["error"]
+    
+    parse_response = client.post(f"/api/exams/{exam_id}/parse")
+    assert parse_response.status_code == 400
+
+
+def test_upload_with_auto_parse(client, monkeypatch):
+    """Test the background job can parse the exam automatically."""
+    from app.models import QuestionAnswer
+    from app.services import gemini_service
+    
+    monkeypatch.setattr(
+        gemini_service,
+        "parse_exam_text",
+        lambda text: [QuestionAnswer(question="What is 2+2?", correct_answer="4")]
+    )
+    response = client.post(
+        "/api/exams/upload?auto_parse=true",
+        files={"file": ("exam.txt", b"1. What is 2+2?\nAnswer: 4", "text/plain")}
+    )
+    exam_id = response.json()["exam_id"]
+    
+    status_info = _wait_for_state(client, exam_id)
+    assert status_info["state"] == "done"
+    assert status_info["questions_count"] == 1
+    assert "parsing" in status_info["timestamps"]
+
+
+def test_duplicate_upload_reuses_exam(client, monkeypatch):
+    """Test an identical re-upload maps to the existing exam when dedupe is on."""
+    import uuid
+    from app.config import settings
+    
+    monkeypatch.setattr(settings, "UPLOAD_DEDUPE_ENABLED", True)
+    content = f"1. What is 2+2?\nAnswer: 4\n# {uuid.uuid4()}".encode("utf-8")
+    
+    first = client.post("/api/exams/upload", files={"file": ("exam.txt", content, "text/plain")})
+    _wait_for_state(client, first.json()["exam_id"])
+    second = client.post("/api/exams/upload", files={"file": ("copy.txt", content, "text/plain")})
+    
+    assert second.json()["exam_id"] == first.json()["exam_id"]
+    assert second.json()["status"] == "done"
+    
+    stats = client.get("/api/health/caches").json()
+    assert {"grade", "ocr", "parse"} <= set(stats)
+
+
+def test_storage_stats(client):
+    """Test the storage introspection endpoint reports sizes."""
+    response = client.get("/api/health/storage")
+    assert response.status_code == 200
+    assert "entries" in response.json()
+
+
+def test_ready_endpoint(client, monkeypatch):
+    """Test /api/ready returns 503 until OCR is warm."""
+    from app.services import ocr_executor
+    
+    monkeypatch.setattr(ocr_executor, "_readiness", {"state": "warming", "error": None, "warmup_seconds": None})
+    assert client.get("/api/ready").status_code == 503
+    
+    monkeypatch.setattr(ocr_executor, "_readiness", {"state": "ready", "error": None, "warmup_seconds": 1.5})
+    response = client.get("/api/ready")
+    assert response.status_code == 200
+    assert response.json()["ready"] is True
+
+
+def test_grade_stream_emits_grades_then_summary(client, monkeypatch):
+    """Test the streaming grade endpoint emits NDJSON grades and a final summary."""
+    import json
+    from app.models import QuestionAnswer
+    from app.services import gemini_service, storage
+    
+    async def fake_grade_answer(question, correct_answer, student_answer):
+        return {"score": 50.0, "is_correct": False, "explanation": "partial"}
+    
+    monkeypatch.setattr(gemini_service, "grade_answer_async", fake_grade_answer)
+    storage.create_exam("stream-exam", b"exam", "txt", "exam.txt", {"state": "done"})
+    storage.store_parsed_questions("stream-exam", [
+        QuestionAnswer(question="What is 2+2?", correct_answer="4"),
+        QuestionAnswer(question="Explain gravity", correct_answer="Mass attracts mass")
+    ])
+    
+    response = client.post(
+        "/api/exams/stream-exam/grade/stream",
+        json={
+            "exam_id": "stream-exam",
+            "student_answers": [
+                {"question_index": 0, "answer": "4"},
+                {"question_index": 1, "answer": "Things fall"}
+            ]
+        }
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [record["type"] for record in records] == ["grade", "grade", "summary"]
+    assert records[0]["grading_method"] == "rule"
+    assert records[-1]["final_score"] == 75.0
+    assert records[-1]["correct_answers"] == 1
+    assert storage.get_results("stream-exam")["final_score"] == 75.0
+    storage.delete_exam("stream-exam")
+
+
+def test_grade_stream_validates_before_streaming(client):
+    """Test request errors are reported as HTTP errors, not stream records."""
+    response = client.post(
+        "/api/exams/nonexistent-id/grade/stream",
+        json={"exam_id": "nonexistent-id", "student_answers": []}
+    )
+    assert response.status_code == 400
+
+
+def test_bulk_grade_stores_results_per_student(client, monkeypatch):
+    """Test a class is graded in one request with results kept per student."""
+    from app.models import QuestionAnswer
+    from app.services import gemini_service, storage
+    
+    async def fake_grade_answer(question, correct_answer, student_answer):
+        return {"score": 50.0, "is_correct": False, "explanation": "partial"}
+    
+    monkeypatch.setattr(gemini_service, "grade_answer_async", fake_grade_answer)
+    storage.create_exam("bulk-exam", b"exam", "txt", "exam.txt", {"state": "done"})
+    storage.store_parsed_questions("bulk-exam", [
+        QuestionAnswer(question="What is 2+2?", correct_answer="4"),
+        QuestionAnswer(question="Explain gravity", correct_answer="Mass attracts mass")
+    ])
+    
+    response = client.post(
+        "/api/exams/bulk-exam/grade/bulk",
+        json={
+            "exam_id": "bulk-exam",
+            "submissions": [
+                {"student_id": "alice", "student_answers": [
+                    {"question_index": 0, "answer": "4"},
+                    {"question_index": 1, "answer": "Things fall"}
+                ]},
+                {"student_id": "bob", "student_answers": [
+                    {"question_index": 0, "answer": "5"},
+                    {"question_index": 1, "answer": "Things fall"}
+                ]}
+            ]
+        }
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["graded_students"] == 2
+    assert data["total_answers"] == 4
+    assert data["unique_answers"] == 3
+    assert {s["student_id"]: s["final_score"] for s in data["students"]} == {"alice": 75.0, "bob": 25.0}
+    
+    alice = client.get("/api/exams/bulk-exam/students/alice/results").json()
+    assert alice["final_score"] == 75.0
+    assert alice["total_questions"] == 2
+    assert client.get("/api/exams/bulk-exam/students/carol/results").status_code == 404
+    storage.delete_exam("bulk-exam")
+
+
+def test_bulk_grade_fails_only_submissions_with_bad_indices(client, monkeypatch):
+    """Test an out-of-range question index fails that student alone."""
+    from app.models import QuestionAnswer
+    from app.services import gemini_service, storage
+    
+    async def fake_grade_answer(question, correct_answer, student_answer):
+        return {"score": 100.0, "is_correct": True, "explanation": "right"}
+    
+    monkeypatch.setattr(gemini_service, "grade_answer_async", fake_grade_answer)
+    storage.create_exam("bulk-index-exam", b"exam", "txt", "exam.txt", {"state": "done"})
+    storage.store_parsed_questions("bulk-index-exam", [QuestionAnswer(question="Explain gravity", correct_answer="Mass attracts mass")])
+    
+    response = client.post(
+        "/api/exams/bulk-index-exam/grade/bulk",
+        json={
+            "exam_id": "bulk-index-exam",
+            "submissions": [
+                {"student_id": "alice", "student_answers": [{"question_index": 0, "answer": "Mass attracts"}]},
+                {"student_id": "bob", "student_answers": [{"question_index": 3, "answer": "Things fall"}]}
+            ]
+        }
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["graded_students"] == 1
+    assert data["failed_students"] == 1
+    students = {s["student_id"]: s for s in data["students"]}
+    assert students["alice"]["final_score"] == 100.0
+    assert "out of range" in students["bob"]["error"]
+    
+    assert client.get("/api/exams/bulk-index-exam/students/alice/results").status_code == 200
+    assert client.get("/api/exams/bulk-index-exam/students/bob/results").status_code == 404
+    storage.delete_exam("bulk-index-exam")
+
+
+def test_bulk_grade_rejects_duplicate_students(client):
+    """Test duplicate student IDs are rejected before grading."""
+    response = client.post(
+        "/api/exams/any/grade/bulk",
+        json={
+            "exam_id": "any",
+            "submissions": [
+                {"student_id": "alice", "student_answers": []},
+                {"student_id": "alice", "student_answers": []}
+            ]
+        }
+    )
+    assert response.status_code == 400
+    assert "alice" in response.json()["detail"]
+
+
+def test_bulk_upload_files_and_zip(client):
+    """Test a bulk upload expands archives and reports each file."""
+    import io
+    import zipfile
+    
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("scans/student-1.txt", "1. What is 2+2?\nAnswer: 4 (student one)")
+        zf.writestr("scans/student-2.txt", "1. What is 2+2?\nAnswer: 5 (student two)")
+        zf.writestr("scans/notes.docx", b"not an exam")
+        zf.writestr("__MACOSX/scans/._student-1.txt", b"metadata")
+        zf.writestr("scans/", b"")
+    
+    response = client.post(
+        "/api/exams/upload/bulk",
+        files=[
+            ("files", ("class.zip", archive.getvalue(), "application/zip")),
+            ("files", ("late.txt", b"1. What is 3+3?\nAnswer: 6 (late student)", "text/plain"))
+        ]
+    )
+    assert response.status_code == 202
+    data = response.json()
+    assert data["accepted"] == 3
+    assert data["failed"] == 1
+    by_name = {item["filename"]: item for item in data["files"]}
+    assert set(by_name) == {"class.zip/scans/student-1.txt", "class.zip/scans/student-2.txt", "class.zip/scans/notes.docx", "late.txt"}
+    assert "Unsupported file type" in by_name["class.zip/scans/notes.docx"]["error"]
+    
+    exam_id = by_name["class.zip/scans/student-2.txt"]["exam_id"]
+    assert _wait_for_state(client, exam_id)["state"] == "done"
+    assert "student two" in client.get(f"/api/exams/{exam_id}/text").json()["text"]
+
+
+def test_bulk_upload_rejects_oversized_archive_entries(client, monkeypatch):
+    """Test archive entries over the size limit fail without aborting the batch."""
+    import io
+    import zipfile
+    from app.config import settings
+    
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE_MB", 0.001)
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("big.txt", "x" * 5000)
+        zf.writestr("small.txt", "1. What is 2+2? Answer: 4")
+    
+    response = client.post("/api/exams/upload/bulk", files=[("files", ("batch.zip", archive.getvalue(), "application/zip"))])
+    data = response.json()
+    assert data["accepted"] == 1
+    assert "too large" in data["files"][0]["error"]
+
+
+def test_upload_rejects_content_that_is_not_an_exam(client):
+    """Test uploads are typed by content, not by file name."""
+    response = client.post(
+        "/api/exams/upload",
+        files={"file": ("exam.pdf", b"MZ\x90\x00\x03\x00\x00\x00" * 100, "application/pdf")}
+    )
+    assert response.status_code == 400
+    assert "Unsupported file type" in response.json()["detail"]
+
+
+def test_upload_detects_type_from_content(client):
+    """Test a text exam without an extension is accepted as text."""
+    response = client.post(
+        "/api/exams/upload",
+        files={"file": ("scan-0001", b"1. What is 2+2?\nAnswer: 4", "application/octet-stream")}
+    )
+    assert response.status_code == 202
+    assert response.json()["file_type"] == ".txt"
+
+
+def test_upload_over_size_limit_is_rejected(client, monkeypatch):
+    """Test oversized uploads get 413 from the configured limit."""
+    from app.config import settings
+    
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE_MB", 0.01)
+    response = client.post(
+        "/api/exams/upload",
+        files={"file": ("exam.txt", b"x" * 20_000, "text/plain")}
+    )
+    assert response.status_code == 413
+    
+    response = client.post(
+        "/api/exams/upload",
+        files={"file": ("exam.txt", b"x" * 200_000, "text/plain")}
+    )
+    assert response.status_code == 413
+
+
+
+def test_bulk_upload_over_total_size_limit_is_rejected(client, monkeypatch):
+    """Test bulk uploads get 413 once the request exceeds BULK_UPLOAD_MAX_MB."""
+    from app.config import settings
+    
+    monkeypatch.setattr(settings, "BULK_UPLOAD_MAX_MB", 0.05)
+    files = [("files", (f"exam-{i}.txt", b"x" * 30_000, "text/plain")) for i in range(5)]
+    
+    response = client.post("/api/exams/upload/bulk", files=files)
+    assert response.status_code == 413
+    assert "total size" in response.json()["detail"]
+    
+    response = client.post("/api/exams/upload/bulk", files=files[:1])
+    assert response.status_code == 202
+
+
+async def test_chunked_upload_over_size_limit_is_rejected(monkeypatch):
+    """Test uploads without a Content-Length are cut off once they exceed the limit."""
+    from app.config import settings
+    
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE_MB", 0.01)
+    chunks = [b'--b\r\nContent-Disposition: form-data; name="file"; filename="exam.txt"\r\n\r\n']
+    chunks += [b"x" * 1000] * 100 + [b"\r\n--b--\r\n"]
+    received = []
+    sent = []
+    
+    async def receive():
+        received.append(chunks[len(received)])
+        return {"type": "http.request", "body": received[-1], "more_body": len(received) < len(chunks)}
+    
+    async def send(message):
+        sent.append(message)
+    
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/api/exams/upload",
+        "headers": [(b"content-type", b"multipart/form-data; boundary=b")],
+        "query_string": b""
+    }
+    await app(scope, receive, send)
+    
+    assert sent[0]["status"] == 413
+    assert [message["type"] for message in sent] == ["http.response.start", "http.response.body"]
+    assert len(received) < 90
@@ -0,0 +1,167 @@
+"""
+Unit tests for the OCR executor.
+"""
+from app.services import ocr_executor, ocr_service
+
+
+def test_text_files_skip_the_executor(monkeypatch):
+    """Test plain text is decoded without starting OCR workers."""
+    monkeypatch.setattr(ocr_executor, "_ocr_executor", None)
+    
+    text = ocr_executor.extract_text_with_progress("שאלה 1: 2+2=4".encode("utf-8"), ".txt")
+    
+    assert text == "שאלה 1: 2+2=4"
+    assert ocr_executor._ocr_executor is None
+
+
+def test_in_process_mode_runs_on_a_background_thread(monkeypatch):
+    """Test OCR_WORKERS=0 runs OCR on the executor's thread, not the caller's."""
+    import threading
+    
+    seen_threads = []
+    
+    def fake_extract(image_bytes):
+        seen_threads.append(threading.current_thread().name)
+        return "extracted"
+    
+    monkeypatch.setattr(ocr_executor.settings, "OCR_WORKERS", 0)
+    monkeypatch.setattr(ocr_executor, "_ocr_executor", None)
+    monkeypatch.setattr(ocr_service, "extract_text_from_image", fake_extract)
+    
+    try:
+        text = ocr_executor.extract_text_with_progress(b"fake", ".png")
+    finally:
+        ocr_executor.shutdown_ocr_executor()
+    
+    assert text == "extracted"
+    assert seen_threads[0].startswith("ocr")
+
+
+def test_pdf_progress_reports_each_ocr_page(monkeypatch):
+    """Test PDF pages are OCR'd in order, in batches, with per-page progress."""
+    monkeypatch.setattr(ocr_executor.settings, "OCR_WORKERS", 0)
+    monkeypatch.setattr(ocr_executor, "_ocr_executor", None)
+    monkeypatch.setattr(ocr_service, "plan_pdf_pages", lambda pdf_bytes: [None, "Typed page two", None, None])
+    monkeypatch.setattr(ocr_service, "_render_pdf_page", lambda pdf_bytes, page_number, dpi: str(page_number).encode())
+    monkeypatch.setattr(ocr_executor.settings, "OCR_PAGES_PER_BATCH", 2)
+    monkeypatch.setattr(ocr_service, "extract_text_from_arrays", lambda page_arrays: [f"Scanned page {page_array.decode()}" for page_array in page_arrays])
+    
+    events = []
+    try:
+        text = ocr_executor.extract_text_with_progress(b"%PDF-1.4", ".pdf", lambda *event: events.append(event))
+    finally:
+        ocr_executor.shutdown_ocr_executor()
+    
+    assert text.split("\n\n") == ["Scanned page 1", "Typed page two", "Scanned page 3", "Scanned page 4"]
+    assert events[0] == ("rendering", 0, 0)
+    assert events[1:] == [("ocr", 0, 3), ("ocr", 1, 3), ("ocr", 2, 3), ("ocr", 3, 3)]
+
+
+def test_repeated_file_is_served_from_the_ocr_cache(monkeypatch, isolated_ocr_cache):
+    """Test a re-upload of the same file skips OCR, and changed OCR settings miss."""
+    calls = []
+    monkeypatch.setattr(ocr_executor.settings, "OCR_WORKERS", 0)
+    monkeypatch.setattr(ocr_executor, "_ocr_executor", None)
+    monkeypatch.setattr(ocr_service, "extract_text_from_image", lambda file_bytes: calls.append(file_bytes) or "1. Scanned question")
+    
+    try:
+        first = ocr_executor.extract_text_with_progress(b"same scan", ".png")
+        second = ocr_executor.extract_text_with_progress(b"same scan", ".png")
+        monkeypatch.setattr(ocr_executor.settings, "OCR_LANGUAGE", "he")
+        ocr_executor.extract_text_with_progress(b"same scan", ".png")
+    finally:
+        ocr_executor.shutdown_ocr_executor()
+    
+    assert first == second == "1. Scanned question"
+    assert len(calls) == 2
+    assert isolated_ocr_cache.stats()["hits"] == 1
+
+
+def test_pages_that_failed_ocr_are_not_cached(monkeypatch, isolated_ocr_cache):
+    """Test text with failed-page placeholders is recomputed on the next upload."""
+    monkeypatch.setattr(ocr_executor.settings, "OCR_WORKERS", 0)
+    monkeypatch.setattr(ocr_executor, "_ocr_executor", None)
+    monkeypatch.setattr(ocr_service, "plan_pdf_pages", lambda pdf_bytes: ["Typed page one", None])
+    monkeypatch.setattr(ocr_service, "_render_pdf_page", lambda pdf_bytes, page_number, dpi: b"page")
+    
+    def failing_ocr(page_arrays):
+        raise ValueError("OCR extraction failed")
+    
+    monkeypatch.setattr(ocr_service, "extract_text_from_arrays", failing_ocr)
+    
+    try:
+        text = ocr_executor.extract_text_with_progress(b"%PDF-1.4", ".pdf")
+    finally:
+        ocr_executor.shutdown_ocr_executor()
+    
+    assert "[Error extracting text from page 2]" in text
+    assert isolated_ocr_cache.stats()["sets"] == 0
+
+
+def test_prewarm_runs_warm_up_and_reports_ready(monkeypatch):
+    """Test prewarm warms the OCR workers and flips readiness."""
+    calls = []
+    monkeypatch.setattr(ocr_executor.settings, "OCR_WORKERS", 0)
+    monkeypatch.setattr(ocr_executor, "_ocr_executor", None)
+    monkeypatch.setattr(ocr_executor, "_readiness", {"state": "cold", "error": None, "warmup_seconds": None})
+    monkeypatch.setattr(ocr_service, "warm_up", lambda: calls.append(1) or 0.1)
+    
+    assert ocr_executor.get_readiness()["ready"] is False
+    try:
+        ocr_executor.prewarm()
+    finally:
+        ocr_executor.shutdown_ocr_executor()
+    
+    assert calls == [1]
+    assert ocr_executor.get_readiness()["state"] == "ready"
+    assert ocr_executor.get_readiness()["ready"] is True
+
+
+def test_prewarm_failure_is_not_ready(monkeypatch):
+    """Test a failed model load keeps the worker out of rotation."""
+    def failing_warm_up():
+        raise ValueError("OCR initialization failed: network unreachable")
+    
+    monkeypatch.setattr(ocr_executor.settings, "OCR_WORKERS", 0)
+    monkeypatch.setattr(ocr_executor, "_ocr_executor", None)
+    monkeypatch.setattr(ocr_executor, "_readiness", {"state": "cold", "error": None, "warmup_seconds": None})
+    monkeypatch.setattr(ocr_service, "warm_up", failing_warm_up)
+    
+    try:
+        ocr_executor.prewarm()
+    finally:
+        ocr_executor.shutdown_ocr_executor()
+    
+    readiness = ocr_executor.get_readiness()
+    assert readiness["state"] == "failed"
+    assert "network unreachable" in readiness["error"]
+    assert readiness["ready"] is False
+
+
+def test_two_pass_ocr_runs_on_the_executor(monkeypatch, refine_reader):
+    """Test upload OCR re-reads weak regions at high DPI on the executor, not just in-process."""
+    from PIL import Image
+    
+    renders = []
+    
+    def fake_render(pdf_bytes, page_number, dpi):
+        renders.append((page_number, dpi))
+        return Image.new("L", (dpi, dpi), 255)
+    
+    monkeypatch.setattr(ocr_executor.settings, "OCR_WORKERS", 0)
+    monkeypatch.setattr(ocr_executor.settings, "OCR_REFINE_ENABLED", True)
+    monkeypatch.setattr(ocr_executor.settings, "PDF_RENDER_PREFETCH", 0)
+    monkeypatch.setattr(ocr_executor, "_ocr_executor", None)
+    monkeypatch.setattr(ocr_service, "plan_pdf_pages", lambda pdf_bytes: [None, "Typed page two"])
+    monkeypatch.setattr(ocr_service, "_render_pdf_image", fake_render)
+    
+    events = []
+    try:
+        text = ocr_executor.extract_text_with_progress(b"%PDF-1.4", ".pdf", lambda *event: events.append(event))
+    finally:
+        ocr_executor.shutdown_ocr_executor()
+    
+    assert text.split("\n\n") == ["1. What is 2+2?\nAnswer: 4", "Typed page two"]
+    assert renders == [(1, ocr_service.PDF_LARGE_FILE_DPI), (1, ocr_service.settings.OCR_REFINE_DPI)]
+    assert len(refine_reader.recognized) == 1
+    assert events[-1] == ("ocr", 1, 1)
@@ -0,0 +1,245 @@
+"""
+Unit tests for OCR service helpers (no OCR models required).
+"""
+import subprocess
+from app.services import ocr_service
+
+
+def test_text_layer_scoring():
+    """Test real text is usable and garbage or near-empty pages are not."""
+    assert ocr_service.is_usable_text_layer("1. What is the capital of France?\nAnswer: Paris")
+    assert ocr_service.is_usable_text_layer("שאלה 1: מהי בירת צרפת? תשובה: פריז")
+    assert not ocr_service.is_usable_text_layer("")
+    assert not ocr_service.is_usable_text_layer("  3  ")
+    assert not ocr_service.is_usable_text_layer("\ufffd" * 15 + "abcdefghij" + "\ue000" * 10)
+
+
+def test_extract_pdf_text_layer_splits_pages(monkeypatch):
+    """Test pdftotext output is split into pages on form feeds."""
+    def fake_run(args, **kwargs):
+        assert args[0] == "pdftotext"
+        return subprocess.CompletedProcess(args, 0, stdout="Page one text\fPage two text\f".encode("utf-8"), stderr=b"")
+    
+    monkeypatch.setattr(ocr_service.subprocess, "run", fake_run)
+    
+    assert ocr_service.extract_pdf_text_layer(b"%PDF-1.4") == ["Page one text", "Page two text"]
+
+
+def test_extract_pdf_text_layer_missing_tool(monkeypatch):
+    """Test a missing pdftotext binary means no text layer."""
+    def fake_run(args, **kwargs):
+        raise FileNotFoundError("pdftotext")
+    
+    monkeypatch.setattr(ocr_service.subprocess, "run", fake_run)
+    
+    assert ocr_service.extract_pdf_text_layer(b"%PDF-1.4") == []
+
+
+def test_extract_text_from_pdf_only_ocrs_pages_without_text(monkeypatch):
+    """Test pages with a usable text layer skip rendering and OCR."""
+    typed_page = "1. What is the capital of France?\nAnswer: Paris"
+    rendered = []
+    
+    monkeypatch.setattr(ocr_service, "get_pdf_page_count", lambda pdf_bytes: 2)
+    monkeypatch.setattr(ocr_service, "extract_pdf_text_layer", lambda pdf_bytes, max_pages=None: [typed_page, ""])
+    
+    def fake_render(pdf_bytes, page_number, dpi):
+        rendered.append(page_number)
+        return b"png"
+    
+    monkeypatch.setattr(ocr_service, "_render_pdf_page", fake_render)
+    monkeypatch.setattr(ocr_service, "extract_text_from_array", lambda page_array: "2. Scanned question")
+    
+    text = ocr_service.extract_text_from_pdf(b"%PDF-1.4")
+    
+    assert rendered == [2]
+    assert text == typed_page + "\n\n2. Scanned question"
+
+
+def test_extract_text_from_pdf_reads_past_three_pages(monkeypatch):
+    """Test long exams are processed up to PDF_MAX_PAGES without early exit."""
+    monkeypatch.setattr(ocr_service, "get_pdf_page_count", lambda pdf_bytes: 8)
+    monkeypatch.setattr(ocr_service.settings, "PDF_MAX_PAGES", 6)
+    monkeypatch.setattr(ocr_service, "extract_pdf_text_layer", lambda pdf_bytes, max_pages=None: [])
+    monkeypatch.setattr(ocr_service, "_render_pdf_page", lambda pdf_bytes, page_number, dpi: str(page_number).encode())
+    monkeypatch.setattr(ocr_service.settings, "OCR_PAGES_PER_BATCH", 4)
+    batches = []
+    
+    def fake_batch(page_arrays):
+        batches.append([page_array.decode() for page_array in page_arrays])
+        return [f"Question {page_array.decode()} " + "x" * 600 for page_array in page_arrays]
+    
+    monkeypatch.setattr(ocr_service, "extract_text_from_arrays", fake_batch)
+    
+    text = ocr_service.extract_text_from_pdf(b"%PDF-1.4")
+    
+    assert [line.split()[1] for line in text.split("\n\n")] == ["1", "2", "3", "4", "5", "6"]
+    assert batches == [["1", "2", "3", "4"], ["5", "6"]]
+
+
+def test_iter_pdf_pages_bounds_prefetch(monkeypatch):
+    """Test the renderer never runs more than `prefetch` pages ahead of the consumer."""
+    import threading
+    import time
+    
+    rendered = []
+    lock = threading.Lock()
+    
+    def fake_render(pdf_bytes, page_number, dpi):
+        with lock:
+            rendered.append(page_number)
+        return b"png"
+    
+    monkeypatch.setattr(ocr_service, "_render_pdf_page", fake_render)
+    
+    pages = ocr_service.iter_pdf_pages(b"%PDF-1.4", list(range(1, 11)), prefetch=2)
+    assert next(pages)[0] == 1
+    time.sleep(0.3)
+    # One page consumed, two queued, one rendered and waiting to be queued
+    assert len(rendered) <= 4
+    assert [page_number for page_number, _ in pages] == list(range(2, 11))
+
+
+def test_rendered_pages_are_grayscale_arrays():
+    """Test pages are handed to OCR as uint8 grayscale arrays without re-encoding."""
+    import numpy as np
+    from PIL import Image
+    
+    page = Image.new("RGB", (2400, 100), "white")
+    page_array = ocr_service._prepare_page_for_ocr(page)
+    
+    assert isinstance(page_array, np.ndarray)
+    assert page_array.dtype == np.uint8
+    assert page_array.shape == (50, 1200)
+
+
+def test_extract_text_from_image_decodes_once(monkeypatch):
+    """Test image bytes are decoded and passed to OCR as an array."""
+    import io
+    import numpy as np
+    from PIL import Image
+    
+    seen = []
+    monkeypatch.setattr(ocr_service, "extract_text_from_array", lambda page_array: seen.append(page_array) or "text")
+    
+    buffer = io.BytesIO()
+    Image.new("P", (10, 5)).save(buffer, format="PNG")
+    
+    assert ocr_service.extract_text_from_image(buffer.getvalue()) == "text"
+    assert isinstance(seen[0], np.ndarray)
+    assert seen[0].shape == (5, 10)
+
+
+class FakeBatchReader:
+    """Records EasyOCR calls and returns one detected line per image."""
+    
+    def __init__(self):
+        self.calls = []
+    
+    def readtext(self, image, **kwargs):
+        self.calls.append(("readtext", [image.shape], kwargs))
+        return [([[0, 0]], f"text {image.shape[0]}", 0.9)]
+    
+    def readtext_batched(self, images, **kwargs):
+        self.calls.append(("readtext_batched", [image.shape for image in images], kwargs))
+        return [[([[0, 0]], f"page {i + 1}", 0.9)] for i in range(len(images))]
+
+
+def test_extract_text_from_arrays_uses_one_padded_batch(monkeypatch):
+    """Test pages of different sizes share one batched call with the configured batch size."""
+    import numpy as np
+    
+    reader = FakeBatchReader()
+    monkeypatch.setattr(ocr_service, "get_ocr_reader", lambda: reader)
+    monkeypatch.setattr(ocr_service.settings, "OCR_BATCH_SIZE", 16)
+    
+    pages = [np.zeros((40, 30), dtype=np.uint8), np.zeros((50, 20, 3), dtype=np.uint8)]
+    
+    assert ocr_service.extract_text_from_arrays(pages) == ["page 1", "page 2"]
+    assert len(reader.calls) == 1
+    method, shapes, kwargs = reader.calls[0]
+    assert method == "readtext_batched"
+    assert shapes == [(50, 30), (50, 30)]
+    assert kwargs["batch_size"] == 16
+
+
+def test_split_into_tiles_cuts_on_blank_rows():
+    """Test tall images are tiled at blank rows so lines stay whole."""
+    import numpy as np
+    
+    image = np.full((1000, 50), 255, dtype=np.uint8)
+    for top in range(0, 1000, 100):
+        image[top + 20:top + 80] = 0  # a text line every 100px with blank gaps
+    
+    tiles = ocr_service.split_into_tiles(image, tile_height=300)
+    
+    assert len(tiles) == 3
+    assert sum(tile.shape[0] for tile in tiles) == 1000
+    for tile in tiles:
+        assert (tile[0] == 255).all() and (tile[-1] == 255).all()
+    assert ocr_service.split_into_tiles(image, tile_height=0) == [image]
+
+
+def test_extract_text_from_pil_batches_tiles(monkeypatch):
+    """Test tall images are OCR'd as tiles in one batched call when tiling is on."""
+    from PIL import Image
+    
+    reader = FakeBatchReader()
+    monkeypatch.setattr(ocr_service, "get_ocr_reader", lambda: reader)
+    monkeypatch.setattr(ocr_service.settings, "OCR_TILE_HEIGHT", 100)
+    
+    text = ocr_service.extract_text_from_pil(Image.new("L", (40, 400), 255))
+    
+    assert text == "page 1\npage 2\npage 3\npage 4"
+    assert [call[0] for call in reader.calls] == ["readtext_batched"]
+
+
+def test_refine_low_confidence_rereads_weak_regions(monkeypatch, refine_reader):
+    """Test only weak regions are re-read, scaled to the high-resolution image and merged in place."""
+    import numpy as np
+    
+    results = refine_reader.readtext(None)
+    
+    merged, improved = ocr_service.refine_low_confidence(results, np.full((300, 300), 255, dtype=np.uint8), 3.0)
+    
+    assert improved == 1
+    assert [text for _, text, _ in merged] == ["1. What is 2+2?", "Answer: 4"]
+    assert merged[1][0] == results[1][0]
+    assert refine_reader.recognized == [((300, 300), [[26, 184, 86, 124]])]
+    
+    monkeypatch.setattr(ocr_service.settings, "OCR_REFINE_CONFIDENCE", 0.2)
+    assert ocr_service.refine_low_confidence(results, np.zeros((300, 300), dtype=np.uint8), 3.0) == (results, 0)
+
+
+def test_extract_text_from_pdf_two_pass(monkeypatch, refine_reader):
+    """Test two-pass mode OCRs at the low DPI and re-renders only pages with weak regions."""
+    from PIL import Image
+    
+    renders = []
+    
+    def fake_render(pdf_bytes, page_number, dpi):
+        renders.append(dpi)
+        return Image.new("L", (dpi, dpi), 255)
+    
+    monkeypatch.setattr(ocr_service.settings, "OCR_REFINE_ENABLED", True)
+    monkeypatch.setattr(ocr_service.settings, "PDF_RENDER_PREFETCH", 0)
+    monkeypatch.setattr(ocr_service, "get_pdf_page_count", lambda pdf_bytes: 1)
+    monkeypatch.setattr(ocr_service, "extract_pdf_text_layer", lambda pdf_bytes, max_pages=None: [])
+    monkeypatch.setattr(ocr_service, "_render_pdf_image", fake_render)
+    
+    text = ocr_service.extract_text_from_pdf(b"%PDF-1.4")
+    
+    assert text == "1. What is 2+2?\nAnswer: 4"
+    assert renders == [ocr_service.PDF_LARGE_FILE_DPI, ocr_service.settings.OCR_REFINE_DPI]
+    assert len(refine_reader.recognized) == 1
+
+
+def test_refinement_needs_geometry_preserving_profile(monkeypatch):
+    """Test two-pass mode is off when preprocessing moves or rescales pages."""
+    monkeypatch.setattr(ocr_service.settings, "OCR_REFINE_ENABLED", True)
+    assert ocr_service.refinement_enabled()
+    fingerprint = ocr_service.ocr_settings_fingerprint()
+    
+    monkeypatch.setattr(ocr_service.settings, "OCR_PREPROCESS_PROFILE", "clean")
+    assert not ocr_service.refinement_enabled()
+    assert ocr_service.ocr_settings_fingerprint() != fingerprint
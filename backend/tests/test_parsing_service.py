@@ -0,0 +1,183 @@
+"""
+Unit tests for the parsing service.
+"""
+import asyncio
+import threading
+import time
+from app.config import settings
+from app.models import QuestionAnswer
+from app.services import gemini_service, parsing_service
+
+EXAM_TEXT = "1. What is 2+2?\nAnswer: 4"
+
+
+def _slow_parser(calls, delay=0.1):
+    def parse(text):
+        calls.append(text)
+        time.sleep(delay)
+        return [QuestionAnswer(question="What is 2+2?", correct_answer="4")]
+    return parse
+
+
+def test_identical_text_is_parsed_once(monkeypatch, isolated_parse_cache):
+    """Test a second exam with the same text is served from the parse cache."""
+    calls = []
+    monkeypatch.setattr(gemini_service, "parse_exam_text", _slow_parser(calls, delay=0))
+    
+    first = parsing_service.parse_exam_text(EXAM_TEXT)
+    second = parsing_service.parse_exam_text(EXAM_TEXT + "\n")
+    
+    assert len(calls) == 1
+    assert first == second
+    assert isolated_parse_cache.stats()["hits"] == 1
+
+
+def test_empty_parse_is_not_cached(monkeypatch):
+    """Test a parse that found no questions is retried next time."""
+    calls = []
+    monkeypatch.setattr(gemini_service, "parse_exam_text", lambda text: calls.append(text) or [])
+    
+    assert parsing_service.parse_exam_text(EXAM_TEXT) == []
+    assert parsing_service.parse_exam_text(EXAM_TEXT) == []
+    assert len(calls) == 2
+
+
+def test_concurrent_threads_share_one_call(monkeypatch):
+    """Test concurrent parses of the same text coalesce into one Gemini call."""
+    calls = []
+    monkeypatch.setattr(gemini_service, "parse_exam_text", _slow_parser(calls))
+    
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(parsing_service.parse_exam_text(EXAM_TEXT)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert len(calls) == 1
+    assert len(results) == 4
+    assert all(result == results[0] for result in results)
+
+
+async def test_concurrent_requests_share_one_call(monkeypatch):
+    """Test concurrent async parses await one shared call, errors included."""
+    calls = []
+    
+    async def failing_parse(text):
+        calls.append(text)
+        await asyncio.sleep(0.1)
+        raise ValueError("Failed to parse Gemini response as JSON")
+    
+    monkeypatch.setattr(gemini_service, "parse_exam_text_async", failing_parse)
+    
+    results = await asyncio.gather(
+        parsing_service.parse_exam_text_async(EXAM_TEXT),
+        parsing_service.parse_exam_text_async(EXAM_TEXT),
+        return_exceptions=True
+    )
+    
+    assert len(calls) == 1
+    assert all(isinstance(result, ValueError) for result in results)
+    assert parsing_service.get_parse_flights().stats()["in_flight"] == 0
+
+
+LONG_EXAM = "\n".join(
+    f"{i}. What is {i} plus {i}? Explain your reasoning here.\nAnswer: {2 * i}" for i in range(1, 41)
+)
+
+
+def test_split_exam_text_at_question_boundaries():
+    """Test long text is split into bounded chunks that start at questions."""
+    chunks = parsing_service.split_exam_text(LONG_EXAM, max_chars=600, overlap_chars=0)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 600 for chunk in chunks[:-1])
+    assert all(chunk.split(".")[0].isdigit() for chunk in chunks)
+    assert "\n".join(chunks) == LONG_EXAM
+    assert parsing_service.split_exam_text(LONG_EXAM, max_chars=0) == [LONG_EXAM]
+
+
+def test_split_exam_text_overlap_repeats_whole_lines():
+    """Test each chunk repeats the end of the previous one from a line start."""
+    chunks = parsing_service.split_exam_text(LONG_EXAM, max_chars=600, overlap_chars=100)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        first_line = chunk.split("\n")[0]
+        assert first_line in previous.split("\n")
+
+
+def test_merge_questions_dedupes_overlap():
+    """Test questions repeated across chunk edges are merged in order."""
+    first = [
+        QuestionAnswer(question="1. What is the capital of France?", correct_answer="Paris"),
+        QuestionAnswer(question="2. Name the largest planet in the", correct_answer="")
+    ]
+    second = [
+        QuestionAnswer(question="2. Name the largest planet in the solar system", correct_answer="Jupiter"),
+        QuestionAnswer(question="3. What is 2 + 2?", correct_answer="4")
+    ]
+    merged = parsing_service.merge_questions([first, second])
+    assert [q.correct_answer for q in merged] == ["Paris", "Jupiter", "4"]
+    assert merged[1].question == "2. Name the largest planet in the solar system"
+
+
+def test_merge_questions_keeps_repeats_within_a_chunk():
+    """Test questions with the same text inside one chunk are never merged."""
+    stem = "Explain the following reaction in detail"
+    first = [
+        QuestionAnswer(question="1. Explain.", correct_answer="A"),
+        QuestionAnswer(question="2. Explain.", correct_answer="B"),
+        QuestionAnswer(question=f"3. {stem}: fire", correct_answer="C"),
+        QuestionAnswer(question=f"4. {stem}", correct_answer="")
+    ]
+    second = [
+        QuestionAnswer(question=f"4. {stem}: rust", correct_answer="D"),
+        QuestionAnswer(question="5. Explain.", correct_answer="E")
+    ]
+    
+    assert [q.correct_answer for q in parsing_service.merge_questions([first])] == ["A", "B", "C", ""]
+    merged = parsing_service.merge_questions([first, second])
+    assert [q.correct_answer for q in merged] == ["A", "B", "C", "D", "E"]
+
+
+def test_long_text_is_parsed_in_chunks(monkeypatch):
+    """Test chunks are parsed separately and merged into one ordered list."""
+    monkeypatch.setattr(settings, "PARSE_CHUNK_CHARS", 600)
+    monkeypatch.setattr(settings, "PARSE_CHUNK_OVERLAP_CHARS", 100)
+    calls = []
+    
+    def parse(text):
+        calls.append(text)
+        blocks = text.split("\n")
+        return [
+            QuestionAnswer(question=line, correct_answer=answer.replace("Answer: ", ""))
+            for line, answer in zip(blocks, blocks[1:])
+            if line[0].isdigit() and answer.startswith("Answer:")
+        ]
+    
+    monkeypatch.setattr(gemini_service, "parse_exam_text", parse)
+    questions = parsing_service.parse_exam_text(LONG_EXAM)
+    assert len(calls) > 1
+    assert [q.correct_answer for q in questions] == [str(2 * i) for i in range(1, 41)]
+
+
+async def test_long_text_is_parsed_in_chunks_async(monkeypatch):
+    """Test the async path parses chunks concurrently."""
+    monkeypatch.setattr(settings, "PARSE_CHUNK_CHARS", 600)
+    monkeypatch.setattr(settings, "PARSE_CHUNK_OVERLAP_CHARS", 0)
+    active = []
+    peak = []
+    
+    async def parse(text):
+        active.append(1)
+        peak.append(len(active))
+        await asyncio.sleep(0.01)
+        active.pop()
+        number = int(text.split(".")[0])
+        return [QuestionAnswer(question=f"Question {number}", correct_answer=str(number))]
+    
+    monkeypatch.setattr(gemini_service, "parse_exam_text_async", parse)
+    questions = await parsing_service.parse_exam_text_async(LONG_EXAM)
+    assert max(peak) > 1
+    assert [int(q.correct_answer) for q in questions] == sorted(int(q.correct_answer) for q in questions)
@@ -0,0 +1,105 @@
+"""
+Unit tests for OCR image preprocessing.
+"""
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+from app.config import settings
+from app.services import ocr_service, preprocessing
+
+
+def make_text_page(width=800, height=600, line_height=12, margin=100, skew=0.0):
+    """White page with solid dark bars standing in for text lines."""
+    page = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(page)
+    for top in range(margin, height - margin, line_height * 3):
+        draw.rectangle([margin, top, width - margin - 1, top + line_height - 1], fill=20)
+    if skew:
+        page = page.rotate(skew, resample=Image.Resampling.BILINEAR, fillcolor=255)
+    return np.asarray(page)
+
+
+def test_normalize_contrast_stretches_to_full_range():
+    """Test a washed-out image is stretched to black and white."""
+    image = np.full((50, 50), 200, dtype=np.uint8)
+    image[20:30] = 120
+    
+    stretched = preprocessing.normalize_contrast(image)
+    
+    assert stretched.min() == 0
+    assert stretched.max() == 255
+    assert preprocessing.normalize_contrast(np.full((5, 5), 90, dtype=np.uint8)).max() == 90
+
+
+def test_binarize_splits_at_otsu_threshold():
+    """Test a two-tone image becomes pure black and white."""
+    image = np.full((40, 40), 210, dtype=np.uint8)
+    image[:, :10] = 60
+    
+    binary = preprocessing.binarize(image)
+    
+    assert 60 <= preprocessing.otsu_threshold(image) < 210
+    assert set(np.unique(binary)) == {0, 255}
+    assert (binary[:, :10] == 0).all()
+    assert (binary[:, 10:] == 255).all()
+
+
+def test_deskew_recovers_rotation():
+    """Test a rotated page is detected and straightened."""
+    assert preprocessing.estimate_skew(make_text_page()) == 0.0
+    assert preprocessing.estimate_skew(make_text_page(skew=2)) == pytest.approx(-2.0, abs=0.5)
+    assert abs(preprocessing.estimate_skew(preprocessing.deskew(make_text_page(skew=-3)))) <= 0.5
+
+
+def test_crop_margins_keeps_padding():
+    """Test blank margins are cropped to the inked area plus padding."""
+    page = make_text_page(margin=100)
+    
+    cropped = preprocessing.crop_margins(page, padding=10)
+    
+    assert cropped.shape[1] == 600 + 20
+    assert cropped[:10].min() == 255
+    assert preprocessing.crop_margins(np.full((20, 20), 255, dtype=np.uint8)).shape == (20, 20)
+
+
+def test_target_resolution_scales_to_text_height(monkeypatch):
+    """Test pages are rescaled so text lines reach the target height."""
+    monkeypatch.setattr(settings, "OCR_TARGET_TEXT_HEIGHT", 24)
+    page = make_text_page(line_height=12)
+    
+    assert preprocessing.estimate_text_height(page) == 12
+    assert preprocessing.target_resolution(page).shape == (1200, 1600)
+    assert preprocessing.target_resolution(page, text_height=13) is page
+    assert preprocessing.estimate_text_height(np.full((20, 20), 255, dtype=np.uint8)) == 0
+
+
+def test_resolve_profile():
+    """Test profiles resolve by name or as step lists and reject unknown names."""
+    assert preprocessing.resolve_profile("none") == []
+    assert preprocessing.resolve_profile("SCAN") == preprocessing.PROFILES["scan"]
+    assert preprocessing.resolve_profile("contrast, binarize") == ["contrast", "binarize"]
+    with pytest.raises(ValueError):
+        preprocessing.resolve_profile("sharpen")
+
+
+def test_preprocess_runs_profile_steps():
+    """Test the default profile leaves images alone and others return uint8 grayscale."""
+    page = np.stack([make_text_page(skew=2)] * 3, axis=-1)
+    
+    assert preprocessing.preprocess(page) is page
+    processed = preprocessing.preprocess(page, "binary")
+    assert processed.ndim == 2
+    assert processed.dtype == np.uint8
+    assert set(np.unique(processed)) <= {0, 255}
+
+
+def test_rendered_pages_use_profile_resolution(monkeypatch):
+    """Test the fixed width cap is skipped when the profile picks the resolution."""
+    page = Image.fromarray(np.tile(make_text_page(width=400, line_height=24), (1, 6)))
+    
+    assert ocr_service._prepare_page_for_ocr(page).shape[1] == ocr_service.OCR_MAX_WIDTH
+    fingerprint = ocr_service.ocr_settings_fingerprint()
+    
+    monkeypatch.setattr(settings, "OCR_PREPROCESS_PROFILE", "resolution")
+    assert ocr_service._prepare_page_for_ocr(page).shape[1] == 2400 * 32 // 24
+    assert ocr_service.ocr_settings_fingerprint() != fingerprint
@@ -0,0 +1,178 @@
+"""
+Unit tests for the Gemini rate limiter.
+"""
+import pytest
+from app.services import gemini_service, rate_limiter
+from app.services.rate_limiter import AdaptiveConcurrency, RateLimiter, TokenBucket, classify_error
+
+
+class ApiError(Exception):
+    """Stand-in for a google.api_core error carrying an HTTP status."""
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+def flaky(errors, result="ok"):
+    """Return a function that raises the given errors in turn, then succeeds."""
+    remaining = list(errors)
+    calls = []
+    
+    def fn():
+        calls.append(1)
+        if remaining:
+            raise remaining.pop(0)
+        return result
+    
+    fn.calls = calls
+    return fn
+
+
+def test_token_bucket_waits_once_exhausted():
+    """Test a bucket allows its burst then asks callers to wait."""
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.reserve(60) == 0
+    assert bucket.reserve(1) == pytest.approx(1.0, abs=0.05)
+    assert bucket.reserve(1) == pytest.approx(2.0, abs=0.05)
+
+
+def test_adaptive_concurrency_aimd():
+    """Test the limit halves on throttling and grows back additively."""
+    concurrency = AdaptiveConcurrency(max_limit=8, min_limit=1, cooldown_seconds=0)
+    assert concurrency.try_acquire()
+    concurrency.release(throttled=True)
+    assert concurrency.limit == 4
+    
+    for _ in range(5):
+        concurrency.acquire()
+        concurrency.release()
+    assert concurrency.limit == 5
+    
+    for _ in range(10):
+        concurrency.acquire()
+        concurrency.release(throttled=True)
+    assert concurrency.limit == 1
+    assert concurrency.try_acquire()
+    assert not concurrency.try_acquire()
+
+
+def test_adaptive_concurrency_cooldown():
+    """Test one burst of throttled calls only lowers the limit once."""
+    concurrency = AdaptiveConcurrency(max_limit=8, cooldown_seconds=60)
+    for _ in range(3):
+        concurrency.acquire()
+    for _ in range(3):
+        concurrency.release(throttled=True)
+    assert concurrency.limit == 4
+
+
+def test_classify_error():
+    """Test quota, server and other errors are told apart."""
+    assert classify_error(ApiError(429)) == "throttled"
+    assert classify_error(ApiError(503)) == "server"
+    assert classify_error(TimeoutError()) == "server"
+    assert classify_error(ApiError(400)) is None
+    assert classify_error(ValueError("bad")) is None
+
+
+def test_call_retries_retriable_errors():
+    """Test 429/5xx responses are retried and counted."""
+    limiter = RateLimiter(max_retries=3, retry_base_seconds=0, retry_max_seconds=0)
+    fn = flaky([ApiError(429), ApiError(503)])
+    assert limiter.call(fn) == "ok"
+    assert len(fn.calls) == 3
+    
+    stats = limiter.stats()
+    assert stats["retries"] == 2
+    assert stats["quota_errors"] == 1
+    assert stats["server_errors"] == 1
+    assert stats["succeeded"] == 1
+    assert stats["in_flight"] == 0
+
+
+def test_call_gives_up_after_max_retries():
+    """Test retriable errors surface once retries are exhausted."""
+    limiter = RateLimiter(max_retries=1, retry_base_seconds=0, retry_max_seconds=0)
+    fn = flaky([ApiError(429)] * 5)
+    with pytest.raises(ApiError):
+        limiter.call(fn)
+    assert len(fn.calls) == 2
+    assert limiter.stats()["failed"] == 1
+
+
+def test_call_does_not_retry_client_errors():
+    """Test non-retriable errors fail immediately."""
+    limiter = RateLimiter(retry_base_seconds=0)
+    fn = flaky([ApiError(400)])
+    with pytest.raises(ApiError):
+        limiter.call(fn)
+    assert len(fn.calls) == 1
+    assert limiter.stats()["retries"] == 0
+
+
+def test_backoff_delay_is_capped_full_jitter():
+    """Test backoff grows exponentially, stays within the cap, and is jittered."""
+    limiter = RateLimiter(retry_base_seconds=1, retry_max_seconds=5)
+    delays = [limiter.backoff_delay(10) for _ in range(50)]
+    assert all(0 <= delay <= 5 for delay in delays)
+    assert len(set(delays)) > 1
+    assert all(0 <= limiter.backoff_delay(0) <= 1 for _ in range(20))
+
+
+def test_throttled_waits_are_counted(monkeypatch):
+    """Test calls beyond the request budget wait and are reported."""
+    sleeps = []
+    monkeypatch.setattr(rate_limiter.time, "sleep", sleeps.append)
+    limiter = RateLimiter(requests_per_minute=2)
+    for _ in range(3):
+        limiter.call(lambda: None)
+    assert len(sleeps) == 1
+    assert limiter.stats()["throttled_waits"] == 1
+
+
+async def test_call_async_retries():
+    """Test the async path retries and releases its slot."""
+    limiter = RateLimiter(max_retries=2, retry_base_seconds=0, retry_max_seconds=0)
+    fn = flaky([ApiError(500)])
+    
+    async def call():
+        return fn()
+    
+    assert await limiter.call_async(call) == "ok"
+    assert limiter.stats()["retries"] == 1
+    assert limiter.concurrency.in_flight == 0
+
+
+async def test_async_waiters_wake_on_release():
+    """Test waiting coroutines are woken by release, also from other threads and past cancelled waiters."""
+    import asyncio
+    import threading
+    
+    concurrency = AdaptiveConcurrency(1)
+    concurrency.acquire()
+    cancelled = asyncio.ensure_future(concurrency.acquire_async())
+    waiter = asyncio.ensure_future(concurrency.acquire_async())
+    await asyncio.sleep(0)
+    assert len(concurrency._async_waiters) == 2
+    
+    threading.Thread(target=concurrency.release).start()
+    cancelled.cancel()
+    await asyncio.wait_for(waiter, timeout=1)
+    assert cancelled.cancelled()
+    assert concurrency.in_flight == 1
+    assert not concurrency._async_waiters
+
+
+def test_generate_uses_shared_limiter(monkeypatch, isolated_gemini_limiter):
+    """Test Gemini calls go through the limiter and are retried on 429."""
+    fn = flaky([ApiError(429)], result="[]")
+    
+    class Model:
+        def generate_content(self, contents, *, generation_config=None, safety_settings=None, stream=False):
+            class Response:
+                text = fn()
+            return Response()
+    
+    monkeypatch.setattr(gemini_service, "get_model", lambda: Model())
+    assert gemini_service.generate("prompt") == "[]"
+    assert isolated_gemini_limiter.stats()["retries"] == 1
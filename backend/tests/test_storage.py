@@ -0,0 +1,205 @@
+"""
+Unit tests for the storage backends.
+"""
+import pytest
+from app.models import QuestionAnswer, QuestionGrade
+from app.services.sqlite_storage import SQLiteExamStore
+from app.services.storage import MemoryExamStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    """Each backend, empty."""
+    if request.param == "memory":
+        backend = MemoryExamStore()
+    else:
+        backend = SQLiteExamStore(str(tmp_path / "exams.sqlite3"))
+    yield backend
+    backend.close()
+
+
+def _grade(index, score):
+    return QuestionGrade(
+        question_index=index,
+        question=f"Question {index}",
+        correct_answer="4",
+        student_answer="4",
+        score=score,
+        is_correct=score >= 70,
+        explanation="ok"
+    )
+
+
+def test_exam_round_trip(store):
+    """Test an exam can be created, updated, looked up by hash and deleted."""
+    store.create_exam("exam-1", "ref-1", ".pdf", "exam.pdf", {"state": "queued"}, file_hash="abc")
+    store.update_exam("exam-1", extracted_text="1. What is 2+2?", status={"state": "done"})
+    
+    exam = store.get_exam("exam-1")
+    assert exam["file_ref"] == "ref-1"
+    assert exam["extracted_text"] == "1. What is 2+2?"
+    assert exam["status"] == {"state": "done"}
+    assert store.find_exam_by_hash("abc") == "exam-1"
+    
+    store.delete_exam("exam-1")
+    assert store.get_exam("exam-1") is None
+    assert store.find_exam_by_hash("abc") is None
+
+
+def test_questions_and_results_round_trip(store):
+    """Test parsed questions and graded results come back as models, in order."""
+    questions = [QuestionAnswer(question="What is 2+2?", correct_answer="4")]
+    store.create_exam("exam-1", "ref-1", ".txt", "exam.txt", {"state": "done"})
+    store.store_parsed_questions("exam-1", questions)
+    store.store_results("exam-1", {
+        "question_grades": [_grade(1, 50.0), _grade(0, 100.0)],
+        "final_score": 75.0,
+        "correct_count": 1,
+        "local_resolution_rate": 0.5
+    })
+    
+    assert store.get_parsed_questions("exam-1") == questions
+    results = store.get_results("exam-1")
+    assert [grade.question_index for grade in results["question_grades"]] == [1, 0]
+    assert results["final_score"] == 75.0
+    assert results["correct_count"] == 1
+    assert store.get_exam("exam-1")["results"]["local_resolution_rate"] == 0.5
+
+
+def test_file_refs(store):
+    """Test stored exams report the blobs they reference."""
+    store.create_exam("a", "ref-a", ".pdf", "a.pdf", {"state": "done"})
+    store.create_exam("b", "ref-a", ".pdf", "b.pdf", {"state": "done"})
+    store.create_exam("c", "ref-c", ".pdf", "c.pdf", {"state": "done"})
+    store.delete_exam("c")
+    
+    assert store.file_refs() == {"ref-a"}
+
+
+def test_missing_exam(store):
+    """Test writes to unknown exams are ignored and reads return None."""
+    store.store_results("missing", {"question_grades": [], "final_score": 0.0, "correct_count": 0})
+    
+    assert store.get_exam("missing") is None
+    assert store.get_results("missing") is None
+    assert store.get_parsed_questions("missing") is None
+
+
+def test_sqlite_store_persists_and_is_shared(tmp_path):
+    """Test a second store on the same file (another worker, or a restart) sees the data."""
+    import threading
+    
+    db_path = str(tmp_path / "exams.sqlite3")
+    writer = SQLiteExamStore(db_path)
+    reader = SQLiteExamStore(db_path)
+    
+    writer.create_exam("exam-1", "ref-1", ".txt", "exam.txt", {"state": "queued"})
+    thread = threading.Thread(target=lambda: writer.update_exam("exam-1", status={"state": "done"}))
+    thread.start()
+    thread.join()
+    
+    assert reader.get_exam("exam-1")["status"] == {"state": "done"}
+    writer.close()
+    reader.close()
+
+
+def _settled_exam(store, exam_id, text=""):
+    store.create_exam(exam_id, f"ref-{exam_id}", ".txt", "exam.txt", {"state": "done"}, file_hash=f"hash-{exam_id}")
+    if text:
+        store.update_exam(exam_id, extracted_text=text)
+
+
+def test_memory_store_evicts_least_recently_used():
+    """Test the entry limit evicts the least recently used exam."""
+    store = MemoryExamStore(max_entries=2)
+    _settled_exam(store, "a")
+    _settled_exam(store, "b")
+    store.get_exam("a")
+    _settled_exam(store, "c")
+    
+    assert store.get_exam("b") is None
+    assert store.get_exam("a") is not None
+    assert store.find_exam_by_hash("hash-b") is None
+    assert store.stats()["evictions"] == 1
+
+
+def test_memory_store_byte_limit_and_accounting():
+    """Test estimated bytes are tracked per field and bound the store."""
+    store = MemoryExamStore(max_bytes=30000)
+    _settled_exam(store, "a", text="x" * 20000)
+    stats = store.stats()
+    assert stats["bytes_by_field"]["extracted_text"] >= 20000
+    
+    _settled_exam(store, "b", text="y" * 20000)
+    stats = store.stats()
+    assert stats["entries"] == 1
+    assert stats["estimated_bytes"] <= 30000
+    assert store.get_exam("b") is not None
+
+
+def test_memory_store_never_evicts_exams_in_progress():
+    """Test exams still being processed stay in memory over the limit."""
+    store = MemoryExamStore(max_entries=1)
+    store.create_exam("busy", "ref", ".pdf", "exam.pdf", {"state": "ocr"})
+    _settled_exam(store, "done")
+    
+    assert store.get_exam("busy") is not None
+    assert store.stats()["pinned_entries"] == 1
+
+
+def test_student_results_are_kept_per_student(store):
+    """Test bulk results are stored per student and merged across calls."""
+    store.create_exam("exam-1", "ref-1", ".txt", "exam.txt", {"state": "done"})
+    store.store_student_results("exam-1", {
+        "alice": {"question_grades": [_grade(0, 100.0)], "final_score": 100.0, "correct_count": 1},
+        "bob": {"question_grades": [_grade(0, 0.0)], "final_score": 0.0, "correct_count": 0}
+    })
+    store.store_student_results("exam-1", {
+        "bob": {"question_grades": [_grade(0, 80.0)], "final_score": 80.0, "correct_count": 1}
+    })
+    
+    results = store.get_student_results("exam-1")
+    assert sorted(results) == ["alice", "bob"]
+    assert results["bob"]["final_score"] == 80.0
+    assert results["alice"]["question_grades"][0].score == 100.0
+    assert store.get_results("exam-1") is None
+    
+    store.delete_exam("exam-1")
+    assert store.get_student_results("exam-1") == {}
+
+
+def test_memory_store_ttl_expiry():
+    """Test idle exams expire after the TTL."""
+    import time
+    
+    store = MemoryExamStore(ttl_seconds=0.01)
+    _settled_exam(store, "a")
+    time.sleep(0.02)
+    
+    assert store.get_exam("a") is None
+    assert store.stats()["expirations"] == 1
+
+
+def test_memory_store_spills_cold_exams(tmp_path):
+    """Test evicted exams spill to disk and come back on access."""
+    questions = [QuestionAnswer(question="What is 2+2?", correct_answer="4")]
+    store = MemoryExamStore(max_entries=1, spill_store=SQLiteExamStore(str(tmp_path / "spill.sqlite3")))
+    _settled_exam(store, "a", text="1. What is 2+2?")
+    store.store_parsed_questions("a", questions)
+    store.store_results("a", {"question_grades": [_grade(0, 100.0)], "final_score": 100.0, "correct_count": 1})
+    store.store_student_results("a", {"alice": {"question_grades": [], "final_score": 50.0, "correct_count": 0}})
+    _settled_exam(store, "b")
+    
+    stats = store.stats()
+    assert stats["entries"] == 1
+    assert stats["spilled"] == 1
+    assert stats["spill"]["entries"] == 1
+    assert store.find_exam_by_hash("hash-a") == "a"
+    assert store.file_refs() == {"ref-a", "ref-b"}
+    
+    assert store.get_parsed_questions("a") == questions
+    assert store.get_results("a")["final_score"] == 100.0
+    assert store.get_student_results("a")["alice"]["final_score"] == 50.0
+    assert store.get_exam("a")["extracted_text"] == "1. What is 2+2?"
+    assert store.stats()["restored"] == 1
+    store.close()
@@ -0,0 +1,92 @@
+"""
+Unit tests for upload validation.
+"""
+import hashlib
+import io
+import pytest
+from app.config import settings
+from app.services import upload_service
+
+
+class CountingFile(io.BytesIO):
+    """BytesIO that records how many bytes were read."""
+    bytes_read = 0
+    
+    def read(self, size=-1):
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+@pytest.mark.parametrize("head,expected", [
+    (b"%PDF-1.7\n%\xe2\xe3", ".pdf"),
+    (b"\x89PNG\r\n\x1a\n\x00\x00", ".png"),
+    (b"\xff\xd8\xff\xe0\x00\x10JFIF", ".jpg"),
+    ("1. מה זה 2+2?\nAnswer: 4\n".encode("utf-8"), ".txt"),
+    ("1. מה זה 2+2?\nAnswer: 4\n".encode("utf-16"), ".txt"),
+    (b"\xfe\xff" + "1. What is 2+2?\n".encode("utf-16-be"), ".txt"),
+    ("1. What is 2+2?\n".encode("utf-32"), ".txt"),
+    (b"MZ\x90\x00\x03\x00\x00\x00", None),
+    (b"PK\x03\x04\x14\x00", None)
+])
+def test_sniff_file_type(head, expected):
+    """Test types are recognized from content."""
+    assert upload_service.sniff_file_type(head) == expected
+
+
+def test_decode_text():
+    """Test text uploads decode by byte order mark, then UTF-8, then Latin-1."""
+    text = "1. מה זה 2+2?\nAnswer: 4\n"
+    assert upload_service.decode_text(text.encode("utf-16")) == text
+    assert upload_service.decode_text(text.encode("utf-32")) == text
+    assert upload_service.decode_text(text.encode("utf-8")) == text
+    assert upload_service.decode_text("café".encode("latin-1")) == "café"
+
+
+def test_inspect_upload_hashes_and_rewinds():
+    """Test validation returns the detected type, size and hash."""
+    data = b"%PDF-1.4\n" + b"x" * 3_000_000
+    file_obj = io.BytesIO(data)
+    info = upload_service.inspect_upload(file_obj)
+    assert info == (".pdf", len(data), hashlib.sha256(data).hexdigest())
+    assert file_obj.tell() == 0
+
+
+def test_inspect_upload_stops_at_size_limit(monkeypatch):
+    """Test oversized files are rejected without reading them to the end."""
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE_MB", 1)
+    file_obj = CountingFile(b"%PDF-1.4\n" + b"x" * 10_000_000)
+    with pytest.raises(upload_service.UploadTooLargeError):
+        upload_service.inspect_upload(file_obj)
+    assert file_obj.bytes_read <= 2 * upload_service.CHUNK_SIZE
+
+
+def test_inspect_upload_rejects_unsupported_content():
+    """Test binary content is rejected after the first chunk whatever its name."""
+    file_obj = CountingFile(b"MZ\x90\x00" + b"\x00" * 5_000_000)
+    with pytest.raises(upload_service.UploadRejectedError, match="Unsupported file type"):
+        upload_service.inspect_upload(file_obj)
+    assert file_obj.bytes_read == upload_service.CHUNK_SIZE
+    
+    with pytest.raises(upload_service.UploadRejectedError, match="empty"):
+        upload_service.inspect_upload(io.BytesIO(b""))
+
+
+def test_check_filename():
+    """Test disallowed extensions are rejected while extensionless names pass."""
+    upload_service.check_filename("exam.JPEG")
+    upload_service.check_filename("scan-0001")
+    with pytest.raises(upload_service.UploadRejectedError):
+        upload_service.check_filename("exam.exe")
+
+
+def test_declared_size_too_large(monkeypatch):
+    """Test Content-Length screening allows for multipart overhead."""
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE_MB", 1)
+    assert not upload_service.declared_size_too_large(str(1024 * 1024 + 1000))
+    assert upload_service.declared_size_too_large(str(2 * 1024 * 1024))
+    assert not upload_service.declared_size_too_large(None)
+    
+    monkeypatch.setattr(settings, "BULK_UPLOAD_MAX_MB", 4)
+    assert not upload_service.declared_size_too_large(str(2 * 1024 * 1024), bulk=True)
+    assert upload_service.declared_size_too_large(str(5 * 1024 * 1024), bulk=True)
@@ -2,11 +2,50 @@ import React, { useState } from 'react';
 import '../App.css';
 import './ExamUpload.css';
 
+const STATUS_POLL_INTERVAL_MS = 1000;
+
+const describeProgress = (statusInfo) => {
+  if (statusInfo.state === 'ocr' && statusInfo.progress && statusInfo.progress.total) {
+    return `Reading text (page ${statusInfo.progress.page}/${statusInfo.progress.total})...`;
+  }
+  switch (statusInfo.state) {
+    case 'queued':
+      return 'Waiting in queue...';
+    case 'rendering':
+      return 'Rendering pages...';
+    case 'parsing':
+      return 'Parsing questions...';
+    default:
+      return 'Processing...';
+  }
+};
+
 function ExamUpload({ apiBaseUrl, onUploaded }) {
   const [file, setFile] = useState(null);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
   const [success, setSuccess] = useState(null);
+  const [progress, setProgress] = useState(null);
+
+  const waitForProcessing = async (examId) => {
+    // Upload returns immediately; OCR runs in the background
+    for (;;) {
+      const response = await fetch(`${apiBaseUrl}/api/exams/${examId}/status`);
+      if (!response.ok) {
+        const errorData = await response.json();
+        throw new Error(errorData.detail || 'Failed to check exam status');
+      }
+      const statusInfo = await response.json();
+      if (statusInfo.state === 'done') {
+        return statusInfo;
+      }
+      if (statusInfo.state === 'failed') {
+        throw new Error(statusInfo.error || 'Processing failed');
+      }
+      setProgress(describeProgress(statusInfo));
+      await new Promise((resolve) => setTimeout(resolve, STATUS_POLL_INTERVAL_MS));
+    }
+  };
 
   const handleFileChange = (e) => {
     const selectedFile = e.target.files[0];
@@ -44,12 +83,14 @@ function ExamUpload({ apiBaseUrl, onUploaded }) {
       }
 
       const data = await response.json();
-      setSuccess(`Exam uploaded successfully! Exam ID: ${data.exam_id}`);
+      const statusInfo = await waitForProcessing(data.exam_id);
+      setSuccess(`Exam uploaded successfully! Extracted ${statusInfo.text_length} characters. Exam ID: ${data.exam_id}`);
       onUploaded(data.exam_id);
     } catch (err) {
       setError(err.message);
     } finally {
       setLoading(false);
+      setProgress(null);
     }
   };
 
@@ -97,7 +138,7 @@ function ExamUpload({ apiBaseUrl, onUploaded }) {
           className="btn btn-primary"
           style={{ marginTop: '1.5rem' }}
         >
-          {loading ? 'Uploading...' : 'Upload Exam'}
+          {loading ? (progress || 'Uploading...') : 'Upload Exam'}
         </button>
       </form>
 
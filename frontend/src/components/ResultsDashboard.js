@@ -18,30 +18,58 @@ function ResultsDashboard({ results, onReset }) {
     return 'F';
   };
 
+  // Streamed results arrive one question at a time; the score comes last
+  const inProgress = results.final_score == null && !results.error;
+  const gradedCount = results.question_grades.length;
+  const questionErrors = results.question_errors || [];
+  const expectedCount = results.expected_answers || results.total_questions;
+
   return (
     <div className="step-container">
       <h2>Grading Results</h2>
 
+      {results.error && <div className="error-message">{results.error}</div>}
+
       {/* Final Score Card */}
-      <div className="final-score-card">
-        <div className="score-circle" style={{ borderColor: getScoreColor(results.final_score) }}>
-          <div className="score-value" style={{ color: getScoreColor(results.final_score) }}>
-            {results.final_score.toFixed(1)}%
+      {results.final_score != null ? (
+        <div className="final-score-card">
+          <div className="score-circle" style={{ borderColor: getScoreColor(results.final_score) }}>
+            <div className="score-value" style={{ color: getScoreColor(results.final_score) }}>
+              {results.final_score.toFixed(1)}%
+            </div>
+            <div className="score-grade">{getGradeLetter(results.final_score)}</div>
+          </div>
+          <div className="score-details">
+            <h3>Final Score</h3>
+            <p>
+              {results.correct_answers} out of {results.total_questions} questions correct
+            </p>
           </div>
-          <div className="score-grade">{getGradeLetter(results.final_score)}</div>
         </div>
-        <div className="score-details">
-          <h3>Final Score</h3>
-          <p>
-            {results.correct_answers} out of {results.total_questions} questions correct
-          </p>
+      ) : inProgress && (
+        <div className="final-score-card">
+          <div className="score-details">
+            <h3>Grading...</h3>
+            <p>
+              {gradedCount} of {expectedCount} answers graded
+              {questionErrors.length > 0 && `, ${questionErrors.length} failed`}
+            </p>
+          </div>
         </div>
-      </div>
+      )}
 
       {/* Per-Question Results */}
       <div className="results-section">
         <h3 style={{ marginBottom: '1.5rem' }}>Question-by-Question Results</h3>
         <div className="results-grid">
+          {questionErrors.map((failure) => (
+            <div key={`error-${failure.question_index}`} className="result-card result-card-failed">
+              <div className="result-header">
+                <span className="result-question-number">Question {failure.question_index + 1}</span>
+              </div>
+              <div className="error-message">Could not be graded: {failure.detail}</div>
+            </div>
+          ))}
           {results.question_grades.map((grade, idx) => (
             <div key={idx} className="result-card">
               <div className="result-header">
@@ -88,6 +116,7 @@ function ResultsDashboard({ results, onReset }) {
 
       <button
         onClick={onReset}
+        disabled={inProgress}
         className="btn btn-secondary"
         style={{ marginTop: '2rem', width: '100%' }}
       >
@@ -21,7 +21,7 @@ function StudentAnswers({ apiBaseUrl, examId, questions, onGraded }) {
     setError(null);
 
     try {
-      const response = await fetch(`${apiBaseUrl}/api/exams/${examId}/grade`, {
+      const response = await fetch(`${apiBaseUrl}/api/exams/${examId}/grade/stream`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -37,8 +37,55 @@ function StudentAnswers({ apiBaseUrl, examId, questions, onGraded }) {
         throw new Error(errorData.detail || 'Grading failed');
       }
 
-      const data = await response.json();
-      onGraded(data);
+      // Newline-delimited JSON: one grade or error record per answer, then a summary (or failed)
+      const results = {
+        exam_id: examId,
+        question_grades: [],
+        question_errors: [],
+        final_score: null,
+        total_questions: questions.length,
+        correct_answers: null,
+        expected_answers: answers.length,
+        error: null,
+      };
+      const publish = () => onGraded({
+        ...results,
+        question_grades: [...results.question_grades].sort((a, b) => a.question_index - b.question_index),
+        question_errors: [...results.question_errors].sort((a, b) => a.question_index - b.question_index),
+      });
+      const handleRecord = (record) => {
+        if (record.type === 'grade') {
+          const grade = { ...record };
+          delete grade.type;
+          results.question_grades.push(grade);
+        } else if (record.type === 'error') {
+          results.question_errors.push({ question_index: record.question_index, detail: record.detail });
+        } else if (record.type === 'summary') {
+          results.final_score = record.final_score;
+          results.correct_answers = record.correct_answers;
+          results.total_questions = record.total_questions;
+        } else if (record.type === 'failed') {
+          results.error = record.detail;
+        }
+        publish();
+      };
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      for (;;) {
+        const { done, value } = await reader.read();
+        buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        lines.filter((line) => line.trim()).forEach((line) => handleRecord(JSON.parse(line)));
+        if (done) break;
+      }
+      if (buffer.trim()) handleRecord(JSON.parse(buffer));
+      if (results.final_score == null && !results.error) {
+        results.error = 'Grading stream ended unexpectedly';
+        publish();
+      }
     } catch (err) {
       setError(err.message);
     } finally {